@@ -0,0 +1,162 @@
+'''
+Synthetic catalogs of given scale for the fake drivers. Rows are generated
+for the result columns of the backend's own catalog queries, so that the
+whole pipeline after the queries works on them as on real results.
+'''
+
+from .fake_driver import FakeConnection
+from .fake_driver import select_columns
+
+
+# number of objects for each scale: tables with columns each, foreign keys
+# per table, functions with parameters each, triggers and views
+SCALES = {
+    'small': {
+        'tables': 50,
+        'columns': 10,
+        'foreign_keys': 2,
+        'functions': 20,
+        'parameters': 3,
+        'triggers': 10,
+        'views': 10
+    },
+    'medium': {
+        'tables': 500,
+        'columns': 20,
+        'foreign_keys': 3,
+        'functions': 200,
+        'parameters': 4,
+        'triggers': 100,
+        'views': 100
+    },
+    'large': {
+        'tables': 2000,
+        'columns': 30,
+        'foreign_keys': 4,
+        'functions': 500,
+        'parameters': 5,
+        'triggers': 300,
+        'views': 300
+    }
+}
+
+DEFINITION = '\n'.join(
+    f'    -- line {i} of the source\n    PERFORM something_{i}(arg_{i});' for i in range(10)
+)
+
+
+def get_queries(renderer) -> dict:
+    '''Catalog queries of all components: {dataset name: query class}.'''
+    queries = {}
+    for component in renderer.options['components']:
+        queries.update(renderer.get_component_queries().get(component, {}))
+    return queries
+
+
+def make_value(column: str, i: int, names: dict):
+    '''
+    Value of column in i-th row of a dataset. names has the object names for
+    this row: table, column, ref_table, ref_column, function.
+    '''
+    lower = column.lower()
+    if ('ref' in lower or 'foreign' in lower or lower.startswith('f_')) and 'table' in lower:
+        return names.get('ref_table', f'ref_table_{i}')
+    if ('ref' in lower or 'foreign' in lower) and 'column' in lower:
+        return names.get('ref_column', 'id')
+    if 'schema' in lower or 'owner' in lower:
+        return 'public'
+    if 'position' in lower or lower == 'column_id':
+        return str(names.get('position', i))
+    if any(word in lower for word in ('definition', 'source', 'statement', 'body', 'text')):
+        return DEFINITION
+    if 'description' in lower or 'comment' in lower:
+        return None if i % 3 == 0 else f'Description of {column.lower()} {i}'
+    return f'{lower}_{i}'
+
+
+def make_rows(columns: list, objects: list, key_fields: tuple = (), key_names: tuple = ()) -> list:
+    '''
+    Make row dicts for objects (dicts of names, see make_value). Fields in
+    key_fields get names of key_names from the object, so that rows of
+    different datasets are joined.
+    '''
+    keys = dict(zip(key_fields, key_names))
+    return [
+        {
+            column: names[keys[column]] if column in keys else make_value(column, i, names)
+            for column in columns
+        }
+        for i, names in enumerate(objects)
+    ]
+
+
+def generate_catalog(renderer, scale: dict) -> dict:
+    '''
+    Generate rows of each catalog query of the renderer: {dataset name: list
+    of row dicts with all columns, including definitions}.
+    '''
+    queries = get_queries(renderer)
+    join_fields = renderer.join_fields
+    tables = [f'table_{t:05d}' for t in range(scale['tables'])]
+    functions = [f'function_{f:05d}' for f in range(scale['functions'])]
+    has_parameters = 'parameters' in queries
+
+    def columns_of(name):
+        return select_columns(queries[name](None).sql)
+
+    catalog = {}
+    if 'tables' in queries:
+        catalog['tables'] = make_rows(
+            columns_of('tables'),
+            [{'table': table} for table in tables],
+            join_fields['tables'], ('table',)
+        )
+        catalog['columns'] = make_rows(
+            columns_of('columns'),
+            [
+                {'table': table, 'column': 'id' if c == 0 else f'column_{c:03d}', 'position': c + 1}
+                for table in tables
+                for c in range(scale['columns'])
+            ],
+            join_fields['columns'], ('table', 'column')
+        )
+        catalog['foreign_keys'] = make_rows(
+            columns_of('foreign_keys'),
+            [
+                {'table': table, 'column': f'column_{k + 1:03d}',
+                 'ref_table': tables[(t + k + 1) % len(tables)], 'ref_column': 'id'}
+                for t, table in enumerate(tables)
+                for k in range(min(scale['foreign_keys'], scale['columns'] - 1))
+            ],
+            join_fields['foreign_keys'], ('table', 'column')
+        )
+    if 'functions' in queries:
+        catalog['functions'] = make_rows(
+            columns_of('functions'),
+            [{'function': function} for function in functions],
+            join_fields['functions'] if has_parameters else (), ('function',)
+        )
+    if has_parameters:
+        catalog['parameters'] = make_rows(
+            columns_of('parameters'),
+            [{'function': function} for function in functions for _ in range(scale['parameters'])],
+            join_fields['parameters'], ('function',)
+        )
+    for name in ('triggers', 'views'):
+        if name in queries:
+            catalog[name] = make_rows(columns_of(name), [{}] * scale[name])
+    return catalog
+
+
+def make_connection(renderer, catalog: dict, as_bytes: bool = False) -> FakeConnection:
+    '''
+    Fake connection which answers the renderer's catalog queries (with and
+    without deferred definitions, and the queries which load deferred
+    definitions) with the catalog rows.
+    '''
+    con = FakeConnection(as_bytes=as_bytes)
+    filters = renderer.options.get('filters', {})
+    for name, query_class in get_queries(renderer).items():
+        for kwargs in ({}, {'defer_definitions': True}, {'definitions_only': True}):
+            con.register_rows(query_class(None, filters, **kwargs).sql, catalog[name])
+    return con
@@ -0,0 +1,185 @@
+'''
+In-process fake database drivers which serve prepared results for known SQL
+statements, so that catalog queries and everything after them can be
+measured without a database server.
+
+FakeConnection implements the parts of DB-API used by the pgsql, oracle and
+mssql queries (cursor().execute/description/fetchall/fetchmany) and of the
+_mysql API used by the mysql queries (query/store_result/use_result,
+describe/fetch_row). It is also the fake driver of the tests.
+'''
+
+import re
+
+
+_COMMENT = re.compile(r'--[^\n]*')
+_ALIAS = re.compile(r'\bAS\s+"?(\w+)"?\s*$', re.IGNORECASE)
+_LAST_NAME = re.compile(r'(\w+)"?\s*$')
+
+
+def select_columns(sql: str) -> list:
+    '''
+    Get names of the result columns of a SELECT statement: aliases or the
+    last part of dotted column names from the outer select list.
+    '''
+    sql = _COMMENT.sub('', sql)
+    start = re.search(r'\bSELECT\b', sql, re.IGNORECASE).end()
+    items = []
+    depth = 0
+    quoted = False
+    item_start = start
+    i = start
+    while i < len(sql):
+        char = sql[i]
+        if char == "'":
+            quoted = not quoted
+        elif quoted:
+            pass
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif depth == 0 and char == ',':
+            items.append(sql[item_start:i])
+            item_start = i + 1
+        elif depth == 0 and re.match(r'\bFROM\b', sql[i:i + 5], re.IGNORECASE) \
+                and not (sql[i - 1].isalnum() or sql[i - 1] == '_'):
+            break
+        i += 1
+    items.append(sql[item_start:i])
+
+    columns = []
+    for item in items:
+        item = item.strip()
+        match = _ALIAS.search(item) or _LAST_NAME.search(item)
+        columns.append(match.group(1))
+    return columns
+
+
+class FakeConnection:
+    '''
+    Connection which answers registered SQL statements with prepared rows.
+    With as_bytes, values are returned as bytes like the _mysql driver does.
+
+    Executed statements, names of opened cursors and sizes of fetched batches
+    are recorded in executed, cursor_names and fetches, and the _mysql result
+    method in used ('store' or 'use'), so that tests can check how queries
+    read their results.
+    '''
+
+    def __init__(self, as_bytes: bool = False, server_info: str = '8.0.0'):
+        self.as_bytes = as_bytes
+        self.server_info = server_info
+        self.responses = {}
+        self.executed = []
+        self.cursor_names = []
+        self.fetches = []
+        self.used = None
+        self.closed = False
+        self._sql = None
+
+    def register(self, sql: str, keys: list, rows: list) -> None:
+        '''Answer sql with rows: a list of tuples of values in keys order.'''
+        if self.as_bytes:
+            rows = [
+                tuple(v.encode('utf8') if isinstance(v, str) else v for v in row)
+                for row in rows
+            ]
+        self.responses[sql] = (tuple(keys), rows)
+
+    def register_rows(self, sql: str, rows: list) -> None:
+        '''Answer sql with rows given as dicts with the result columns of sql.'''
+        columns = select_columns(sql)
+        self.register(sql, columns, [tuple(row[c] for c in columns) for row in rows])
+
+    def get_response(self, sql: str) -> tuple:
+        self.executed.append(sql)
+        try:
+            return self.responses[sql]
+        except KeyError:
+            raise RuntimeError(f'Unexpected query:\n{sql}')
+
+    # DB-API
+
+    def cursor(self, name=None):
+        self.cursor_names.append(name)
+        return FakeCursor(self, name)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    # _mysql API
+
+    def query(self, sql: str):
+        self._sql = sql
+
+    def store_result(self):
+        self.used = 'store'
+        return FakeMySQLResult(self, *self.get_response(self._sql))
+
+    def use_result(self):
+        self.used = 'use'
+        return FakeMySQLResult(self, *self.get_response(self._sql))
+
+    def get_server_info(self):
+        return self.server_info
+
+
+class FakeCursor:
+    def __init__(self, con: FakeConnection, name: str = None):
+        self.con = con
+        self.name = name
+        self.arraysize = 1
+        self.itersize = 2000
+        self.description = None
+        self._keys = ()
+        self._rows = []
+        self._pos = 0
+
+    def execute(self, sql: str):
+        self._keys, self._rows = self.con.get_response(sql)
+        # named cursors get description after the first fetch, like in psycopg2
+        if self.name is None:
+            self._describe()
+        self._pos = 0
+
+    def _describe(self):
+        self.description = [(key,) for key in self._keys]
+
+    def fetchall(self):
+        rows = self._rows[self._pos:]
+        self._pos = len(self._rows)
+        self.con.fetches.append(len(rows))
+        return rows
+
+    def fetchmany(self, size=None):
+        self._describe()
+        size = size or self.arraysize
+        rows = self._rows[self._pos:self._pos + size]
+        self._pos += len(rows)
+        self.con.fetches.append(len(rows))
+        return rows
+
+    def close(self):
+        pass
+
+
+class FakeMySQLResult:
+    def __init__(self, con: FakeConnection, keys: tuple, rows: list):
+        self._con = con
+        self._keys = keys
+        self._rows = rows
+        self._pos = 0
+
+    def describe(self):
+        return tuple((key,) for key in self._keys)
+
+    def fetch_row(self, maxrows=1):
+        end = len(self._rows) if maxrows == 0 else self._pos + maxrows
+        rows = self._rows[self._pos:end]
+        self._pos += len(rows)
+        self._con.fetches.append(len(rows))
+        return tuple(rows)
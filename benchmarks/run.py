@@ -0,0 +1,212 @@
+'''
+Micro-benchmarks of dbdoc over fake drivers with synthetic catalogs.
+
+Times reading query results (_get_rows), joining them (collect_tables,
+collect_functions) and rendering (to_md, to_diag) for each backend at
+several scales, and compares the results with a stored baseline. Times are
+relative to a fixed reference workload measured in the same run, so that
+the baseline doesn't depend on the machine and its load:
+
+    python -m benchmarks.run --scales small medium
+    python -m benchmarks.run --save  # update the baseline
+'''
+
+import argparse
+import gc
+import json
+import platform
+import sys
+
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+
+from foliant.preprocessors.dbdoc.mssql.main import MSSQLRenderer
+from foliant.preprocessors.dbdoc.mysql.main import MySQLRenderer
+from foliant.preprocessors.dbdoc.oracle.main import OracleRenderer
+from foliant.preprocessors.dbdoc.pgsql.main import PGSQLRenderer
+
+from .catalog import SCALES
+from .catalog import generate_catalog
+from .catalog import get_queries
+from .catalog import make_connection
+
+
+RENDERERS = {
+    'pgsql': PGSQLRenderer,
+    'mysql': MySQLRenderer,
+    'oracle': OracleRenderer,
+    'mssql': MSSQLRenderer
+}
+STAGES = ('_get_rows', 'collect_tables', 'collect_functions', 'to_md', 'to_diag')
+BASELINE = Path(__file__).parent / 'baseline.json'
+# rows of the reference workload, it takes some tens of milliseconds
+REFERENCE_ROWS = 50000
+# fast stages are called in a loop for at least this time in each run
+MIN_RUN_SECONDS = 0.05
+
+
+def make_renderer(backend: str):
+    '''Renderer with default options and definitions fetched with the rows.'''
+    renderer = RENDERERS[backend]({})
+    renderer.options = {**renderer.base_defaults, **renderer.defaults, 'lazy_definitions': False}
+    return renderer
+
+
+def median_time(func, repeat: int) -> tuple:
+    '''
+    Return the median wall time of a func call in repeat runs and its last
+    result. Like timeit, garbage collection is off while measuring, and
+    fast functions are called several times in each run, until it takes
+    MIN_RUN_SECONDS.
+    '''
+    start = perf_counter()
+    result = func()
+    first = perf_counter() - start
+    loops = max(1, int(MIN_RUN_SECONDS / first)) if first else 1
+
+    times = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = perf_counter()
+            for _ in range(loops):
+                result = func()
+            times.append((perf_counter() - start) / loops)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return median(times), result
+
+
+def reference_workload() -> str:
+    '''
+    Fixed pure Python work like the measured stages do: building rows,
+    grouping them and joining strings.
+    '''
+    rows = [
+        {'table': f'table_{i % 500}', 'column': f'column_{i}', 'type': 'integer'}
+        for i in range(REFERENCE_ROWS)
+    ]
+    groups = {}
+    for row in rows:
+        groups.setdefault(row['table'], []).append(row)
+    return ''.join(
+        f"{name}: {', '.join(row['column'] + ' ' + row['type'] for row in group)}\n"
+        for name, group in sorted(groups.items())
+    )
+
+
+def benchmark(backend: str, scale: dict, repeat: int) -> dict:
+    '''
+    Return {stage: median time} for the backend at scale. Times are in units of
+    the reference workload time, which is measured with the catalog in
+    memory, so that it is affected by the same machine speed, load and heap
+    size as the stages.
+    '''
+    renderer = make_renderer(backend)
+    catalog = generate_catalog(renderer, scale)
+    renderer.con = make_connection(renderer, catalog, as_bytes=backend == 'mysql')
+    queries = get_queries(renderer)
+
+    def get_rows():
+        result = {}
+        for name, query_class in queries.items():
+            query = query_class(renderer.con)
+            result[name] = query._get_rows(query.sql)
+        return result
+
+    reference, _ = median_time(reference_workload, repeat)
+    timings = {}
+    timings['_get_rows'], rows = median_time(get_rows, repeat)
+
+    data = {name: rows[name] for name in ('views', 'triggers', 'functions') if name in rows}
+    timings['collect_tables'], data['tables'] = median_time(
+        lambda: renderer.collect_tables(rows['tables'], rows['columns'], rows['foreign_keys']),
+        repeat
+    )
+    if 'parameters' in rows:
+        timings['collect_functions'], data['functions'] = median_time(
+            lambda: renderer.collect_functions(rows['functions'], rows['parameters']),
+            repeat
+        )
+    timings['to_md'], _ = median_time(
+        lambda: renderer.to_md(data, renderer.get_doc_template()),
+        repeat
+    )
+    timings['to_diag'], _ = median_time(
+        lambda: renderer.to_diag(data, renderer.get_scheme_template()),
+        repeat
+    )
+    return {stage: seconds / reference for stage, seconds in timings.items()}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    '''
+    Print results next to the baseline and return regressions: stages which
+    are slower than the baseline by more than tolerance (0.5 — by 50%).
+    Results and baseline are in the same units, relative to the reference
+    workload.
+    '''
+    regressions = []
+    print(f'{"benchmark":<28}{"stage":<20}{"value":>10}{"baseline":>10}{"ratio":>8}')
+    for name, timings in results.items():
+        for stage, seconds in timings.items():
+            base = baseline.get(name, {}).get(stage)
+            line = f'{name:<28}{stage:<20}{seconds:>10.4f}'
+            if base:
+                ratio = seconds / base
+                line += f'{base:>10.4f}{ratio:>8.2f}'
+                if ratio > 1 + tolerance:
+                    line += '  REGRESSION'
+                    regressions.append((name, stage, ratio))
+            print(line)
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', nargs='+', choices=list(RENDERERS), default=list(RENDERERS))
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=['small', 'medium'])
+    parser.add_argument('--repeat', type=int, default=7, help='runs of each stage, the median is taken')
+    parser.add_argument('--baseline', default=str(BASELINE), help='baseline json file')
+    parser.add_argument('--save', action='store_true', help='save the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=1.0,
+                        help='allowed slowdown against the baseline, 1.0 — twice')
+    args = parser.parse_args(argv)
+
+    results = {}
+    for backend in args.backends:
+        for scale in args.scales:
+            results[f'{backend}/{scale}'] = benchmark(backend, SCALES[scale], args.repeat)
+
+    baseline_path = Path(args.baseline)
+    baseline = {}
+    if baseline_path.exists():
+        with open(baseline_path, encoding='utf8') as f:
+            baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save:
+        with open(baseline_path, 'w', encoding='utf8') as f:
+            json.dump(
+                {
+                    'python': platform.python_version(),
+                    'platform': platform.platform(),
+                    'unit': 'reference workload time',
+                    'results': {**baseline, **results}
+                },
+                f,
+                indent=2
+            )
+        print(f'Baseline saved to {baseline_path}')
+        return 0
+    if regressions:
+        print(f'{len(regressions)} stages are slower than the baseline')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,214 @@
+'''
+Scale benchmark against real databases (see scale_in_docker.sh): for each
+tier generates a large schema, runs the full dbdoc preprocessing on it and
+records connect, query, join and render timings and peak RSS, then
+compares them with a stored baseline:
+
+    python -m benchmarks.scale --dbms pgsql --tiers small medium
+    python -m benchmarks.scale --dbms mysql --port 3306 --save
+'''
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+import yaml
+
+from foliant.preprocessors.dbdoc.base.main import LibraryNotInstalledError
+
+from .run import compare
+from .schema import SCHEMA
+from .schema import SCHEMA_BUILDERS
+from .schema import TIERS
+
+
+BASELINE = Path(__file__).parent / 'scale_baseline.json'
+STAGES = ('connect', 'query', 'collect_tables', 'collect_functions', 'render_md', 'render_diag')
+
+DEFAULTS = {
+    'pgsql': {'port': 5432, 'user': 'postgres', 'password': 'password', 'dbname': 'testdb'},
+    'mysql': {'port': 3306, 'user': 'root', 'password': 'password', 'dbname': SCHEMA}
+}
+
+
+def connect(dbms: str, options: dict):
+    '''Connect with the DBMS driver to load the schema.'''
+    try:
+        if dbms == 'pgsql':
+            import psycopg2
+            con = psycopg2.connect(
+                host=options['host'],
+                port=options['port'],
+                dbname=options['dbname'],
+                user=options['user'],
+                password=options['password']
+            )
+            con.autocommit = True
+            return con
+        import MySQLdb
+        return MySQLdb.connect(
+            host=options['host'],
+            port=int(options['port']),
+            user=options['user'],
+            passwd=options['password']
+        )
+    except ModuleNotFoundError as e:
+        raise LibraryNotInstalledError(f'{e.name} is needed to load the scale schema')
+
+
+def load_schema(dbms: str, options: dict, tier: dict) -> float:
+    '''Create the tier schema in the database, return time it took.'''
+    start = perf_counter()
+    con = connect(dbms, options)
+    try:
+        cur = con.cursor()
+        for statement in SCHEMA_BUILDERS[dbms](tier):
+            cur.execute(statement)
+        cur.close()
+        con.commit()
+    finally:
+        con.close()
+    return perf_counter() - start
+
+
+def preprocessor_options(dbms: str, options: dict, extra: dict) -> dict:
+    '''Preprocessor config to document the whole scale schema.'''
+    result = {
+        'dbms': dbms,
+        'host': options['host'],
+        'port': options['port'],
+        'user': options['user'],
+        'password': options['password'],
+        'dbname': options['dbname'] if dbms == 'pgsql' else SCHEMA,
+        'doc': True,
+        'scheme': True,
+        'components': ['tables', 'views', 'functions', 'triggers'],
+        # system schemas must not be documented
+        'filters': {'eq': {'schema': SCHEMA}}
+    }
+    result.update(extra)
+    return result
+
+
+def peak_rss_mb() -> float:
+    '''Peak resident set size of this process in megabytes.'''
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def summarize(report: dict, seconds: float, rss_mb: float) -> dict:
+    '''Stage totals from the timing report, wall time and peak RSS of a run.'''
+    result = {stage: report['total'][stage]['seconds'] for stage in STAGES if stage in report['total']}
+    result['total'] = seconds
+    result['peak_rss_mb'] = rss_mb
+    return result
+
+
+def run_tier(options: dict, result_path: str) -> None:
+    '''
+    Run the preprocessor over a chapter with one dbdoc tag and save the
+    summary to result_path. Called in a separate process, so that peak RSS
+    belongs to this run only.
+    '''
+    from foliant_test.preprocessor import PreprocessorTestFramework
+
+    with TemporaryDirectory() as tmp:
+        report_path = os.path.join(tmp, 'timings.json')
+        ptf = PreprocessorTestFramework('dbdoc')
+        ptf.options = {**options, 'timing_report': report_path}
+        start = perf_counter()
+        ptf.test_preprocessor(input_mapping={'index.md': '# Scale\n\n<dbdoc></dbdoc>\n'})
+        seconds = perf_counter() - start
+        with open(report_path, encoding='utf8') as f:
+            report = json.load(f)
+    if not report['tags'] or 'render_md' not in report['total']:
+        raise RuntimeError('The dbdoc tag was not rendered, see the preprocessor log')
+    with open(result_path, 'w', encoding='utf8') as f:
+        json.dump(summarize(report, seconds, peak_rss_mb()), f)
+
+
+def parse_option(value: str) -> tuple:
+    '''Parse key=value with yaml value, like in foliant config.'''
+    key, _, raw = value.partition('=')
+    return key, yaml.safe_load(raw)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dbms', choices=list(SCHEMA_BUILDERS), default='pgsql')
+    parser.add_argument('--tiers', nargs='+', choices=list(TIERS), default=['small'])
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port')
+    parser.add_argument('--user')
+    parser.add_argument('--password')
+    parser.add_argument('--dbname', help='PostgreSQL database where the scale schema is created')
+    parser.add_argument('--option', action='append', default=[], type=parse_option,
+                        help='extra preprocessor option as key=value, e.g. collection_mode=nested')
+    parser.add_argument('--skip-load', action='store_true',
+                        help="don't recreate the schema, it's already loaded for the single tier")
+    parser.add_argument('--baseline', default=str(BASELINE), help='baseline json file')
+    parser.add_argument('--save', action='store_true', help='save the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='allowed slowdown against the baseline, 0.5 — by 50%%')
+    parser.add_argument('--run-tier', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_tier:
+        run_tier(json.loads(args.run_tier), args.result)
+        return 0
+
+    options = {'host': args.host, **DEFAULTS[args.dbms]}
+    for key in ('port', 'user', 'password', 'dbname'):
+        if getattr(args, key):
+            options[key] = getattr(args, key)
+
+    results = {}
+    for tier_name in args.tiers:
+        name = f'{args.dbms}/{tier_name}'
+        if not args.skip_load:
+            print(f'{name}: loading schema...', flush=True)
+            seconds = load_schema(args.dbms, options, TIERS[tier_name])
+            print(f'{name}: schema loaded in {seconds:.1f}s', flush=True)
+        print(f'{name}: running preprocessor...', flush=True)
+        with TemporaryDirectory() as tmp:
+            result_path = os.path.join(tmp, 'result.json')
+            subprocess.run(
+                [
+                    sys.executable, '-m', 'benchmarks.scale',
+                    '--run-tier', json.dumps(preprocessor_options(args.dbms, options, dict(args.option))),
+                    '--result', result_path
+                ],
+                check=True
+            )
+            with open(result_path, encoding='utf8') as f:
+                results[name] = json.load(f)
+
+    baseline_path = Path(args.baseline)
+    baseline = {}
+    if baseline_path.exists():
+        with open(baseline_path, encoding='utf8') as f:
+            baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save:
+        with open(baseline_path, 'w', encoding='utf8') as f:
+            json.dump({'results': {**baseline, **results}}, f, indent=2)
+        print(f'Baseline saved to {baseline_path}')
+        return 0
+    if regressions:
+        print(f'{len(regressions)} values are greater than in the baseline')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
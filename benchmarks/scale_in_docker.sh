@@ -0,0 +1,75 @@
+#!/bin/bash
+
+set -e  # Exit on error
+
+# Default values
+DB_TYPE="pgsql"
+TIERS="small"
+EXTRA_ARGS=()
+
+CONTAINER_NAME="dbdoc-scale"
+
+# Parse command line arguments
+while [[ $# -gt 0 ]]; do
+    case $1 in
+        --db-type)
+            DB_TYPE="$2"
+            shift 2
+            ;;
+        --tiers)
+            TIERS="$2"
+            shift 2
+            ;;
+        *)
+            # passed to benchmarks.scale as is, e.g. --save or --option collection_mode=nested
+            EXTRA_ARGS+=("$1")
+            shift
+            ;;
+    esac
+done
+
+echo "=== Scale Benchmark Configuration ==="
+echo "Database type: ${DB_TYPE}"
+echo "Tiers: ${TIERS}"
+echo "====================================="
+
+cleanup() {
+    echo "Cleaning up..."
+    docker rm -f ${CONTAINER_NAME} >/dev/null 2>&1 || true
+}
+trap cleanup EXIT
+
+docker rm -f ${CONTAINER_NAME} >/dev/null 2>&1 || true
+
+if [[ "${DB_TYPE}" == "pgsql" ]]; then
+    pip3 install psycopg2-binary
+    docker run -d --name ${CONTAINER_NAME} \
+        -e POSTGRES_PASSWORD=password \
+        -e POSTGRES_DB=testdb \
+        -p 5432:5432 \
+        postgres:15
+    ready() {
+        docker exec ${CONTAINER_NAME} psql -U postgres -d testdb -c 'SELECT 1' >/dev/null 2>&1
+    }
+else
+    pip3 install mysqlclient
+    # functions are created by root without SUPER checks for binary logging
+    docker run -d --name ${CONTAINER_NAME} \
+        -e MYSQL_ROOT_PASSWORD=password \
+        -p 3306:3306 \
+        mysql:8 --log-bin-trust-function-creators=1
+    ready() {
+        docker exec ${CONTAINER_NAME} mysql -h 127.0.0.1 -uroot -ppassword -e 'SELECT 1' >/dev/null 2>&1
+    }
+fi
+
+echo "Waiting for the database..."
+for _ in $(seq 1 60); do
+    if ready; then
+        break
+    fi
+    sleep 2
+done
+ready || { echo "Database is not ready"; exit 1; }
+
+python3 -m benchmarks.scale --dbms "${DB_TYPE}" --host 127.0.0.1 --tiers ${TIERS} "${EXTRA_ARGS[@]}"
@@ -0,0 +1,144 @@
+'''
+DDL of large synthetic schemas for the scale benchmark: many tables in
+foreign key chains, wide tables, views, functions with parameters and
+triggers, for PostgreSQL and MySQL.
+'''
+
+
+# number of objects for each tier: narrow tables with columns each, tables
+# are linked by foreign keys in chains of fk_depth, wide tables with
+# wide_columns each, views, functions and triggers
+TIERS = {
+    'small': {
+        'tables': 1000,
+        'columns': 10,
+        'fk_depth': 20,
+        'wide_tables': 10,
+        'wide_columns': 300,
+        'views': 50,
+        'functions': 100,
+        'triggers': 100
+    },
+    'medium': {
+        'tables': 5000,
+        'columns': 15,
+        'fk_depth': 50,
+        'wide_tables': 20,
+        'wide_columns': 500,
+        'views': 200,
+        'functions': 300,
+        'triggers': 300
+    },
+    'large': {
+        'tables': 10000,
+        'columns': 20,
+        'fk_depth': 100,
+        'wide_tables': 50,
+        'wide_columns': 1000,
+        'views': 500,
+        'functions': 500,
+        'triggers': 500
+    }
+}
+
+# schema (PostgreSQL) or database (MySQL) with the generated objects
+SCHEMA = 'dbdoc_scale'
+
+
+def table_name(i: int) -> str:
+    return f't_{i:05d}'
+
+
+def parent_table(i: int, tier: dict):
+    '''Table referenced by i-th table: the previous one in its fk chain.'''
+    return table_name(i - 1) if i % tier['fk_depth'] else None
+
+
+def pgsql_schema(tier: dict) -> list:
+    '''Statements which (re)create the tier schema in PostgreSQL.'''
+    statements = [
+        f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE',
+        f'CREATE SCHEMA {SCHEMA}',
+        f'''CREATE FUNCTION {SCHEMA}.touch() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.c_001 := coalesce(NEW.c_001, '');
+    RETURN NEW;
+END
+$$'''
+    ]
+    for i in range(tier['tables']):
+        name = table_name(i)
+        columns = ['id integer PRIMARY KEY']
+        parent = parent_table(i, tier)
+        if parent:
+            columns.append(f'parent_id integer REFERENCES {SCHEMA}.{parent} (id)')
+        columns.extend(f'c_{c:03d} varchar(100)' for c in range(1, tier['columns']))
+        statements.append(f'CREATE TABLE {SCHEMA}.{name} ({", ".join(columns)})')
+        statements.append(f"COMMENT ON TABLE {SCHEMA}.{name} IS 'Table {i} of the scale schema'")
+    for i in range(tier['wide_tables']):
+        columns = ['id integer PRIMARY KEY']
+        columns.extend(f'w_{c:04d} integer' for c in range(1, tier['wide_columns']))
+        statements.append(f'CREATE TABLE {SCHEMA}.wide_{i:03d} ({", ".join(columns)})')
+    for i in range(tier['views']):
+        statements.append(
+            f'CREATE VIEW {SCHEMA}.v_{i:05d} AS SELECT id, c_001 FROM {SCHEMA}.{table_name(i)}'
+        )
+    for i in range(tier['functions']):
+        statements.append(
+            f'''CREATE FUNCTION {SCHEMA}.f_{i:05d}(a integer, b text DEFAULT 'x', OUT c integer)
+LANGUAGE sql AS $$ SELECT a + length(b) + {i} $$'''
+        )
+        statements.append(
+            f"COMMENT ON FUNCTION {SCHEMA}.f_{i:05d}(integer, text) IS 'Function {i}'"
+        )
+    for i in range(tier['triggers']):
+        statements.append(
+            f'CREATE TRIGGER tr_{i:05d} BEFORE INSERT OR UPDATE ON {SCHEMA}.{table_name(i)} '
+            f'FOR EACH ROW EXECUTE FUNCTION {SCHEMA}.touch()'
+        )
+    return statements
+
+
+def mysql_schema(tier: dict) -> list:
+    '''Statements which (re)create the tier database in MySQL.'''
+    statements = [
+        f'DROP DATABASE IF EXISTS {SCHEMA}',
+        f'CREATE DATABASE {SCHEMA}',
+        f'USE {SCHEMA}'
+    ]
+    for i in range(tier['tables']):
+        name = table_name(i)
+        columns = ['id INT PRIMARY KEY']
+        parent = parent_table(i, tier)
+        if parent:
+            columns.append('parent_id INT')
+        columns.extend(f'c_{c:03d} VARCHAR(100)' for c in range(1, tier['columns']))
+        if parent:
+            columns.append(f'FOREIGN KEY (parent_id) REFERENCES {parent} (id)')
+        statements.append(
+            f"CREATE TABLE {name} ({', '.join(columns)}) "
+            f"COMMENT='Table {i} of the scale schema'"
+        )
+    for i in range(tier['wide_tables']):
+        columns = ['id INT PRIMARY KEY']
+        columns.extend(f'w_{c:04d} INT' for c in range(1, tier['wide_columns']))
+        statements.append(f'CREATE TABLE wide_{i:03d} ({", ".join(columns)})')
+    for i in range(tier['views']):
+        statements.append(f'CREATE VIEW v_{i:05d} AS SELECT id, c_001 FROM {table_name(i)}')
+    for i in range(tier['functions']):
+        statements.append(
+            f'CREATE FUNCTION f_{i:05d}(a INT, b VARCHAR(100)) RETURNS INT DETERMINISTIC '
+            f"COMMENT 'Function {i}' RETURN a + CHAR_LENGTH(b) + {i}"
+        )
+    for i in range(tier['triggers']):
+        statements.append(
+            f'CREATE TRIGGER tr_{i:05d} BEFORE INSERT ON {table_name(i)} '
+            'FOR EACH ROW SET NEW.c_001 = COALESCE(NEW.c_001, \'\')'
+        )
+    return statements
+
+
+SCHEMA_BUILDERS = {
+    'pgsql': pgsql_schema,
+    'mysql': mysql_schema
+}
@@ -0,0 +1,60 @@
+import hashlib
+import json
+
+from logging import getLogger
+from pathlib import Path
+from typing import Optional
+
+from .storage import read_datasets
+from .storage import write_datasets
+
+
+logger = getLogger('unbound.dbdoc.base')
+
+
+class CatalogCache:
+    '''
+    Collected datasets saved on disk between builds. Each entry is stored with
+    the schema fingerprint it was collected at and is only valid while the
+    fingerprint of the database stays the same.
+    '''
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = Path(cache_dir)
+
+    @staticmethod
+    def make_key(params: dict) -> str:
+        '''Get cache key from parameters which define the collected datasets.'''
+        params_json = json.dumps(params, sort_keys=True, default=str)
+        return hashlib.sha256(params_json.encode('utf8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f'{key}.json.gz'
+
+    def load(self, key: str, fingerprint: str) -> Optional[dict]:
+        '''Return cached datasets for key, or None if they are missing or stale.'''
+        path = self._path(key)
+        if not path.exists():
+            logger.debug(f'Catalog cache miss: {path}')
+            return None
+        try:
+            meta, datasets = read_datasets(path)
+        except Exception as e:
+            logger.debug(f'Failed to read catalog cache {path}: {e}')
+            return None
+        if meta.get('fingerprint') != fingerprint:
+            logger.debug(f'Catalog cache is stale: {path}')
+            return None
+        logger.debug(f'Catalog cache hit: {path}')
+        return datasets
+
+    def save(self, key: str, fingerprint: str, datasets: dict) -> None:
+        path = self._path(key)
+        logger.debug(f'Saving catalog cache: {path}')
+        write_datasets(path, datasets, fingerprint=fingerprint)
+
+
+def set_up_logger(logger_):
+    '''Set up a global logger for functions in this module'''
+    global logger
+    logger = logger_.getChild(__package__.split('.')[-1])
@@ -0,0 +1,64 @@
+from logging import getLogger
+from threading import Lock
+from typing import Callable
+
+
+logger = getLogger('unbound.dbdoc.base')
+
+
+class ConnectionRegistry:
+    '''
+    Database connections opened during one preprocessor run, grouped by
+    database key. A connection is handed out with acquire and returned with
+    release, returned connections are reused by next renderers, so tags which
+    are processed one after another share one connection per database. All
+    connections are closed at the end of the run.
+    '''
+
+    def __init__(self):
+        self._idle = {}
+        self._lock = Lock()
+
+    def acquire(self, key: str, factory: Callable, is_alive: Callable):
+        '''
+        Return a connection for the database identified by key: one of released
+        earlier if is_alive(connection) returns True, or a new one created with
+        factory().
+        '''
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                con = idle.pop() if idle else None
+            if con is None:
+                return factory()
+            if is_alive(con):
+                logger.debug('Reusing database connection')
+                return con
+            logger.debug('Database connection is lost, reconnecting')
+            self._close(con)
+
+    def release(self, key: str, con) -> None:
+        '''Return connection got with acquire so that it may be reused.'''
+        with self._lock:
+            self._idle.setdefault(key, []).append(con)
+
+    def close_all(self):
+        '''Close all connections opened through the registry.'''
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for con in connections:
+                self._close(con)
+
+    @staticmethod
+    def _close(con):
+        try:
+            con.close()
+        except Exception as e:
+            logger.debug(f'Error while closing database connection: {e}')
+
+
+def set_up_logger(logger_):
+    '''Set up a global logger for functions in this module'''
+    global logger
+    logger = logger_.getChild(__package__.split('.')[-1])
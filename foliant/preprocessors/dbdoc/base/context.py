@@ -0,0 +1,50 @@
+from threading import Lock
+from typing import Callable
+
+from .connections import ConnectionRegistry
+from .hooks import HookRegistry
+from .replay import Recordings
+from .templates import TemplateEnvironments
+
+
+class CatalogMemo:
+    '''
+    Unfiltered catalog query results memoized during one preprocessor run,
+    keyed by database connection and query.
+    '''
+
+    def __init__(self):
+        self._results = {}
+        self._locks = {}
+        self._lock = Lock()
+
+    def get(self, key: tuple, fetch: Callable) -> list:
+        '''
+        Return memoized rows for key, calling fetch() on the first request.
+        Concurrent requests for the same key wait for the first fetch.
+        '''
+        with self._lock:
+            key_lock = self._locks.setdefault(key, Lock())
+        with key_lock:
+            if key not in self._results:
+                self._results[key] = fetch()
+        return self._results[key]
+
+
+class RunContext:
+    '''
+    State shared by all renderers during one Preprocessor.apply() run.
+    '''
+
+    def __init__(self):
+        self.connections = ConnectionRegistry()
+        self.catalog = CatalogMemo()
+        self.templates = TemplateEnvironments()
+        self.recordings = Recordings()
+        # BuildMetrics if timings are collected during the run
+        self.metrics = None
+        self.hooks = HookRegistry()
+
+    def close(self):
+        '''Release all resources acquired during the run.'''
+        self.connections.close_all()
@@ -0,0 +1,86 @@
+import re
+
+
+OPERATORS = ('in', 'not_in', 'eq', 'not_eq', 'regex', 'not_regex')
+
+
+class RowFilter:
+    '''
+    Client-side equivalent of the SQL predicates which QueryBase builds from
+    the `filters` option. Used to filter rows of an unfiltered query.
+
+    filters (dict)      — value of the `filters` option;
+    keys (dict)         — filtering field name → key of the field in result rows,
+                          fields which are not in keys are ignored, just as
+                          fields which are not in QueryBase._filter_fields;
+    operators (tuple)   — operators supported by the DBMS, others are ignored;
+    ignore_case (bool)  — compare values case-insensitively, like DBMS with
+                          case-insensitive collations do.
+    '''
+
+    def __init__(self,
+                 filters: dict,
+                 keys: dict,
+                 operators: tuple = OPERATORS,
+                 ignore_case: bool = False):
+        self._ignore_case = ignore_case
+        self._checks = []
+        for operator, fields in filters.items():
+            if operator not in operators:
+                continue
+            for field, value in fields.items():
+                if field not in keys:
+                    continue
+                check = getattr(self, f'_{operator}')(value)
+                self._checks.append((keys[field], check))
+
+    def __call__(self, row) -> bool:
+        return all(check(self._norm(row[key])) for key, check in self._checks)
+
+    def apply(self, rows: list) -> list:
+        '''Return list of rows which satisfy all filters.'''
+        if not self._checks:
+            return list(rows)
+        return [row for row in rows if self(row)]
+
+    def _norm(self, value) -> str:
+        value = str(value)
+        return value.lower() if self._ignore_case else value
+
+    def _eq(self, value):
+        value = self._norm(value)
+        return lambda field: field == value
+
+    def _not_eq(self, value):
+        value = self._norm(value)
+        return lambda field: field != value
+
+    def _in(self, value: list):
+        values = {self._norm(v) for v in value}
+        return lambda field: field in values
+
+    def _not_in(self, value: list):
+        values = {self._norm(v) for v in value}
+        return lambda field: field not in values
+
+    def _regex(self, value: str):
+        pattern = re.compile(value, re.IGNORECASE if self._ignore_case else 0)
+        return lambda field: pattern.search(field) is not None
+
+    def _not_regex(self, value: str):
+        pattern = re.compile(value, re.IGNORECASE if self._ignore_case else 0)
+        return lambda field: pattern.search(field) is None
+
+
+def filter_rows(rows: list, filters: dict, query_class) -> list:
+    '''
+    Filter rows got with unfiltered query of query_class on client side, using
+    result row keys from query_class._filter_keys.
+    '''
+    row_filter = RowFilter(
+        filters,
+        query_class._filter_keys,
+        query_class._filter_operators,
+        query_class._filter_ignore_case
+    )
+    return row_filter.apply(rows)
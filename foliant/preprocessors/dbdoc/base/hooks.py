@@ -0,0 +1,70 @@
+from importlib import import_module
+from logging import getLogger
+
+
+logger = getLogger('unbound.dbdoc.base')
+
+
+def load_hook(path: str):
+    '''
+    Import hook by dotted path like `package.module.Hook`. A class is
+    instantiated without arguments, other objects (e.g. modules) are used as
+    is. The hook must have `before(event)` and/or `after(event)` methods.
+    '''
+    module_name, _, attr = path.rpartition('.')
+    if not module_name:
+        raise RuntimeError(f'Hook path must be a dotted path to an object: {path}')
+    hook = getattr(import_module(module_name), attr)
+    if isinstance(hook, type):
+        hook = hook()
+    if not hasattr(hook, 'before') and not hasattr(hook, 'after'):
+        raise RuntimeError(f'Hook {path} must have before or after method')
+    return hook
+
+
+class HookRegistry:
+    '''
+    Lifecycle hooks called by renderers before and after each measured stage
+    of a tag processing: connect, query, collect_tables, collect_functions,
+    render_md and render_diag. Hooks get a Measurement as the event; they are
+    called from worker threads too if tags or queries are processed
+    concurrently.
+
+    An exception raised by a hook fails the tag, so hooks may enforce time
+    budgets.
+    '''
+
+    def __init__(self, hooks: list = ()):
+        self.hooks = list(hooks)
+
+    @classmethod
+    def from_paths(cls, paths) -> 'HookRegistry':
+        '''Load hooks by dotted paths, a single path may be given as a string.'''
+        if isinstance(paths, str):
+            paths = [paths]
+        hooks = []
+        for path in paths:
+            logger.debug(f'Loading hook: {path}')
+            hooks.append(load_hook(path))
+        return cls(hooks)
+
+    def __bool__(self):
+        return bool(self.hooks)
+
+    def before(self, event) -> None:
+        for hook in self.hooks:
+            before = getattr(hook, 'before', None)
+            if before is not None:
+                before(event)
+
+    def after(self, event) -> None:
+        for hook in self.hooks:
+            after = getattr(hook, 'after', None)
+            if after is not None:
+                after(event)
+
+
+def set_up_logger(logger_):
+    '''Set up a global logger for functions in this module'''
+    global logger
+    logger = logger_.getChild(__package__.split('.')[-1])
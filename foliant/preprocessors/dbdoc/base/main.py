@@ -1,40 +1,167 @@
+import hashlib
 import os
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from copy import copy
+from copy import deepcopy
+from io import StringIO
 from logging import getLogger
+from operator import itemgetter
+from queue import Queue
+from time import perf_counter
+from typing import Callable
+from typing import Iterator
+from typing import Optional
+from typing import TextIO
 from pkg_resources import resource_filename
 
 from jinja2 import Environment
-from jinja2 import FileSystemLoader
+from jinja2 import Template
 
 from foliant.contrib.combined_options import CombinedOptions
 
+from .cache import CatalogCache
+from .filters import filter_rows
+from .metrics import Measurement
+from .replay import Recording
+from .replay import RecordingConnection
+from .replay import ReplayConnection
+from .rows import defer_columns
+from .storage import read_datasets
+from .storage import write_datasets
+from .templates import find_template_attributes
+from .templates import find_template_variables
+from .templates import make_environment
 
-logger = getLogger('unbound.dbdoc.pgsql')
+
+logger = getLogger('unbound.dbdoc.base')
 
 
 class LibraryNotInstalledError(Exception):
     pass
 
 
+def key_getter(fields: tuple):
+    '''
+    Return a function which gets a tuple of `fields` values from a row. Used
+    as a key for grouping and joining query results.
+    '''
+    if len(fields) == 1:
+        field = fields[0]
+        return lambda row: (row[field],)
+    return itemgetter(*fields)
+
+
+def group_rows(rows: list, fields: tuple) -> dict:
+    '''
+    Group rows by values of `fields` in one pass.
+
+    Returns a dictionary where key is a tuple of field values and value is a list
+    of rows with these values in the same order as they were in `rows`.
+    '''
+    get_key = key_getter(fields)
+    result = {}
+    for row in rows:
+        key = get_key(row)
+        group = result.get(key)
+        if group is None:
+            result[key] = [row]
+        else:
+            group.append(row)
+    return result
+
+
 class DBRendererBase:
+    # defaults of options which are common for all DBMS, backend-specific
+    # defaults take precedence
+    base_defaults = {
+        'memoize_catalog': False,
+        'cache_dir': None,
+        'snapshot': None,
+        'from_snapshot': None,
+        'max_workers': 1,
+        'fetch_size': None,
+        'template_cache_dir': None,
+        'lazy_definitions': True,
+        'collection_mode': 'queries',
+        'record_queries': None,
+        'replay_queries': None,
+        'replay_latency': 0
+    }
     defaults = {}
     module_name = __name__
 
-    def __init__(self, config):
+    # catalog queries needed for each component: {component: {dataset: query class}}
+    component_queries = {}
+
+    # query which returns a single row identifying the state of the database
+    # schema, used to invalidate catalog cache
+    fingerprint_query = None
+
+    # options which define collected datasets, used as catalog cache key
+    cache_key_options = ('host', 'port', 'dbname', 'user', 'filters', 'components')
+
+    # Fields used to join query results in collect_tables and collect_functions.
+    # Last field in 'columns' is the column name, the rest must correspond to
+    # 'tables' fields. 'foreign_keys' fields are matched against table fields
+    # plus the column name.
+    join_fields = {
+        'tables': ('TABLE_NAME',),
+        'columns': ('TABLE_NAME', 'COLUMN_NAME'),
+        'foreign_keys': ('TABLE_NAME', 'COLUMN_NAME'),
+        'functions': ('specific_name',),
+        'parameters': ('specific_name',)
+    }
+
+    def __init__(self, config, run_context=None, tag: str = None):
         self.config = config
+        self.run_context = run_context
+        # tag location in the sources, used in the timing report
+        self.tag = tag
 
     def process(self, tag_options) -> str:
+        '''Render documentation for the tag and return it as a string.'''
+        out = StringIO()
+        self.write(tag_options, out)
+        return out.getvalue()
+
+    def write(self, tag_options, out: TextIO) -> None:
+        '''
+        Render documentation for the tag into the file-like object out chunk by
+        chunk. The database connection is released only after the
+        documentation is written, so that deferred definitions may be loaded
+        while rendering.
+        '''
         self.options = CombinedOptions(
             {
                 'config': self.config,
                 'tag': tag_options
             },
             priority='tag',
-            defaults=self.defaults
+            defaults={**self.base_defaults, **self.defaults}
         )
 
-        self.connect()
-        return self.gen_docs()
+        if self.options['from_snapshot']:
+            data = self.load_snapshot(self.options['from_snapshot'])
+            self.write_docs(data, out)
+            return
+
+        self.con = None
+        with self.measure('connect'):
+            if self.options['replay_queries']:
+                self.connect_replay()
+            else:
+                self.connect()
+        try:
+            data = self.get_datasets()
+            if self.options['snapshot']:
+                self.save_snapshot(self.options['snapshot'], data)
+            self.write_docs(data, out)
+        finally:
+            if self.con is not None:
+                self.release_connection(self.con)
+                self.con = None
 
     def connect(self):
         """
@@ -42,6 +169,137 @@ class DBRendererBase:
         """
         raise NotImplementedError
 
+    def get_connection(self, key: str, factory: Callable):
+        '''
+        Return connection to the database identified by key (e.g. connection
+        string). During the preprocessor run connections are taken from the run
+        context registry and reused by all tags which point to the same database.
+        Outside of the run a new connection is created with factory().
+
+        The key may contain the password, so only its hash is kept in
+        connection_key, which identifies the database in the registries.
+
+        The connection is held by the renderer until the tag is processed.
+        '''
+        key_hash = hashlib.sha256(key.encode('utf8')).hexdigest()
+        self.connection_key = f'{self.module_name}:{key_hash}'
+        self.connection_factory = factory
+        if self.options['record_queries']:
+            recording = self.get_recording(self.options['record_queries'])
+            self.connection_key += f':record:{recording.path}'
+            self.connection_factory = lambda: RecordingConnection(factory(), recording)
+        return self.acquire_connection()
+
+    def connect_replay(self):
+        '''
+        Instead of connecting to the database, get a connection which serves
+        results of statements recorded with the record_queries option.
+        '''
+        path = self.options['replay_queries']
+        latency = self.options['replay_latency']
+        self.con = self.get_connection(
+            f'replay:{path}',
+            lambda: ReplayConnection(self.get_recording(path, load=True), latency)
+        )
+
+    def get_recording(self, path: str, load: bool = False) -> Recording:
+        '''
+        Get recording of queries for path, shared by all tags of the run: loaded
+        from the file if load is true, new otherwise.
+        '''
+        if self.run_context is None:
+            return Recording.load(path) if load else Recording(path)
+        return self.run_context.recordings.get(path, load)
+
+    def acquire_connection(self):
+        '''
+        Get a connection to the database set up with get_connection. During the
+        preprocessor run connections are kept in the run context registry and
+        reused by other tags.
+        '''
+        if self.run_context is None:
+            return self.connection_factory()
+        return self.run_context.connections.acquire(
+            self.connection_key,
+            self.connection_factory,
+            # replay connections don't lose the database, and liveness checks
+            # would need statements which were never recorded
+            lambda con: isinstance(con, ReplayConnection) or self.is_alive(con)
+        )
+
+    def release_connection(self, con) -> None:
+        '''Return connection got with acquire_connection.'''
+        if self.run_context is None:
+            con.close()
+        else:
+            self.run_context.connections.release(self.connection_key, con)
+
+    def get_database_label(self) -> str:
+        '''Identify the database in the timing report, without the password.'''
+        dbms = self.module_name.split('.')[-2]
+        return (
+            f"{dbms}://{self.options.get('user')}@{self.options.get('host')}:"
+            f"{self.options.get('port')}/{self.options.get('dbname')}"
+        )
+
+    @contextmanager
+    def measure(self, stage: str, name: str = None, sql: str = None):
+        '''
+        Measure wall time of the block as a stage of this tag. Row count and
+        size of the stage result may be set on the yielded Measurement.
+
+        The measurement is passed to lifecycle hooks before and after the block
+        and recorded to the timing report. Nothing is measured if timing is off
+        and there are no hooks.
+        '''
+        metrics = self.run_context.metrics if self.run_context is not None else None
+        hooks = self.run_context.hooks if self.run_context is not None else None
+        if metrics is None and not hooks:
+            yield Measurement(enabled=False)
+            return
+
+        measurement = Measurement(
+            stage,
+            name=name,
+            tag=self.tag,
+            database=self.get_database_label(),
+            sql=sql
+        )
+        if hooks:
+            hooks.before(measurement)
+        start = perf_counter()
+        try:
+            yield measurement
+        except Exception as e:
+            measurement.error = e
+            raise
+        finally:
+            measurement.seconds = perf_counter() - start
+            if metrics is not None:
+                metrics.add(measurement)
+            if hooks:
+                hooks.after(measurement)
+
+    def execute_query(self, query, title: str):
+        '''Run query object, logging its sql and measuring it as title.'''
+        sql = query.sql
+        logger.debug(f'{title}:\n\n {sql}')
+        with self.measure('query', title, sql) as measurement:
+            result = query.run()
+            measurement.set_result(result)
+        return result
+
+    def is_alive(self, con) -> bool:
+        '''Check that the connection may be reused.'''
+        try:
+            cur = con.cursor()
+            cur.execute('SELECT 1')
+            cur.fetchall()
+            cur.close()
+        except Exception:
+            return False
+        return True
+
     def get_template(self, key: str, default_name: str):
         template_path = self.options.get(key)
         if template_path:
@@ -62,34 +320,387 @@ class DBRendererBase:
         DEFAULT_NAME = 'scheme.j2'
         return self.get_template(KEY, DEFAULT_NAME)
 
-    def gen_docs(self) -> str:
-        data = self.collect_datasets()
+    def gen_docs(self, data: dict) -> Iterator[str]:
+        '''
+        Render documentation chunk by chunk, without building the whole text
+        in memory.
+        '''
+        if self.options['doc']:
+            with self.measure('render_md') as measurement:
+                size = 0
+                for chunk in self.generate_md(data, self.get_doc_template()):
+                    size += len(chunk)
+                    yield chunk
+                measurement.bytes = size
+        if self.options['scheme']:
+            yield '\n\n'
+            with self.measure('render_diag') as measurement:
+                size = 0
+                for chunk in self.generate_diag(data, self.get_scheme_template()):
+                    size += len(chunk)
+                    yield chunk
+                measurement.bytes = size
+
+    def write_docs(self, data: dict, out: TextIO) -> None:
+        '''Write documentation to the file-like object out as it is rendered.'''
+        for chunk in self.gen_docs(data):
+            out.write(chunk)
+
+    def get_datasets(self) -> dict:
+        '''
+        Return datasets for templates. If cache_dir option is set, datasets are
+        taken from the catalog cache while the schema fingerprint of the database
+        stays the same, and collected from the database otherwise.
+        '''
+        if not self.options['cache_dir']:
+            return self.collect_datasets()
+
+        cache = CatalogCache(self.options['cache_dir'])
+        key = cache.make_key(
+            {
+                'module': self.module_name,
+                **{option: self.options.get(option) for option in self.cache_key_options},
+                'components': self.get_used_components()
+            }
+        )
+        fingerprint = self.get_fingerprint()
+        data = cache.load(key, fingerprint)
+        if data is None:
+            data = self.collect_datasets()
+            cache.save(key, fingerprint, data)
+        return data
+
+    def save_snapshot(self, path: str, data: dict) -> None:
+        '''Save collected datasets to the snapshot file.'''
+        logger.debug(f'Saving catalog snapshot: {path}')
+        write_datasets(path, data, dbms=self.module_name)
+
+    def load_snapshot(self, path: str) -> dict:
+        '''
+        Load datasets from the snapshot file, saved with the snapshot option, so
+        that documentation is rendered without connecting to the database.
+        '''
+        logger.debug(f'Loading catalog snapshot: {path}')
+        meta, data = read_datasets(path)
+        if meta.get('dbms') != self.module_name:
+            raise RuntimeError(
+                f'Snapshot {path} was recorded for {meta.get("dbms")}, '
+                f'not for {self.module_name}'
+            )
+        return data
+
+    def get_fingerprint(self) -> str:
+        '''
+        Get a cheap fingerprint of the database schema, which changes whenever
+        the schema is changed. Only schemas selected by the schema filter are
+        fingerprinted, so changes in other schemas keep the cache.
+        '''
+        query = self.fingerprint_query(self.con, self.options.get('filters', {}))
+        row = self.execute_query(query, 'Fingerprint query')[0]
+        return '|'.join(str(value) for value in row.values())
+
+    def collect_datasets(self) -> dict:
+        '''
+        Run catalog queries for components used in templates and fill the datasets
+        for templates: 'tables' with columns and foreign keys, 'functions' with
+        parameters (if the DBMS has a parameters query), other components as is.
+        '''
+        components = self.get_used_components()
+        queries = {}
+        for component in components:
+            queries.update(self.get_component_queries()[component])
+
+        rows = self.run_queries(queries)
 
-        docs = ''
+        result = {}
+        for component in components:
+            if component == 'tables':
+                # fill each table with columns and foreign keys
+                with self.measure('collect_tables') as measurement:
+                    result['tables'] = self.collect_tables(
+                        rows['tables'],
+                        rows['columns'],
+                        rows['foreign_keys']
+                    )
+                    measurement.rows = len(result['tables'])
+            elif component == 'functions' and 'parameters' in rows:
+                # fill each function with its parameters
+                with self.measure('collect_functions') as measurement:
+                    result['functions'] = self.collect_functions(
+                        rows['functions'],
+                        rows['parameters']
+                    )
+                    measurement.rows = len(result['functions'])
+            else:
+                result[component] = rows[component]
+        return result
 
+    def get_component_queries(self) -> dict:
+        '''Return catalog queries for each component: {component: {dataset: query class}}'''
+        return self.component_queries
+
+    def get_used_components(self) -> list:
+        '''
+        Return components from options which are referenced by the templates
+        that will be rendered, so that queries for other components are skipped.
+
+        All components are used if the snapshot option is set (the snapshot must
+        have all data for any template), or if the templates refer to other
+        templates by names known only at render time.
+        '''
+        components = [c for c in self.options['components'] if c in self.get_component_queries()]
+        if self.options['snapshot']:
+            return components
+
+        variables = set()
         if self.options['doc']:
-            docs += self.to_md(data, self.get_doc_template())
+            doc_variables = self.get_template_variables(self.get_doc_template())
+            if doc_variables is None:
+                return components
+            variables |= doc_variables
         if self.options['scheme']:
-            docs += '\n\n' + self.to_diag(data, self.get_scheme_template())
-        return docs
+            # scheme template only gets tables
+            scheme_variables = self.get_template_variables(self.get_scheme_template())
+            if scheme_variables is None or 'tables' in scheme_variables:
+                variables.add('tables')
 
-    def collect_datasets(self) -> dict:
-        raise NotImplementedError
+        used = [c for c in components if c in variables]
+        skipped = [c for c in components if c not in variables]
+        if skipped:
+            logger.debug(f'Components are not used in templates, skipping: {skipped}')
+        return used
 
-    def to_md(self, data: dict, template: str) -> str:
-        template_root, template_name = os.path.split(template)
-        with open(template, encoding='utf8') as f:
-            # template = Template(f.read())
-            template = Environment(loader=FileSystemLoader(template_root)).from_string(f.read())
+    def run_queries(self, queries: dict) -> dict:
+        '''
+        Run catalog queries {dataset name: query class} and return
+        {dataset name: rows}.
 
-        return template.render(**data)
+        Queries are independent from each other, so if max_workers option is
+        greater than 1, they are run concurrently in a thread pool of this size,
+        each worker using its own connection to the database.
+        '''
+        titles = {name: name.replace('_', ' ').capitalize() for name in queries}
+        workers = min(self.options['max_workers'], len(queries))
+        if workers <= 1:
+            return {
+                name: self.run_query(query_class, titles[name])
+                for name, query_class in queries.items()
+            }
 
-    def to_diag(self, data: dict, template: str) -> str:
+        connections = Queue()
+        connections.put(self.con)
+        extra_connections = []
+        for _ in range(workers - 1):
+            try:
+                con = self.acquire_connection()
+            except Exception as e:
+                logger.debug(f'Failed to open connection for concurrent queries: {e}')
+                break
+            extra_connections.append(con)
+            connections.put(con)
+        logger.debug(f'Running {len(queries)} queries with {connections.qsize()} workers')
+
+        def run(query_class, title):
+            con = connections.get()
+            try:
+                return self.run_query(query_class, title, con)
+            finally:
+                connections.put(con)
+
+        try:
+            with ThreadPoolExecutor(max_workers=connections.qsize()) as executor:
+                futures = {
+                    name: executor.submit(run, query_class, titles[name])
+                    for name, query_class in queries.items()
+                }
+                return {name: future.result() for name, future in futures.items()}
+        finally:
+            for con in extra_connections:
+                self.release_connection(con)
+
+    def run_query(self, query_class, title: str, con=None) -> list:
+        '''
+        Run catalog query of query_class with filters from options and return
+        the list of rows. Query is run on self.con unless other connection is
+        supplied in con.
+
+        If lazy_definitions option is on and the doc template doesn't refer to
+        large definition columns (view and function sources, trigger
+        statements), they are left out of the query and fetched for all rows at
+        once on first access.
+
+        If memoize_catalog option is on, the query is run without filters once
+        per database during the preprocessor run. Each tag then gets these rows
+        filtered on client side.
+        '''
+        if con is None:
+            con = self.con
+        filters = self.options.get('filters', {})
+        if self.run_context is None or not self.options.get('memoize_catalog'):
+            defer = self.defer_definitions(query_class)
+            query = query_class(
+                con,
+                filters,
+                fetch_size=self.options['fetch_size'],
+                defer_definitions=defer
+            )
+            rows = self.execute_query(query, f'{title} query')
+            if defer:
+                self.defer_rows(rows, query_class, title)
+            return rows
+
+        def fetch():
+            query = query_class(con, fetch_size=self.options['fetch_size'])
+            return self.execute_query(query, f'{title} query (memoized)')
+
+        rows = self.run_context.catalog.get((self.connection_key, query_class), fetch)
+        return filter_rows(rows, filters, query_class)
+
+    def defer_definitions(self, query_class) -> bool:
+        '''
+        Whether definition columns of query_class are fetched with
+        load_definitions: only if lazy_definitions option is on and the doc
+        template doesn't refer to them, otherwise deferring them would cost an
+        extra query. Datasets saved to the catalog cache or snapshot have all
+        definitions, so they are never deferred with cache_dir or snapshot.
+        '''
+        if not (self.options['lazy_definitions'] and query_class._definitions):
+            return False
+        if self.options['cache_dir'] or self.options['snapshot']:
+            return False
+        return not self.definitions_used(query_class)
+
+    def definitions_used(self, query_class) -> bool:
+        '''Whether the doc template may refer to definition columns of query_class.'''
+        if not self.options['doc']:
+            return False
+        names = self.get_template_attributes(self.get_doc_template())
+        return names is None or any(key in names for key in query_class._definition_keys)
+
+    def defer_rows(self, rows: list, query_class, title: str) -> list:
+        '''Make definition columns of rows got with deferred query_class load lazily.'''
+        return defer_columns(
+            rows,
+            query_class._definition_keys,
+            query_class._row_keys,
+            lambda: self.load_definitions(query_class, title)
+        )
+
+    def load_definitions(self, query_class, title: str) -> list:
+        '''
+        Run the query of query_class which selects row keys and definition
+        columns to get deferred definitions of all rows at once. Called while
+        rendering the templates, so self.con is still open.
+        '''
+        if self.con is None:
+            raise RuntimeError(f'Cannot load {title.lower()} definitions: connection is closed')
+        query = query_class(
+            self.con,
+            self.options.get('filters', {}),
+            fetch_size=self.options['fetch_size'],
+            definitions_only=True
+        )
+        return self.execute_query(query, f'{title} definitions query')
+
+    def collect_tables(self,
+                       tables: list,
+                       columns: list,
+                       fks: list) -> list:
+        '''
+        Parse table and column query results got from db and:
+
+        - add 'columns' attribute to each table row with list of table columns;
+        - add 'foreign_keys' attribute to each column with list of fks if it is a
+          forign key column.
+
+        Columns and foreign keys are grouped by join_fields in one pass, so the
+        whole join takes linear time.
+
+        returns transformed list of tables.
+        '''
+
+        table_key = key_getter(self.join_fields['tables'])
+        column_name = self.join_fields['columns'][-1]
+        columns_by_table = group_rows(columns, self.join_fields['columns'][:-1])
+        fks_by_column = group_rows(fks, self.join_fields['foreign_keys'])
+
+        result = deepcopy(tables)
+        for table in result:
+            key = table_key(table)
+            # get columns for this table
+            table_columns = []
+            for col in columns_by_table.get(key, ()):
+                # column rows may be shared by several tags, don't change them in place
+                col = copy(col)
+                # get foreign keys for this column
+                col['foreign_keys'] = list(fks_by_column.get(key + (col[column_name],), ()))
+                table_columns.append(col)
+            table['columns'] = table_columns
+        return result
+
+    def collect_functions(self,
+                          functions: list,
+                          parameters: list) -> list:
+        '''
+        Parse function and parameter query results got from db and add 'parameters'
+        key to each function filled with its parameters
+        '''
+
+        function_key = key_getter(self.join_fields['functions'])
+        params_by_function = group_rows(parameters, self.join_fields['parameters'])
+
+        result = deepcopy(functions)
+        for func in result:
+            # get parameters for this function
+            func['parameters'] = list(params_by_function.get(function_key(func), ()))
+        return result
+
+    def get_environment(self, template_root: str) -> Environment:
+        '''
+        Get Jinja environment for templates in template_root. Environments are
+        shared by all tags of the run, so each template is compiled once.
+        '''
+        bytecode_cache_dir = self.options['template_cache_dir']
+        if self.run_context is None:
+            return make_environment(template_root, bytecode_cache_dir)
+        return self.run_context.templates.get(template_root, bytecode_cache_dir)
+
+    def load_template(self, template: str) -> Template:
         template_root, template_name = os.path.split(template)
-        with open(template, encoding='utf8') as f:
-            # template = Template(f.read())
-            template = Environment(loader=FileSystemLoader(template_root)).from_string(f.read())
+        return self.get_environment(template_root).get_template(template_name)
 
-        return template.render(
+    def generate_md(self, data: dict, template: str) -> Iterator[str]:
+        template = self.load_template(template)
+        return template.generate(**data)
+
+    def generate_diag(self, data: dict, template: str) -> Iterator[str]:
+        template = self.load_template(template)
+        return template.generate(
             tables=data['tables']
         )
+
+    def get_template_variables(self, template: str) -> Optional[set]:
+        template_root, template_name = os.path.split(template)
+        environment = self.get_environment(template_root)
+        if self.run_context is None:
+            return find_template_variables(environment, template_name)
+        return self.run_context.templates.get_variables(environment, template_name)
+
+    def get_template_attributes(self, template: str) -> Optional[set]:
+        template_root, template_name = os.path.split(template)
+        environment = self.get_environment(template_root)
+        if self.run_context is None:
+            return find_template_attributes(environment, template_name)
+        return self.run_context.templates.get_attributes(environment, template_name)
+
+    def to_md(self, data: dict, template: str) -> str:
+        return ''.join(self.generate_md(data, template))
+
+    def to_diag(self, data: dict, template: str) -> str:
+        return ''.join(self.generate_diag(data, template))
+
+
+def set_up_logger(logger_):
+    '''Set up a global logger for functions in this module'''
+    global logger
+    logger = logger_.getChild(__package__.split('.')[-1])
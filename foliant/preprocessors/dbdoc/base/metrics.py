@@ -0,0 +1,163 @@
+import json
+
+from collections.abc import Mapping
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+
+from .rows import Row
+
+
+logger = getLogger('unbound.dbdoc.base')
+
+
+def measure_result(result) -> tuple:
+    '''
+    Return (row count, approximate size in bytes) of a query result: a list of
+    rows, a dict of such lists or a nested document. Size is the total length
+    of string and bytes values.
+    '''
+    if isinstance(result, Mapping) and not isinstance(result, Row):
+        counts = [measure_result(value) for value in result.values()]
+        return sum(c[0] for c in counts), sum(c[1] for c in counts)
+    if not isinstance(result, list):
+        return 0, 0
+    size = 0
+    for row in result:
+        values = row._values if isinstance(row, Row) else row.values()
+        for value in values:
+            if isinstance(value, (str, bytes)):
+                size += len(value)
+            elif isinstance(value, list):
+                size += measure_result(value)[1]
+    return len(result), size
+
+
+class Measurement:
+    '''
+    One measured stage of a tag processing: connect, query, collect_tables,
+    collect_functions, render_md or render_diag. Row count and size are filled
+    by the measured code, wall time (and the error, if the stage failed) by
+    the renderer. Lifecycle hooks get measurements as events.
+
+    A disabled measurement ignores the result, so that it is not measured
+    when neither timing nor hooks are on.
+    '''
+
+    __slots__ = ('enabled', 'stage', 'name', 'tag', 'database', 'sql',
+                 'seconds', 'rows', 'bytes', 'error')
+
+    def __init__(self,
+                 stage: str = None,
+                 name: str = None,
+                 tag: str = None,
+                 database: str = None,
+                 sql: str = None,
+                 enabled: bool = True):
+        self.enabled = enabled
+        self.stage = stage
+        self.name = name
+        self.tag = tag
+        self.database = database
+        self.sql = sql
+        self.seconds = None
+        self.rows = None
+        self.bytes = None
+        self.error = None
+
+    def set_result(self, result) -> None:
+        if self.enabled:
+            self.rows, self.bytes = measure_result(result)
+
+
+class BuildMetrics:
+    '''
+    Timings of dbdoc stages (connect, queries, joins, rendering) collected by
+    all renderers during one preprocessor run and aggregated into a report
+    per tag and per database.
+    '''
+
+    def __init__(self):
+        self._records = []
+        self._lock = Lock()
+
+    def add(self, measurement: Measurement) -> None:
+        '''Record a finished measurement.'''
+        self.record(
+            measurement.tag,
+            measurement.database,
+            measurement.stage,
+            measurement.seconds,
+            name=measurement.name,
+            rows=measurement.rows,
+            bytes_=measurement.bytes
+        )
+
+    def record(self,
+               tag: str,
+               database: str,
+               stage: str,
+               seconds: float,
+               name: str = None,
+               rows: int = None,
+               bytes_: int = None) -> None:
+        with self._lock:
+            self._records.append({
+                'tag': tag,
+                'database': database,
+                'stage': stage,
+                'name': name,
+                'seconds': seconds,
+                'rows': rows,
+                'bytes': bytes_
+            })
+
+    @staticmethod
+    def _add(totals: dict, record: dict) -> None:
+        total = totals.setdefault(
+            record['stage'],
+            {'count': 0, 'seconds': 0.0, 'rows': 0, 'bytes': 0}
+        )
+        total['count'] += 1
+        total['seconds'] += record['seconds']
+        total['rows'] += record['rows'] or 0
+        total['bytes'] += record['bytes'] or 0
+
+    def report(self) -> dict:
+        '''
+        Aggregate the records: stage totals for the whole run, for each
+        database and for each tag, and all queries of each tag.
+        '''
+        with self._lock:
+            records = list(self._records)
+
+        total = {}
+        databases = {}
+        tags = {}
+        for record in records:
+            self._add(total, record)
+            self._add(databases.setdefault(record['database'], {}), record)
+            tag = tags.setdefault(
+                record['tag'],
+                {'tag': record['tag'], 'database': record['database'], 'stages': {}, 'queries': []}
+            )
+            self._add(tag['stages'], record)
+            if record['stage'] == 'query':
+                tag['queries'].append({
+                    key: record[key] for key in ('name', 'seconds', 'rows', 'bytes')
+                })
+        return {'total': total, 'databases': databases, 'tags': list(tags.values())}
+
+    def write_report(self, path: str) -> None:
+        '''Save the aggregated report as json.'''
+        path = Path(path)
+        logger.debug(f'Saving timing report: {path}')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf8') as f:
+            json.dump(self.report(), f, indent=2)
+
+
+def set_up_logger(logger_):
+    '''Set up a global logger for functions in this module'''
+    global logger
+    logger = logger_.getChild(__package__.split('.')[-1])
@@ -0,0 +1,91 @@
+import cProfile
+import tracemalloc
+
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+from typing import Callable
+
+
+logger = getLogger('unbound.dbdoc.base')
+
+PROFILE_MODES = ('cpu', 'memory')
+
+# number of allocation sites in the memory profile summary
+TOP_ALLOCATIONS = 25
+
+# tracemalloc traces the whole process, so memory profiled tags run one at a time
+_memory_lock = Lock()
+
+
+def get_profile_modes(value) -> tuple:
+    '''
+    Parse the profile option: `cpu`, `memory`, a list of them, or `true`/`all`
+    for both.
+    '''
+    if value is True or value == 'all':
+        return PROFILE_MODES
+    modes = (value,) if isinstance(value, str) else tuple(value)
+    for mode in modes:
+        if mode not in PROFILE_MODES:
+            raise ValueError(
+                f'Unknown profile mode: {mode}. Supported values: {list(PROFILE_MODES)}, all'
+            )
+    return modes
+
+
+def run_profiled(func: Callable, path_stem: Path, modes: tuple):
+    '''
+    Call func() under the profilers of modes and save the results next to
+    path_stem, even if func fails:
+
+    - cpu: cProfile stats in `<path_stem>.prof`;
+    - memory: peak traced memory and top allocation sites by tracemalloc in
+      `<path_stem>.memory.txt`.
+    '''
+    if 'memory' not in modes:
+        return _run_cpu_profiled(func, path_stem, modes)
+
+    with _memory_lock:
+        tracemalloc.start()
+        try:
+            return _run_cpu_profiled(func, path_stem, modes)
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            _write_memory_summary(Path(f'{path_stem}.memory.txt'), snapshot, current, peak)
+
+
+def _run_cpu_profiled(func: Callable, path_stem: Path, modes: tuple):
+    if 'cpu' not in modes:
+        return func()
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        return func()
+    finally:
+        profile.disable()
+        path = Path(f'{path_stem}.prof')
+        logger.debug(f'Saving cpu profile: {path}')
+        profile.dump_stats(path)
+
+
+def _write_memory_summary(path: Path, snapshot, current: int, peak: int) -> None:
+    logger.debug(f'Saving memory profile: {path}')
+    stats = snapshot.statistics('lineno')
+    lines = [
+        f'Peak traced memory: {peak / 1024:.1f} KiB',
+        f'Traced memory at the end: {current / 1024:.1f} KiB',
+        '',
+        f'Top {TOP_ALLOCATIONS} allocation sites still allocated at the end:'
+    ]
+    lines.extend(str(stat) for stat in stats[:TOP_ALLOCATIONS])
+    with open(path, 'w', encoding='utf8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def set_up_logger(logger_):
+    '''Set up a global logger for functions in this module'''
+    global logger
+    logger = logger_.getChild(__package__.split('.')[-1])
@@ -0,0 +1,339 @@
+import base64
+
+from logging import getLogger
+from threading import Lock
+from time import perf_counter
+from time import sleep
+
+from .storage import read_datasets
+from .storage import write_datasets
+
+
+logger = getLogger('unbound.dbdoc.base')
+
+REPLAY_KIND = 'dbdoc-replay'
+
+
+def _encode(value):
+    '''Keep bytes (returned by _mysql) apart from strings in the json file.'''
+    if isinstance(value, bytes):
+        return {'$bytes': base64.b64encode(value).decode('ascii')}
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict) and '$bytes' in value:
+        return base64.b64decode(value['$bytes'])
+    return value
+
+
+class Recording:
+    '''
+    SQL statements executed on recording connections with their result sets
+    (column names and rows) and time spent in the database. Shared by all
+    connections which record to one file; the last result of each statement
+    is kept.
+    '''
+
+    def __init__(self, path: str):
+        self.path = path
+        self.statements = {}
+        self.server_info = None
+        self._lock = Lock()
+
+    def add(self, sql: str) -> dict:
+        '''
+        Start recording a statement execution. The returned entry is filled
+        while the results are fetched.
+        '''
+        entry = {'sql': sql, 'seconds': 0.0, 'results': []}
+        with self._lock:
+            self.statements[sql] = entry
+        return entry
+
+    def get(self, sql: str) -> dict:
+        try:
+            return self.statements[sql]
+        except KeyError:
+            raise RuntimeError(f'Statement was not recorded in {self.path}:\n{sql}')
+
+    def save(self) -> None:
+        logger.debug(f'Saving recorded queries: {self.path}')
+        with self._lock:
+            statements = [
+                {
+                    **entry,
+                    'results': [
+                        {
+                            'description': result['description'],
+                            'rows': [[_encode(v) for v in row] for row in result['rows']]
+                        }
+                        for result in entry['results']
+                    ]
+                }
+                for entry in self.statements.values()
+            ]
+            write_datasets(
+                self.path,
+                {'statements': statements, 'server_info': self.server_info},
+                kind=REPLAY_KIND
+            )
+
+    @classmethod
+    def load(cls, path: str) -> 'Recording':
+        logger.debug(f'Loading recorded queries: {path}')
+        meta, data = read_datasets(path)
+        if meta.get('kind') != REPLAY_KIND:
+            raise RuntimeError(f'{path} is not a file with recorded queries')
+        recording = cls(path)
+        recording.server_info = data['server_info']
+        for entry in data['statements']:
+            for result in entry['results']:
+                result['rows'] = [tuple(_decode(v) for v in row) for row in result['rows']]
+            recording.statements[entry['sql']] = entry
+        return recording
+
+
+class Recordings:
+    '''Recordings used during one preprocessor run, one per file.'''
+
+    def __init__(self):
+        self._recordings = {}
+        self._lock = Lock()
+
+    def get(self, path: str, load: bool = False) -> Recording:
+        '''
+        Return the recording for path: loaded from the file if load is true,
+        new otherwise.
+        '''
+        with self._lock:
+            if path not in self._recordings:
+                self._recordings[path] = Recording.load(path) if load else Recording(path)
+            return self._recordings[path]
+
+
+class RecordingConnection:
+    '''
+    Wrapper of a DB-API or _mysql connection which records executed
+    statements with their results. The recording is saved when the
+    connection is closed.
+    '''
+
+    def __init__(self, con, recording: Recording):
+        self._con = con
+        self._recording = recording
+        self._entry = None
+
+    def cursor(self, *args, **kwargs):
+        return RecordingCursor(self._con.cursor(*args, **kwargs), self._recording)
+
+    def query(self, sql: str):
+        self._entry = self._recording.add(sql)
+        start = perf_counter()
+        self._con.query(sql)
+        self._entry['seconds'] += perf_counter() - start
+
+    def store_result(self):
+        return RecordingMySQLResult(self._con.store_result(), self._entry)
+
+    def use_result(self):
+        return RecordingMySQLResult(self._con.use_result(), self._entry)
+
+    def get_server_info(self):
+        self._recording.server_info = self._con.get_server_info()
+        return self._recording.server_info
+
+    def close(self):
+        try:
+            self._con.close()
+        finally:
+            self._recording.save()
+
+    def __getattr__(self, name):
+        return getattr(self._con, name)
+
+
+class RecordingCursor:
+    '''DB-API cursor wrapper which records results of executed statements.'''
+
+    def __init__(self, cur, recording: Recording):
+        self.__dict__['_cur'] = cur
+        self.__dict__['_recording'] = recording
+        self.__dict__['_entry'] = None
+
+    def _measure(self, method, *args):
+        start = perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._entry['seconds'] += perf_counter() - start
+
+    def _add_result(self):
+        description = self._cur.description
+        self._entry['results'].append({
+            'description': [d[0] for d in description] if description else [],
+            'rows': []
+        })
+
+    def execute(self, sql: str, *args):
+        self.__dict__['_entry'] = self._recording.add(sql)
+        self._measure(self._cur.execute, sql, *args)
+        self._add_result()
+        return self
+
+    def fetchall(self):
+        rows = self._measure(self._cur.fetchall)
+        self._entry['results'][-1]['rows'].extend(tuple(row) for row in rows)
+        return rows
+
+    def fetchmany(self, *args):
+        rows = self._measure(self._cur.fetchmany, *args)
+        self._entry['results'][-1]['rows'].extend(tuple(row) for row in rows)
+        return rows
+
+    def nextset(self):
+        has_next = self._measure(self._cur.nextset)
+        if has_next:
+            self._add_result()
+        return has_next
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cur, name, value)
+
+
+class RecordingMySQLResult:
+    '''_mysql result wrapper which records fetched rows.'''
+
+    def __init__(self, result, entry: dict):
+        self._result = result
+        self._entry = entry
+        entry['results'].append({
+            'description': [d[0] for d in result.describe()],
+            'rows': []
+        })
+
+    def describe(self):
+        return self._result.describe()
+
+    def fetch_row(self, maxrows: int = 1, *args):
+        start = perf_counter()
+        rows = self._result.fetch_row(maxrows, *args)
+        self._entry['seconds'] += perf_counter() - start
+        self._entry['results'][-1]['rows'].extend(rows)
+        return rows
+
+
+class ReplayConnection:
+    '''
+    Connection which serves results of recorded statements instead of a
+    database, through DB-API and _mysql interfaces.
+
+    latency — seconds to wait for each statement, or 'recorded' to wait as
+    long as the statement took when it was recorded.
+    '''
+
+    # attributes of an open psycopg2 connection, checked before reuse
+    closed = False
+
+    def __init__(self, recording: Recording, latency=0):
+        self._recording = recording
+        self._latency = latency
+        self._entry = None
+
+    def get_statement(self, sql: str) -> dict:
+        '''Get the recorded entry for sql, simulating latency.'''
+        entry = self._recording.get(sql)
+        latency = entry['seconds'] if self._latency == 'recorded' else self._latency
+        if latency:
+            sleep(latency)
+        return entry
+
+    def cursor(self, *args, **kwargs):
+        return ReplayCursor(self)
+
+    def query(self, sql: str):
+        self._entry = self.get_statement(sql)
+
+    def store_result(self):
+        return ReplayMySQLResult(self._entry['results'][0])
+
+    use_result = store_result
+
+    def get_server_info(self):
+        return self._recording.server_info
+
+    def ping(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class ReplayCursor:
+    def __init__(self, con: ReplayConnection):
+        self._con = con
+        self._results = []
+        self._rows = []
+        self._pos = 0
+        self.description = None
+        self.arraysize = 1
+        self.itersize = 2000
+
+    def _set_result(self, result: dict):
+        self.description = [(name, None, None, None, None, None, None)
+                            for name in result['description']]
+        self._rows = result['rows']
+        self._pos = 0
+
+    def execute(self, sql: str, *args):
+        self._results = list(self._con.get_statement(sql)['results'])
+        self._set_result(self._results.pop(0))
+        return self
+
+    def fetchall(self):
+        rows = self._rows[self._pos:]
+        self._pos = len(self._rows)
+        return rows
+
+    def fetchmany(self, size: int = None):
+        size = size or self.arraysize
+        rows = self._rows[self._pos:self._pos + size]
+        self._pos += len(rows)
+        return rows
+
+    def nextset(self):
+        if not self._results:
+            return False
+        self._set_result(self._results.pop(0))
+        return True
+
+    def close(self):
+        pass
+
+
+class ReplayMySQLResult:
+    def __init__(self, result: dict):
+        self._keys = result['description']
+        self._rows = result['rows']
+        self._pos = 0
+
+    def describe(self):
+        return tuple((key,) for key in self._keys)
+
+    def fetch_row(self, maxrows: int = 1, *args):
+        end = len(self._rows) if maxrows == 0 else self._pos + maxrows
+        rows = self._rows[self._pos:end]
+        self._pos += len(rows)
+        return tuple(rows)
+
+
+def set_up_logger(logger_):
+    '''Set up a global logger for functions in this module'''
+    global logger
+    logger = logger_.getChild(__package__.split('.')[-1])
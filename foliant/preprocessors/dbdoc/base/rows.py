@@ -0,0 +1,175 @@
+from collections.abc import MutableMapping
+from copy import deepcopy
+from typing import Callable
+
+
+_DELETED = object()
+
+
+class DeferredColumns:
+    '''
+    Columns of a query result which were not fetched with the rows. On first
+    access to any of them, load() is called to fetch rows with these columns
+    for the whole result at once; they are matched to the fetched rows by
+    values of key_fields.
+    '''
+
+    def __init__(self, fields: tuple, key_fields: tuple, load: Callable):
+        self.fields = tuple(fields)
+        self.key_fields = tuple(key_fields)
+        self._load = load
+        self._rows = None
+
+    def get(self, row, field: str):
+        if self._rows is None:
+            self._rows = {self._key(loaded): loaded for loaded in self._load()}
+        loaded = self._rows.get(self._key(row))
+        return loaded[field] if loaded is not None else ''
+
+    def _key(self, row) -> tuple:
+        return tuple(row[key] for key in self.key_fields)
+
+
+class Columns:
+    '''
+    Column names of a query result with their positions. One instance is
+    shared by all rows of the result. Names of deferred columns follow the
+    fetched ones, their values are got from DeferredColumns.
+    '''
+
+    __slots__ = ('names', 'index', 'deferred')
+
+    def __init__(self, names, deferred: DeferredColumns = None):
+        self.index = {name: i for i, name in enumerate(names)}
+        self.deferred = deferred
+        self.names = tuple(self.index) + (deferred.fields if deferred else ())
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index or (self.deferred is not None and name in self.deferred.fields)
+
+
+class Row(MutableMapping):
+    '''
+    Compact query result row: a tuple of values plus a reference to the shared
+    Columns of the result. Behaves like a dict keyed by column names, so
+    templates access fields as row['column_name'].
+
+    Keys set after the row was fetched (like `columns` of a table or
+    `foreign_keys` of a column) are kept in a separate dict.
+    '''
+
+    __slots__ = ('_columns', '_values', '_extra')
+
+    def __init__(self, columns: Columns, values: tuple, extra: dict = None):
+        self._columns = columns
+        self._values = values
+        self._extra = extra
+
+    def __getitem__(self, key):
+        if self._extra is not None and key in self._extra:
+            value = self._extra[key]
+            if value is _DELETED:
+                raise KeyError(key)
+            return value
+        index = self._columns.index.get(key)
+        if index is not None:
+            return self._values[index]
+        deferred = self._columns.deferred
+        if deferred is not None and key in deferred.fields:
+            return deferred.get(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        if key in self._columns:
+            self[key] = _DELETED
+        else:
+            del self._extra[key]
+
+    def __iter__(self):
+        extra = self._extra or {}
+        for key in self._columns.names:
+            if extra.get(key) is not _DELETED:
+                yield key
+        for key in extra:
+            if key not in self._columns:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __contains__(self, key):
+        if self._extra is not None and key in self._extra:
+            return self._extra[key] is not _DELETED
+        return key in self._columns
+
+    def __copy__(self):
+        extra = dict(self._extra) if self._extra is not None else None
+        return Row(self._columns, self._values, extra)
+
+    def __deepcopy__(self, memo):
+        extra = deepcopy(self._extra, memo) if self._extra is not None else None
+        return Row(self._columns, self._values, extra)
+
+    def __repr__(self):
+        return f'Row({dict(self)!r})'
+
+    def copy(self):
+        return self.__copy__()
+
+
+def make_rows(keys, batch, convert=None) -> list:
+    '''
+    Turn a batch of fetched tuples into Row objects sharing one Columns
+    instance (or `keys` itself if it is a Columns already).
+
+    Values are coerced column by column: NULLs and other false values become
+    empty strings, and `convert` (if set) is applied to the remaining values,
+    e.g. to decode bytes returned by the driver.
+    '''
+    columns = keys if isinstance(keys, Columns) else Columns(keys)
+    if not batch:
+        return []
+    if convert is None:
+        coerced = ([v or '' for v in column] for column in zip(*batch))
+    else:
+        coerced = ([convert(v) if v else '' for v in column] for column in zip(*batch))
+    return [Row(columns, values) for values in zip(*coerced)]
+
+
+def defer_columns(rows: list, fields: tuple, key_fields: tuple, load: Callable) -> list:
+    '''
+    Make columns fields of rows (got from one query) deferred: their values
+    will be taken from rows returned by load() on first access.
+    '''
+    if not rows:
+        return rows
+    columns = rows[0]._columns
+    deferred_columns = Columns(columns.names, DeferredColumns(fields, key_fields, load))
+    for row in rows:
+        row._columns = deferred_columns
+    return rows
+
+
+def coerce_nested(rows: list, nested_keys: tuple = ('columns', 'foreign_keys', 'parameters')) -> list:
+    '''
+    Coerce values of rows decoded from a json document like make_rows does
+    (false values become empty strings), including rows in lists under
+    nested_keys.
+    '''
+    return [
+        {
+            key: coerce_nested(value, nested_keys) if key in nested_keys else value or ''
+            for key, value in row.items()
+        }
+        for row in rows
+    ]
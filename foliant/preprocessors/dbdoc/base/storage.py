@@ -0,0 +1,58 @@
+import gzip
+import json
+import os
+
+from collections.abc import Mapping
+from pathlib import Path
+
+
+FORMAT_VERSION = 1
+
+
+class StorageFormatError(Exception):
+    pass
+
+
+def _to_json(value):
+    '''Convert values which json can't serialize: rows and driver-specific types.'''
+    if isinstance(value, Mapping):
+        return dict(value)
+    return str(value)
+
+
+def write_datasets(path: str, datasets: dict, **meta) -> None:
+    '''
+    Save datasets collected by a renderer into a gzipped json file together
+    with meta information. The file is replaced atomically.
+
+    Values which are not supported by json (numbers with fixed precision, dates,
+    LOBs etc.) are saved as strings, which is how templates render them anyway.
+    '''
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    document = {
+        'version': FORMAT_VERSION,
+        'meta': meta,
+        'datasets': datasets
+    }
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    with gzip.open(tmp_path, 'wt', encoding='utf8') as f:
+        json.dump(document, f, default=_to_json, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def read_datasets(path: str) -> tuple:
+    '''
+    Load file saved with write_datasets.
+
+    Returns a tuple (meta, datasets). Raises StorageFormatError if the file was
+    saved in an unsupported format version.
+    '''
+    with gzip.open(path, 'rt', encoding='utf8') as f:
+        document = json.load(f)
+    if document.get('version') != FORMAT_VERSION:
+        raise StorageFormatError(
+            f'{path}: unsupported format version {document.get("version")}, '
+            f'expected {FORMAT_VERSION}'
+        )
+    return document['meta'], document['datasets']
@@ -0,0 +1,131 @@
+from logging import getLogger
+from threading import Lock
+from typing import Optional
+
+from jinja2 import Environment
+from jinja2 import FileSystemBytecodeCache
+from jinja2 import FileSystemLoader
+from jinja2 import meta
+from jinja2 import nodes
+
+
+logger = getLogger('unbound.dbdoc.base')
+
+
+def make_environment(template_root: str,
+                     bytecode_cache_dir: Optional[str] = None) -> Environment:
+    '''
+    Create Jinja environment which loads templates from template_root. If
+    bytecode_cache_dir is set, compiled templates are saved there and reused
+    by later builds.
+    '''
+    bytecode_cache = None
+    if bytecode_cache_dir:
+        bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+    return Environment(
+        loader=FileSystemLoader(template_root),
+        bytecode_cache=bytecode_cache
+    )
+
+
+def parse_templates(environment: Environment, name: str) -> Optional[list]:
+    '''
+    Return ASTs of template name and the templates it includes, imports or
+    extends. Returns None if some template name is only known at render time.
+    '''
+    result = []
+    seen = set()
+    pending = [name]
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        source, _, _ = environment.loader.get_source(environment, current)
+        ast = environment.parse(source)
+        result.append(ast)
+        for referenced in meta.find_referenced_templates(ast):
+            if referenced is None:
+                return None
+            pending.append(referenced)
+    return result
+
+
+def find_template_variables(environment: Environment, name: str) -> Optional[set]:
+    '''
+    Return names of the context variables which template name and the templates
+    it includes, imports or extends refer to. Returns None if the set can't be
+    determined because some template name is only known at render time.
+    '''
+    asts = parse_templates(environment, name)
+    if asts is None:
+        return None
+    result = set()
+    for ast in asts:
+        result |= meta.find_undeclared_variables(ast)
+    return result
+
+
+def find_template_attributes(environment: Environment, name: str) -> Optional[set]:
+    '''
+    Return names which template name and the templates it refers to may use to
+    get fields of rows: attribute names (`row.field`) and all string constants
+    (`row['field']`, `map(attribute='field')`). Returns None if the set can't
+    be determined, like find_template_variables.
+    '''
+    asts = parse_templates(environment, name)
+    if asts is None:
+        return None
+    result = set()
+    for ast in asts:
+        result.update(node.attr for node in ast.find_all(nodes.Getattr))
+        result.update(
+            node.value for node in ast.find_all(nodes.Const) if isinstance(node.value, str)
+        )
+    return result
+
+
+class TemplateEnvironments:
+    '''
+    Jinja environments shared by all renderers during one run, one per
+    template root and bytecode cache dir, so that each template is compiled
+    only once.
+    '''
+
+    def __init__(self):
+        self._environments = {}
+        self._variables = {}
+        self._attributes = {}
+        self._lock = Lock()
+
+    def get(self,
+            template_root: str,
+            bytecode_cache_dir: Optional[str] = None) -> Environment:
+        key = (template_root, bytecode_cache_dir)
+        with self._lock:
+            if key not in self._environments:
+                logger.debug(f'Creating template environment for {template_root}')
+                self._environments[key] = make_environment(*key)
+            return self._environments[key]
+
+    def get_variables(self, environment: Environment, name: str) -> Optional[set]:
+        '''Memoized find_template_variables for environments of this run.'''
+        key = (id(environment), name)
+        with self._lock:
+            if key not in self._variables:
+                self._variables[key] = find_template_variables(environment, name)
+            return self._variables[key]
+
+    def get_attributes(self, environment: Environment, name: str) -> Optional[set]:
+        '''Memoized find_template_attributes for environments of this run.'''
+        key = (id(environment), name)
+        with self._lock:
+            if key not in self._attributes:
+                self._attributes[key] = find_template_attributes(environment, name)
+            return self._attributes[key]
+
+
+def set_up_logger(logger_):
+    '''Set up a global logger for functions in this module'''
+    global logger
+    logger = logger_.getChild(__package__.split('.')[-1])
@@ -3,9 +3,28 @@ Preprocessor for Foliant documentation authoring tool.
 Generates documentation from PostgreSQL database structure,
 '''
 
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+from pathlib import Path
+from shutil import copyfileobj
+from tempfile import SpooledTemporaryFile
+
 from foliant.preprocessors.utils.preprocessor_ext import BasePreprocessorExt
 from foliant.preprocessors.utils.preprocessor_ext import allow_fail
 
+from .base.cache import set_up_logger as set_up_logger_cache
+from .base.connections import set_up_logger as set_up_logger_connections
+from .base.context import RunContext
+from .base.hooks import HookRegistry
+from .base.hooks import set_up_logger as set_up_logger_hooks
+from .base.main import set_up_logger as set_up_logger_base
+from .base.metrics import BuildMetrics
+from .base.metrics import set_up_logger as set_up_logger_metrics
+from .base.profiling import get_profile_modes
+from .base.profiling import run_profiled
+from .base.profiling import set_up_logger as set_up_logger_profiling
+from .base.replay import set_up_logger as set_up_logger_replay
+from .base.templates import set_up_logger as set_up_logger_templates
 from .mssql.main import MSSQLRenderer
 from .mssql.main import set_up_logger as set_up_logger_mssql
 from .mysql.main import MySQLRenderer
@@ -15,6 +34,10 @@ from .oracle.main import set_up_logger as set_up_logger_oracle
 from .pgsql.main import PGSQLRenderer
 from .pgsql.main import set_up_logger as set_up_logger_pgsql
 
+# rendered tags are kept in memory while they are smaller, and in temporary
+# files otherwise, until they are written to the Markdown file
+SPOOL_MAX_SIZE = 1024 * 1024
+
 
 class Preprocessor(BasePreprocessorExt):
     tags = ('pgsqldoc', 'dbdoc', 'pgsql', 'oracle', 'sqlserver', 'mysql')
@@ -23,15 +46,44 @@ class Preprocessor(BasePreprocessorExt):
         super().__init__(*args, **kwargs)
 
         self.logger = self.logger.getChild('dbdoc')
+        set_up_logger_base(self.logger)
+        set_up_logger_cache(self.logger)
+        set_up_logger_connections(self.logger)
+        set_up_logger_hooks(self.logger)
+        set_up_logger_metrics(self.logger)
+        set_up_logger_profiling(self.logger)
+        set_up_logger_replay(self.logger)
+        set_up_logger_templates(self.logger)
         set_up_logger_pgsql(self.logger)
         set_up_logger_oracle(self.logger)
         set_up_logger_mssql(self.logger)
         set_up_logger_mysql(self.logger)
 
+        self.run_context = None
+
         self.logger.debug(f'Preprocessor inited: {self.__dict__}')
 
     @allow_fail()
     def process_tag(self, match) -> str:
+        return self.render_tag(match, self.current_filename)
+
+    @staticmethod
+    def get_tag_label(match, source: str) -> str:
+        '''Identify the tag by the source file name and line.'''
+        line = match.string.count('\n', 0, match.start()) + 1
+        return f'{source}:{line}'
+
+    def get_profile_path_stem(self, match, source: str) -> Path:
+        '''
+        Path in the working dir without extension for profiles of the tag,
+        named after the source file and index of the tag in it.
+        '''
+        index = sum(1 for _ in self.pattern.finditer(match.string, 0, match.start()))
+        name = source.replace('/', '__').replace('\\', '__')
+        return self.working_dir / f'dbdoc_profile.{name}.{index}'
+
+    def get_renderer(self, match, source: str):
+        '''Return the renderer for the tag and the tag options.'''
         dbms_class_map = {
             'pgsql': PGSQLRenderer,
             'pgsqldoc': PGSQLRenderer,
@@ -47,10 +99,146 @@ class Preprocessor(BasePreprocessorExt):
             if not dbms or dbms not in dbms_class_map:
                 raise RuntimeError('Please supply a valid dbms name in the dbms parameter. '
                                    f'Supported values: {list(dbms_class_map.keys())}')
-        renderer = dbms_class_map[dbms](self.options)
-        return renderer.process(tag_options)
+        renderer = dbms_class_map[dbms](
+            self.options,
+            self.run_context,
+            tag=self.get_tag_label(match, source)
+        )
+        return renderer, tag_options
+
+    def run_renderer(self, match, source: str, renderer, tag_options, func):
+        '''
+        Call func, which processes the tag with renderer and tag_options,
+        profiling it if needed. Profiled tags run their catalog queries in the
+        calling thread, because cProfile doesn't see other threads.
+        '''
+        profile = tag_options.get('profile', self.options.get('profile'))
+        if not profile:
+            return func()
+
+        tag_options['max_workers'] = 1
+        path_stem = self.get_profile_path_stem(match, source)
+        self.logger.info(f'Profiling tag {renderer.tag}, saving profiles to {path_stem}.*')
+        return run_profiled(func, path_stem, get_profile_modes(profile))
+
+    def render_tag(self, match, source: str = '') -> str:
+        renderer, tag_options = self.get_renderer(match, source)
+        return self.run_renderer(
+            match,
+            source,
+            renderer,
+            tag_options,
+            lambda: renderer.process(tag_options)
+        )
+
+    def render_tag_to_file(self, match, source: str = ''):
+        '''
+        Render the tag into a temporary file, which stays in memory until it
+        grows over SPOOL_MAX_SIZE. Returns the file positioned at the start.
+        '''
+        renderer, tag_options = self.get_renderer(match, source)
+        out = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode='w+', encoding='utf8', newline='')
+        try:
+            self.run_renderer(
+                match,
+                source,
+                renderer,
+                tag_options,
+                lambda: renderer.write(tag_options, out)
+            )
+        except Exception:
+            out.close()
+            raise
+        out.seek(0)
+        return out
+
+    def _process_tags_in_parallel(self, workers: int) -> None:
+        '''
+        Find tags in all Markdown-files in the working dir, render them in a
+        thread pool of size workers and substitute the results back in source
+        order. Each file is written as soon as all its tags are rendered, and
+        its rendered tags are dropped after that. Failed tags remain unchanged,
+        just like with allow_fail.
+        '''
+        self.logger.info(f'Applying preprocessor with {workers} workers')
+
+        sources = {}
+        for markdown_file_path in self.working_dir.rglob('*.md'):
+            with open(markdown_file_path, encoding='utf8') as markdown_file:
+                content = markdown_file.read()
+            matches = list(self.pattern.finditer(content))
+            if matches:
+                sources[markdown_file_path] = (content, matches)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {}
+            pending = {}
+            for markdown_file_path, (_, matches) in sources.items():
+                source = str(markdown_file_path.relative_to(self.working_dir))
+                futures[markdown_file_path] = [
+                    executor.submit(self.render_tag_to_file, match, source)
+                    for match in matches
+                ]
+                pending[markdown_file_path] = len(matches)
+            file_of = {
+                future: markdown_file_path
+                for markdown_file_path, file_futures in futures.items()
+                for future in file_futures
+            }
+
+            for future in as_completed(file_of):
+                markdown_file_path = file_of.pop(future)
+                pending[markdown_file_path] -= 1
+                if pending[markdown_file_path]:
+                    continue
+                content, matches = sources.pop(markdown_file_path)
+                self._write_tags(markdown_file_path, content, matches, futures.pop(markdown_file_path))
+        self.current_filename = ''
+
+    def _write_tags(self, markdown_file_path: Path, content: str, matches: list, futures: list) -> None:
+        '''
+        Write the Markdown file part by part, copying rendered tags from their
+        files instead of joining the whole text.
+        '''
+        self.current_filepath = Path(markdown_file_path)
+        self.current_filename = str(self.current_filepath.relative_to(self.working_dir))
+
+        with open(markdown_file_path, 'w', encoding='utf8') as markdown_file:
+            end = 0
+            for match, future in zip(matches, futures):
+                markdown_file.write(content[end:match.start()])
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self._warning(f'Failed to process tag. Skipping. {e}',
+                                  context=self.get_tag_context(match),
+                                  error=e)
+                    markdown_file.write(match.group(0))
+                else:
+                    with result:
+                        copyfileobj(result, markdown_file)
+                end = match.end()
+            markdown_file.write(content[end:])
 
     def apply(self):
-        self._process_tags_for_all_files(func=self.process_tag)
+        self.run_context = RunContext()
+        report = self.options.get('timing_report')
+        if report:
+            self.run_context.metrics = BuildMetrics()
+        try:
+            if self.options.get('hooks'):
+                self.run_context.hooks = HookRegistry.from_paths(self.options['hooks'])
+            tag_workers = self.options.get('tag_workers', 1)
+            # foliant's multithread doesn't wait for the files to be processed, so
+            # the run context could be closed while tags are still rendered
+            if tag_workers > 1 or self.context['config'].get('multithread', False):
+                self._process_tags_in_parallel(tag_workers)
+            else:
+                self._process_tags_for_all_files(func=self.process_tag)
+        finally:
+            if report:
+                self.run_context.metrics.write_report(report)
+            self.run_context.close()
+            self.run_context = None
 
         self.logger.info('Preprocessor applied')
@@ -1,11 +1,15 @@
 import os
-from copy import deepcopy
 from logging import getLogger
 
 from ..base.main import LibraryNotInstalledError
+from .queries import BatchQuery
 from .queries import ColumnsQuery
+from .queries import FingerprintQuery
 from .queries import ForeignKeysQuery
 from .queries import FunctionsQuery
+from .queries import SysColumnsQuery
+from .queries import SysTablesQuery
+from .queries import SysTriggersQuery
 from .queries import TablesQuery
 from .queries import TriggersQuery
 from .queries import ViewsQuery
@@ -36,6 +40,50 @@ class MSSQLRenderer(DBRendererBase):
         'strict': False
     }
     module_name = __name__
+    fingerprint_query = FingerprintQuery
+    component_queries = {
+        'tables': {
+            'tables': TablesQuery,
+            'columns': ColumnsQuery,
+            'foreign_keys': ForeignKeysQuery
+        },
+        'views': {'views': ViewsQuery},
+        'functions': {'functions': FunctionsQuery},
+        'triggers': {'triggers': TriggersQuery}
+    }
+
+    batch_component_queries = {
+        'tables': {
+            'tables': SysTablesQuery,
+            'columns': SysColumnsQuery,
+            'foreign_keys': ForeignKeysQuery
+        },
+        'views': {'views': ViewsQuery},
+        'functions': {'functions': FunctionsQuery},
+        'triggers': {'triggers': SysTriggersQuery}
+    }
+
+    def get_component_queries(self) -> dict:
+        if self.options['collection_mode'] == 'batch':
+            return self.batch_component_queries
+        return self.component_queries
+
+    def run_queries(self, queries: dict) -> dict:
+        '''
+        In the batch collection mode run all queries in one T-SQL batch, in one
+        round-trip to the server. Definitions are fetched in the batch too, as
+        loading them later would take extra round-trips.
+        '''
+        if self.options['collection_mode'] != 'batch' or len(queries) <= 1:
+            return super().run_queries(queries)
+
+        filters = self.options.get('filters', {})
+        batch = {
+            name: query_class(self.con, filters)
+            for name, query_class in queries.items()
+        }
+        query = BatchQuery(self.con, batch, self.options['fetch_size'])
+        return self.execute_query(query, 'Batch query')
 
     def connect(self):
         """
@@ -68,7 +116,10 @@ class MSSQLRenderer(DBRendererBase):
             logger.debug(
                 f"Trying to connect: {connection_string}"
             )
-            self.con = pyodbc.connect(connection_string)
+            self.con = self.get_connection(
+                connection_string,
+                lambda: pyodbc.connect(connection_string)
+            )
             logger.debug("Successfully connected to the database")
         except pyodbc.Error as e:
             msg = f"\MS SQL database database connection error: {e}"
@@ -79,76 +130,6 @@ class MSSQLRenderer(DBRendererBase):
             else:
                 logger.debug(f'{msg}. Skipping.')
 
-    def collect_datasets(self) -> dict:
-
-        result = {}
-        filters = self.options.get('filters', {})
-        components = self.options['components']
-
-        if 'tables' in components:
-            q_tables = TablesQuery(self.con, filters)
-            logger.debug(f'Tables query:\n\n {q_tables.sql}')
-            tables = q_tables.run()
-
-            q_columns = ColumnsQuery(self.con, filters)
-            logger.debug(f'Columns query:\n\n {q_columns.sql}')
-            columns = q_columns.run()
-
-            q_fks = ForeignKeysQuery(self.con, filters)
-            logger.debug(f'Foreign keys query:\n\n {q_fks.sql}')
-            fks = q_fks.run()
-
-            # fill each table with columns and foreign keys
-            result['tables'] = self.collect_tables(tables, columns, fks)
-
-        if 'views' in components:
-            q_views = ViewsQuery(self.con, filters)
-            logger.debug(f'Views query:\n\n {q_views.sql}')
-            result['views'] = q_views.run()
-
-        if 'functions' in components:
-            q_functions = FunctionsQuery(self.con, filters)
-            logger.debug(f'Functions query:\n\n {q_functions.sql}')
-            result['functions'] = q_functions.run()
-
-        if 'triggers' in components:
-            q_triggers = TriggersQuery(self.con, filters)
-            logger.debug(f'Triggers query:\n\n {q_triggers.sql}')
-            result['triggers'] = q_triggers.run()
-
-        return result
-
-    def collect_tables(self,
-                       tables: list,
-                       columns: list,
-                       fks: list) -> list:
-        '''
-        Parse table and column query results got from db and:
-
-        - add 'columns' attribute to each table row with list of table columns;
-        - add 'foreign_keys' attribute to each column with list of fks if it is a
-          forign key column.
-
-        returns transformed list of tables.
-        '''
-
-        result = deepcopy(tables)
-        for table in result:
-            # get columns for this table
-            table_columns = list(filter(lambda x: x['TABLE_NAME'] == table['TABLE_NAME'],
-                                        columns))
-            for col in table_columns:
-                # get foreign keys for this column
-                fks_fltr = list(
-                    filter(
-                        lambda x: x['TABLE_NAME'] == table['TABLE_NAME']
-                        and x['COLUMN_NAME'] == col['COLUMN_NAME'], fks
-                    )
-                )
-                col['foreign_keys'] = fks_fltr
-            table['columns'] = table_columns
-        return result
-
 
 def set_up_logger(logger_):
     '''Set up a global logger for functions in this module'''
@@ -1,5 +1,9 @@
 from abc import ABCMeta
 
+from ..base.filters import OPERATORS
+from ..base.rows import Columns
+from ..base.rows import make_rows
+
 
 SCHEMA = 'schema'
 TABLE_NAME = 'table_name'
@@ -10,13 +14,34 @@ class QueryBase(metaclass=ABCMeta):
     base_query = ''
 
     _filter_fields = {}
+    # result row keys of the filtering fields, used to filter memoized
+    # unfiltered query results on client side
+    _filter_keys = {}
+    _filter_operators = ('in', 'not_in', 'eq', 'not_eq')
+    _filter_ignore_case = True
+    # definition columns which may be fetched lazily: select expressions in
+    # _definitions are put into base_query in place of {definitions},
+    # _definition_keys are their keys in result rows, _row_keys identify rows
+    _definitions = ''
+    _definition_keys = ()
+    _row_keys = ()
+    # statement which selects only _row_keys and _definition_keys to load
+    # deferred definitions, with {filters} and {definitions} like base_query;
+    # the full query is used if it is not set
+    _definitions_query = ''
     # sort_fields = {}
 
     def __init__(self,
                  con,
-                 filters: dict = {}):
+                 filters: dict = {},
+                 fetch_size: int = None,
+                 defer_definitions: bool = False,
+                 definitions_only: bool = False):
         self._con = con
         self._filters = self._resolve_filters(filters)
+        self._fetch_size = fetch_size
+        self._defer_definitions = defer_definitions
+        self._definitions_only = definitions_only
 
     def _resolve_filters(self, filters: dict) -> str:
         resolvers = {'in': self._in,
@@ -77,22 +102,40 @@ class QueryBase(metaclass=ABCMeta):
         return f"{field} != {value}"
 
     def _get_rows(self, sql) -> list:
-        """Run query from sql param and return a list of dicts key=column name,
-        value = field value"""
+        """Run query from sql param and return a list of rows which behave like
+        dicts key=column name, value = field value.
+
+        If fetch_size is set, rows are fetched by batches of fetch_size rows,
+        so that the whole result set is never held by the driver."""
         cur = self._con.cursor()
+        if self._fetch_size:
+            cur.arraysize = self._fetch_size
         cur.execute(sql)
         result = []
-        keys = tuple((d[0] for d in cur.description))
-        for row in cur.fetchall():
-            row_dict = {}
-            for i in range(len(keys)):
-                row_dict[keys[i]] = row[i] or ''
-            result.append(row_dict)
+        keys = Columns(d[0] for d in cur.description)
+        for batch in self._batches(cur):
+            result.extend(make_rows(keys, batch))
+        cur.close()
         return result
 
+    def _batches(self, cur):
+        """Yield fetched rows by batches of fetch_size or all at once"""
+        if not self._fetch_size:
+            yield cur.fetchall()
+            return
+        while True:
+            batch = cur.fetchmany(self._fetch_size)
+            if not batch:
+                break
+            yield batch
+
     @property
     def sql(self):
-        return self.base_query.format(filters=self._filters)
+        if self._definitions_only:
+            query = self._definitions_query or self.base_query
+            return query.format(filters=self._filters, definitions=self._definitions)
+        definitions = '' if self._defer_definitions else self._definitions
+        return self.base_query.format(filters=self._filters, definitions=definitions)
 
     def run(self):
         return self._get_rows(self.sql)
@@ -110,11 +153,14 @@ class TablesQuery(QueryBase):
 
     _filter_fields = {SCHEMA: 'SCHEMA_NAME',
                       TABLE_NAME: 'TABLE_NAME'}
+    _filter_keys = {SCHEMA: 'TABLE_SCHEMA',
+                    TABLE_NAME: 'TABLE_NAME'}
 
 
 class ColumnsQuery(QueryBase):
 
     base_query = '''SELECT
+      tbl.TABLE_SCHEMA,
       c.TABLE_NAME,
       sc.COLUMN_ID,
       c.COLUMN_NAME,
@@ -137,6 +183,8 @@ class ColumnsQuery(QueryBase):
 
     _filter_fields = {SCHEMA: 'tbl.SCHEMA_NAME',
                       TABLE_NAME: 'c.TABLE_NAME'}
+    _filter_keys = {SCHEMA: 'TABLE_SCHEMA',
+                    TABLE_NAME: 'TABLE_NAME'}
 
 
 class ForeignKeysQuery(QueryBase):
@@ -166,13 +214,17 @@ class ForeignKeysQuery(QueryBase):
     WHERE 1 = 1
     {filters}'''
 
+    _filter_fields = {SCHEMA: 's.name',
+                      TABLE_NAME: 'p.name'}
+    _filter_keys = {SCHEMA: 'SCHEMA_NAME',
+                    TABLE_NAME: 'TABLE_NAME'}
+
 
 class FunctionsQuery(QueryBase):
 
     base_query = '''SELECT
       o.name AS NAME,
-      s.name AS SCHEMA_NAME,
-      sm.definition AS DEFINITION
+      s.name AS SCHEMA_NAME{definitions}
     FROM sys.sql_modules sm
     JOIN sys.objects o on sm.object_id = o.object_id
     JOIN sys.schemas s on o.schema_id = s.schema_id
@@ -181,6 +233,11 @@ class FunctionsQuery(QueryBase):
     ORDER BY NAME
     '''
     _filter_fields = {SCHEMA: 'SCHENA_NAME'}
+    _filter_keys = {SCHEMA: 'SCHEMA_NAME'}
+    _definitions = ''',
+      sm.definition AS DEFINITION'''
+    _definition_keys = ('DEFINITION',)
+    _row_keys = ('SCHEMA_NAME', 'NAME')
 
 
 class TriggersQuery(QueryBase):
@@ -195,8 +252,7 @@ class TriggersQuery(QueryBase):
           IIF(OBJECTPROPERTY(id, 'ExecIsDeleteTrigger') = 1, 'DELETE ', ''),
           IIF(OBJECTPROPERTY(id, 'ExecIsInsertTrigger') = 1, 'INSERT ', '')
       ) AS TRIGGER_TYPE,
-      OBJECT_NAME(parent_obj) AS TABLE_NAME,
-      sm.definition AS DEFINITION,
+      OBJECT_NAME(parent_obj) AS TABLE_NAME,{definitions}
       OBJECTPROPERTY(id, 'ExecIsTriggerDisabled') AS DISABLED
     FROM sysobjects  syo
     INNER JOIN sys.tables t
@@ -210,14 +266,31 @@ class TriggersQuery(QueryBase):
     ORDER BY table_name, trigger_name'''
 
     _filter_fields = {SCHEMA: 'table_schema'}
+    _filter_keys = {SCHEMA: 'TABLE_SCHEMA'}
+    _definitions = '''
+      sm.definition AS DEFINITION,'''
+    _definition_keys = ('DEFINITION',)
+    _row_keys = ('TABLE_SCHEMA', 'TRIGGER_NAME')
+    _definitions_query = '''SELECT
+      s.name AS TABLE_SCHEMA,
+      syo.name AS TRIGGER_NAME,
+      sm.definition AS DEFINITION
+    FROM sysobjects  syo
+    INNER JOIN sys.tables t
+        ON syo.parent_obj = t.object_id
+    INNER JOIN sys.schemas s
+        ON t.schema_id = s.schema_id
+    INNER JOIN sys.sql_modules sm
+        ON sm.object_id = syo.id
+    WHERE syo.type = 'TR'
+    {filters}'''
 
 
 class ViewsQuery(QueryBase):
 
     base_query = '''SELECT
       s.name AS SCHEMA_NAME,
-      v.name AS VIEW_NAME,
-      sm.definition AS DEFINITION
+      v.name AS VIEW_NAME{definitions}
     FROM sys.views v
     JOIN sys.schemas s ON v.schema_id = s.schema_id
     JOIN sys.sql_modules sm ON v.object_id = sm.object_id
@@ -227,3 +300,143 @@ class ViewsQuery(QueryBase):
     '''
 
     _filter_fields = {SCHEMA: 'SCHEMA_NAME'}
+    _filter_keys = {SCHEMA: 'SCHEMA_NAME'}
+    _definitions = ''',
+      sm.definition AS DEFINITION'''
+    _definition_keys = ('DEFINITION',)
+    _row_keys = ('SCHEMA_NAME', 'VIEW_NAME')
+
+
+class SysTablesQuery(QueryBase):
+    """TablesQuery over sys views, for the batch collection mode"""
+
+    base_query = '''SELECT
+      s.name AS TABLE_SCHEMA,
+      t.name AS TABLE_NAME
+    FROM sys.tables t
+    JOIN sys.schemas s ON s.schema_id = t.schema_id
+    WHERE 1=1
+    {filters}
+    ORDER BY s.name, t.name'''
+
+    _filter_fields = {SCHEMA: 's.name',
+                      TABLE_NAME: 't.name'}
+    _filter_keys = {SCHEMA: 'TABLE_SCHEMA',
+                    TABLE_NAME: 'TABLE_NAME'}
+
+
+class SysColumnsQuery(QueryBase):
+    """ColumnsQuery over sys views, columns are joined to tables by object_id.
+    Values are computed the same way as in INFORMATION_SCHEMA.COLUMNS."""
+
+    base_query = '''SELECT
+      s.name AS TABLE_SCHEMA,
+      t.name AS TABLE_NAME,
+      c.column_id AS COLUMN_ID,
+      c.name AS COLUMN_NAME,
+      CASE WHEN c.is_nullable = 1 THEN 'YES' ELSE 'NO' END AS IS_NULLABLE,
+      ISNULL(TYPE_NAME(c.system_type_id), ty.name) AS DATA_TYPE,
+      CONVERT(nvarchar(4000), OBJECT_DEFINITION(c.default_object_id)) AS COLUMN_DEFAULT,
+      COLUMNPROPERTY(c.object_id, c.name, 'charmaxlen') AS CHARACTER_MAXIMUM_LENGTH,
+      CONVERT(tinyint, CASE
+          WHEN c.system_type_id IN (48, 52, 56, 59, 60, 62, 106, 108, 122, 127)
+          THEN c.precision
+      END) AS NUMERIC_PRECISION,
+      CAST(prop.value AS nvarchar(4000)) AS COMMENT
+    FROM sys.tables t
+    JOIN sys.schemas s ON s.schema_id = t.schema_id
+    JOIN sys.columns c ON c.object_id = t.object_id
+    JOIN sys.types ty ON ty.user_type_id = c.user_type_id
+    LEFT JOIN sys.extended_properties prop
+           ON prop.class = 1
+          AND prop.major_id = c.object_id
+          AND prop.minor_id = c.column_id
+          AND prop.name = 'MS_Description'
+    WHERE 1=1
+    {filters}
+    ORDER BY t.name, c.column_id'''
+
+    _filter_fields = {SCHEMA: 's.name',
+                      TABLE_NAME: 't.name'}
+    _filter_keys = {SCHEMA: 'TABLE_SCHEMA',
+                    TABLE_NAME: 'TABLE_NAME'}
+
+
+class SysTriggersQuery(QueryBase):
+    """TriggersQuery over sys.triggers, for the batch collection mode"""
+
+    base_query = '''SELECT
+      s.name AS TABLE_SCHEMA,
+      tr.name AS TRIGGER_NAME,
+      CONCAT(
+          IIF(OBJECTPROPERTY(tr.object_id, 'ExecIsAfterTrigger') = 1, 'AFTER ', ''),
+          IIF(OBJECTPROPERTY(tr.object_id, 'ExecIsInsteadOfTrigger') = 1, 'INSTEAD OF ', ''),
+          IIF(OBJECTPROPERTY(tr.object_id, 'ExecIsUpdateTrigger') = 1, 'UPDATE ', ''),
+          IIF(OBJECTPROPERTY(tr.object_id, 'ExecIsDeleteTrigger') = 1, 'DELETE ', ''),
+          IIF(OBJECTPROPERTY(tr.object_id, 'ExecIsInsertTrigger') = 1, 'INSERT ', '')
+      ) AS TRIGGER_TYPE,
+      t.name AS TABLE_NAME,{definitions}
+      OBJECTPROPERTY(tr.object_id, 'ExecIsTriggerDisabled') AS DISABLED
+    FROM sys.triggers tr
+    JOIN sys.tables t ON t.object_id = tr.parent_id
+    JOIN sys.schemas s ON s.schema_id = t.schema_id
+    JOIN sys.sql_modules sm ON sm.object_id = tr.object_id
+    WHERE 1=1
+    {filters}
+    ORDER BY t.name, tr.name'''
+
+    _filter_fields = {SCHEMA: 's.name'}
+    _filter_keys = {SCHEMA: 'TABLE_SCHEMA'}
+    _definitions = '''
+      sm.definition AS DEFINITION,'''
+    _definition_keys = ('DEFINITION',)
+    _row_keys = ('TABLE_SCHEMA', 'TRIGGER_NAME')
+
+
+class BatchQuery(QueryBase):
+    """Several queries sent to the server in one T-SQL batch. Their result sets
+    are read one after another with cursor.nextset().
+
+    queries — {dataset name: query object}"""
+
+    def __init__(self,
+                 con,
+                 queries: dict,
+                 fetch_size: int = None):
+        super().__init__(con, {}, fetch_size)
+        self._queries = queries
+
+    @property
+    def sql(self):
+        # NOCOUNT suppresses row count messages between the result sets
+        return 'SET NOCOUNT ON;\n' + ';\n'.join(query.sql for query in self._queries.values())
+
+    def run(self) -> dict:
+        cur = self._con.cursor()
+        if self._fetch_size:
+            cur.arraysize = self._fetch_size
+        cur.execute(self.sql)
+        result = {}
+        for i, name in enumerate(self._queries):
+            if i > 0 and not cur.nextset():
+                raise RuntimeError(f'No result set for {name} in the batch')
+            keys = Columns(d[0] for d in cur.description)
+            rows = []
+            for batch in self._batches(cur):
+                rows.extend(make_rows(keys, batch))
+            result[name] = rows
+        cur.close()
+        return result
+
+
+class FingerprintQuery(QueryBase):
+
+    base_query = '''SELECT
+      MAX(o.modify_date) AS MODIFY_DATE,
+      COUNT(*) AS OBJECTS_COUNT
+    FROM sys.objects o
+    JOIN sys.schemas s ON s.schema_id = o.schema_id
+    WHERE 1=1
+    {filters}'''
+
+    _filter_fields = {SCHEMA: 's.name'}
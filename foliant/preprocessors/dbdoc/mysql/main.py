@@ -1,11 +1,14 @@
 import os
-from copy import deepcopy
+import re
 from logging import getLogger
 
 from ..base.main import LibraryNotInstalledError
 from .queries import ColumnsQuery
+from .queries import FingerprintQuery
 from .queries import ForeignKeysQuery
 from .queries import FunctionsQuery
+from .queries import NestedTablesQuery
+from .queries import TableColumnsQuery
 from .queries import TablesQuery
 from .queries import TriggersQuery
 from .queries import ViewsQuery
@@ -13,6 +16,10 @@ from foliant.preprocessors.dbdoc.base.main import DBRendererBase
 from foliant.utils import output
 
 
+# the first version of MySQL and MariaDB with JSON_ARRAYAGG
+NESTED_MYSQL_VERSION = (5, 7, 22)
+NESTED_MARIADB_VERSION = (10, 5, 0)
+
 logger = getLogger('unbound.dbdoc.mysql')
 
 
@@ -31,9 +38,83 @@ class MySQLRenderer(DBRendererBase):
             'triggers',
             'views'
         ],
-       'strict': False
+        'strict': False
     }
     module_name = __name__
+    fingerprint_query = FingerprintQuery
+    component_queries = {
+        'tables': {
+            'tables': TablesQuery,
+            'columns': ColumnsQuery,
+            'foreign_keys': ForeignKeysQuery
+        },
+        'views': {'views': ViewsQuery},
+        'functions': {'functions': FunctionsQuery},
+        'triggers': {'triggers': TriggersQuery}
+    }
+
+    def get_component_queries(self) -> dict:
+        if self.options['collection_mode'] == 'nested':
+            # used on servers without JSON_ARRAYAGG
+            return {
+                **self.component_queries,
+                'tables': {
+                    **self.component_queries['tables'],
+                    'columns': TableColumnsQuery
+                }
+            }
+        return self.component_queries
+
+    def supports_nested(self) -> bool:
+        '''
+        Check that the server supports JSON_ARRAYAGG: MySQL 5.7.22 or later,
+        MariaDB 10.5 or later.
+        '''
+        server_info = self.con.get_server_info()
+        if isinstance(server_info, bytes):
+            server_info = server_info.decode()
+        versions = [
+            tuple(int(part) for part in version)
+            for version in re.findall(r'(\d+)\.(\d+)\.(\d+)', server_info)
+        ]
+        if not versions:
+            return False
+        if 'mariadb' in server_info.lower():
+            # MariaDB may report itself as 5.5.5-10.5.8-MariaDB
+            return versions[-1] >= NESTED_MARIADB_VERSION
+        return versions[0] >= NESTED_MYSQL_VERSION
+
+    def collect_datasets(self) -> dict:
+        if self.options['collection_mode'] == 'nested':
+            if self.supports_nested():
+                return self.collect_nested()
+            logger.debug('Server does not support JSON_ARRAYAGG, collecting catalog with queries')
+        return super().collect_datasets()
+
+    def collect_nested(self) -> dict:
+        '''
+        Get tables with columns and foreign keys in one round-trip with
+        NestedTablesQuery, other components with their usual queries.
+        '''
+        components = self.get_used_components()
+        queries = {}
+        for component in components:
+            if component != 'tables':
+                queries.update(self.get_component_queries()[component])
+        rows = self.run_queries(queries)
+
+        result = {}
+        for component in components:
+            if component == 'tables':
+                query = NestedTablesQuery(
+                    self.con,
+                    self.options.get('filters', {}),
+                    self.options['fetch_size']
+                )
+                result['tables'] = self.execute_query(query, 'Nested tables query')
+            else:
+                result[component] = rows[component]
+        return result
 
     def connect(self):
         """
@@ -55,12 +136,16 @@ class MySQLRenderer(DBRendererBase):
                 f" dbname={self.options['dbname']}, user={self.options['user']} "
                 f"password={self.options['password']}."
             )
-            self.con = _mysql.connect(
-                host=self.options['host'],
-                port=self.options['port'],
-                user=self.options['user'],
-                password=self.options['password'],
-                database=self.options['dbname']
+            self.con = self.get_connection(
+                f"{self.options['user']}:{self.options['password']}@"
+                f"{self.options['host']}:{self.options['port']}/{self.options['dbname']}",
+                lambda: _mysql.connect(
+                    host=self.options['host'],
+                    port=self.options['port'],
+                    user=self.options['user'],
+                    password=self.options['password'],
+                    database=self.options['dbname']
+                )
             )
         except _mysql.Error as e:
             msg = f"\nMySQL database error: {e}"
@@ -71,93 +156,13 @@ class MySQLRenderer(DBRendererBase):
             else:
                 logger.debug(f'{msg}. Skipping.')
 
-    def collect_datasets(self) -> dict:
-
-        result = {}
-        filters = self.options.get('filters', {})
-        components = self.options['components']
-
-        if 'tables' in components:
-            q_tables = TablesQuery(self.con, filters)
-            logger.debug(f'Tables query:\n\n {q_tables.sql}')
-            tables = q_tables.run()
-
-            q_columns = ColumnsQuery(self.con, filters)
-            logger.debug(f'Columns query:\n\n {q_columns.sql}')
-            columns = q_columns.run()
-
-            q_fks = ForeignKeysQuery(self.con, filters)
-            logger.debug(f'Foreign keys query:\n\n {q_fks.sql}')
-            fks = q_fks.run()
-
-            # fill each table with columns and foreign keys
-            result['tables'] = self.collect_tables(tables, columns, fks)
-
-        if 'views' in components:
-            q_views = ViewsQuery(self.con, filters)
-            logger.debug(f'Views query:\n\n {q_views.sql}')
-            result['views'] = q_views.run()
-
-        if 'functions' in components:
-            q_functions = FunctionsQuery(self.con, filters)
-            logger.debug(f'Functions query:\n\n {q_functions.sql}')
-            result['functions'] = q_functions.run()
-
-        if 'triggers' in components:
-            q_triggers = TriggersQuery(self.con, filters)
-            logger.debug(f'Triggers query:\n\n {q_triggers.sql}')
-            result['triggers'] = q_triggers.run()
-        return result
-
-    def collect_tables(self,
-                       tables: list,
-                       columns: list,
-                       fks: list) -> list:
-        '''
-        Parse table and column query results got from db and:
-
-        - add 'columns' attribute to each table row with list of table columns;
-        - add 'foreign_keys' attribute to each column with list of fks if it is a
-          forign key column.
-
-        returns transformed list of tables.
-        '''
-
-        result = deepcopy(tables)
-        for table in result:
-            # get columns for this table
-            table_columns = list(filter(lambda x: x['TABLE_NAME'] == table['TABLE_NAME'],
-                                        columns))
-            for col in table_columns:
-                # get foreign keys for this column
-                fks_fltr = list(
-                    filter(
-                        lambda x: x['TABLE_NAME'] == table['TABLE_NAME']
-                        and x['COLUMN_NAME'] == col['COLUMN_NAME'], fks
-                    )
-                )
-                col['foreign_keys'] = fks_fltr
-            table['columns'] = table_columns
-        return result
-
-    def collect_functions(self,
-                          functions: list,
-                          parameters: list) -> list:
-        '''
-        Parse function and parameter query results got from db and add 'parameters'
-        key to each function filled with its parameters
-        '''
-
-        result = deepcopy(functions)
-        for func in result:
-            # get parameters for this function
-            function_params = list(
-                filter(
-                    lambda x: x['specific_name'] == func['specific_name'], parameters
-                )
-            )
-            func['parameters'] = function_params
-        return result
+    def is_alive(self, con) -> bool:
+        '''Check that the connection may be reused with a server round-trip.'''
+        try:
+            con.ping()
+        except Exception:
+            return False
+        return True
 
 
 def set_up_logger(logger_):
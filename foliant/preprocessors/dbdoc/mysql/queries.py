@@ -1,5 +1,11 @@
+import json
+
 from abc import ABCMeta
 
+from ..base.filters import OPERATORS
+from ..base.rows import Columns
+from ..base.rows import make_rows
+
 
 SCHEMA = 'schema'
 TABLE_NAME = 'table_name'
@@ -10,13 +16,34 @@ class QueryBase(metaclass=ABCMeta):
     base_query = ''
 
     _filter_fields = {}
+    # result row keys of the filtering fields, used to filter memoized
+    # unfiltered query results on client side
+    _filter_keys = {}
+    _filter_operators = OPERATORS
+    _filter_ignore_case = True
+    # definition columns which may be fetched lazily: select expressions in
+    # _definitions are put into base_query in place of {definitions},
+    # _definition_keys are their keys in result rows, _row_keys identify rows
+    _definitions = ''
+    _definition_keys = ()
+    _row_keys = ()
+    # statement which selects only _row_keys and _definition_keys to load
+    # deferred definitions, with {filters} and {definitions} like base_query;
+    # the full query is used if it is not set
+    _definitions_query = ''
     # sort_fields = {}
 
     def __init__(self,
                  con,
-                 filters: dict = {}):
+                 filters: dict = {},
+                 fetch_size: int = None,
+                 defer_definitions: bool = False,
+                 definitions_only: bool = False):
         self._con = con
         self._filters = self._resolve_filters(filters)
+        self._fetch_size = fetch_size
+        self._defer_definitions = defer_definitions
+        self._definitions_only = definitions_only
 
     def _resolve_filters(self, filters: dict) -> str:
         resolvers = {'in': self._in,
@@ -79,22 +106,40 @@ class QueryBase(metaclass=ABCMeta):
         return f"{field} != {value}"
 
     def _get_rows(self, sql) -> list:
-        """Run query from sql param and return a list of dicts key=column name,
-        value = field value"""
+        """Run query from sql param and return a list of rows which behave like
+        dicts key=column name, value = field value.
+
+        If fetch_size is set, the result is not stored on the client but read
+        from the server by batches of fetch_size rows."""
         self._con.query(sql)
         result = []
-        query = self._con.store_result()
-        keys = tuple((d[0] for d in query.describe()))
-        for row in query.fetch_row(0):
-            row_dict = {}
-            for i in range(len(keys)):
-                row_dict[keys[i]] = row[i].decode() if row[i] else ''
-            result.append(row_dict)
+        if self._fetch_size:
+            query = self._con.use_result()
+        else:
+            query = self._con.store_result()
+        keys = Columns(d[0] for d in query.describe())
+        for batch in self._batches(query):
+            result.extend(make_rows(keys, batch, bytes.decode))
         return result
 
+    def _batches(self, query):
+        """Yield fetched rows by batches of fetch_size or all at once"""
+        if not self._fetch_size:
+            yield query.fetch_row(0)
+            return
+        while True:
+            batch = query.fetch_row(self._fetch_size)
+            if not batch:
+                break
+            yield batch
+
     @property
     def sql(self):
-        return self.base_query.format(filters=self._filters)
+        if self._definitions_only:
+            query = self._definitions_query or self.base_query
+            return query.format(filters=self._filters, definitions=self._definitions)
+        definitions = '' if self._defer_definitions else self._definitions
+        return self.base_query.format(filters=self._filters, definitions=definitions)
 
     def run(self):
         return self._get_rows(self.sql)
@@ -113,11 +158,14 @@ class TablesQuery(QueryBase):
 
     _filter_fields = {SCHEMA: 'TABLE_SCHEMA',
                       TABLE_NAME: 'TABLE_NAME'}
+    _filter_keys = {SCHEMA: 'TABLE_SCHEMA',
+                    TABLE_NAME: 'TABLE_NAME'}
 
 
 class ColumnsQuery(QueryBase):
 
     base_query = '''SELECT
+        c.TABLE_SCHEMA,
         c.TABLE_NAME,
         c.COLUMN_NAME,
         c.ORDINAL_POSITION,
@@ -137,6 +185,36 @@ class ColumnsQuery(QueryBase):
 
     _filter_fields = {SCHEMA: 'c.TABLE_SCHEMA',
                       TABLE_NAME: 'c.TABLE_NAME'}
+    _filter_keys = {SCHEMA: 'TABLE_SCHEMA',
+                    TABLE_NAME: 'TABLE_NAME'}
+
+
+class TableColumnsQuery(QueryBase):
+    """Same as ColumnsQuery, but reads information_schema.COLUMNS alone, without
+    the join to information_schema.tables, which makes MySQL 5.7 open every
+    table definition. Columns of views are returned too, they are dropped when
+    columns are joined to tables."""
+
+    base_query = '''SELECT
+        c.TABLE_SCHEMA,
+        c.TABLE_NAME,
+        c.COLUMN_NAME,
+        c.ORDINAL_POSITION,
+        c.IS_NULLABLE,
+        c.DATA_TYPE,
+        c.COLUMN_DEFAULT,
+        c.CHARACTER_MAXIMUM_LENGTH,
+        c.NUMERIC_PRECISION,
+        c.COLUMN_COMMENT
+    FROM information_schema.`COLUMNS` c
+    WHERE 1=1
+    {filters}
+    ORDER BY c.TABLE_SCHEMA, c.TABLE_NAME, c.ORDINAL_POSITION'''
+
+    _filter_fields = {SCHEMA: 'c.TABLE_SCHEMA',
+                      TABLE_NAME: 'c.TABLE_NAME'}
+    _filter_keys = {SCHEMA: 'TABLE_SCHEMA',
+                    TABLE_NAME: 'TABLE_NAME'}
 
 
 class ForeignKeysQuery(QueryBase):
@@ -153,20 +231,29 @@ class ForeignKeysQuery(QueryBase):
     WHERE REFERENCED_COLUMN_NAME IS NOT NULL
     {filters}'''
 
+    _filter_fields = {SCHEMA: 'TABLE_SCHEMA',
+                      TABLE_NAME: 'TABLE_NAME'}
+    _filter_keys = {SCHEMA: 'CONSTRAINT_SCHEMA',
+                    TABLE_NAME: 'TABLE_NAME'}
+
 
 class FunctionsQuery(QueryBase):
 
     base_query = """SELECT
         ROUTINE_NAME,
         ROUTINE_TYPE,
-        ROUTINE_SCHEMA,
-        ROUTINE_DEFINITION
+        ROUTINE_SCHEMA{definitions}
     FROM information_schema.ROUTINES r
     WHERE 1=1
     {filters}
     ORDER BY ROUTINE_NAME"""
 
     _filter_fields = {SCHEMA: 'ROUTINE_SCHEMA'}
+    _filter_keys = {SCHEMA: 'ROUTINE_SCHEMA'}
+    _definitions = """,
+        ROUTINE_DEFINITION"""
+    _definition_keys = ('ROUTINE_DEFINITION',)
+    _row_keys = ('ROUTINE_SCHEMA', 'ROUTINE_TYPE', 'ROUTINE_NAME')
 
 
 class TriggersQuery(QueryBase):
@@ -177,22 +264,31 @@ class TriggersQuery(QueryBase):
         ACTION_TIMING,
         EVENT_MANIPULATION,
         EVENT_OBJECT_SCHEMA,
-        EVENT_OBJECT_TABLE,
-        ACTION_STATEMENT
+        EVENT_OBJECT_TABLE{definitions}
     FROM information_schema.TRIGGERS t
     WHERE 1=1
     {filters}
     ORDER BY TRIGGER_SCHEMA, TRIGGER_NAME"""
 
     _filter_fields = {SCHEMA: 'TRIGGER_SCHEMA'}
+    _filter_keys = {SCHEMA: 'TRIGGER_SCHEMA'}
+    _definitions = """,
+        ACTION_STATEMENT"""
+    _definition_keys = ('ACTION_STATEMENT',)
+    _row_keys = ('TRIGGER_SCHEMA', 'TRIGGER_NAME')
+    _definitions_query = """SELECT
+        TRIGGER_SCHEMA,
+        TRIGGER_NAME{definitions}
+    FROM information_schema.TRIGGERS t
+    WHERE 1=1
+    {filters}"""
 
 
 class ViewsQuery(QueryBase):
 
     base_query = """SELECT
         TABLE_SCHEMA,
-        TABLE_NAME,
-        VIEW_DEFINITION,
+        TABLE_NAME,{definitions}
         IS_UPDATABLE
     FROM information_schema.VIEWS v
     WHERE 1=1
@@ -200,3 +296,135 @@ class ViewsQuery(QueryBase):
     ORDER BY TABLE_SCHEMA, TABLE_NAME"""
 
     _filter_fields = {SCHEMA: 'TABLE_SCHEMA'}
+    _filter_keys = {SCHEMA: 'TABLE_SCHEMA'}
+    _definitions = """
+        VIEW_DEFINITION,"""
+    _definition_keys = ('VIEW_DEFINITION',)
+    _row_keys = ('TABLE_SCHEMA', 'TABLE_NAME')
+    _definitions_query = """SELECT
+        TABLE_SCHEMA,
+        TABLE_NAME,
+        VIEW_DEFINITION
+    FROM information_schema.VIEWS v
+    WHERE 1=1
+    {filters}"""
+
+
+class NestedTablesQuery(QueryBase):
+    """Tables with their columns and foreign keys in one statement (MySQL 5.7.22+, MariaDB 10.5+):
+    columns and foreign keys are aggregated per table with JSON_ARRAYAGG.
+    Returns rows of TablesQuery with 'columns' filled, each column with
+    'foreign_keys' filled, like DBRendererBase.collect_tables does."""
+
+    column_keys = ('TABLE_SCHEMA', 'TABLE_NAME', 'COLUMN_NAME', 'ORDINAL_POSITION',
+                   'IS_NULLABLE', 'DATA_TYPE', 'COLUMN_DEFAULT',
+                   'CHARACTER_MAXIMUM_LENGTH', 'NUMERIC_PRECISION', 'COLUMN_COMMENT')
+    foreign_key_keys = ('CONSTRAINT_SCHEMA', 'CONSTRAINT_NAME', 'TABLE_NAME', 'COLUMN_NAME',
+                        'REFERENCED_TABLE_SCHEMA', 'REFERENCED_TABLE_NAME',
+                        'REFERENCED_COLUMN_NAME')
+
+    base_query = '''SELECT
+        t.TABLE_SCHEMA,
+        t.TABLE_NAME,
+        t.TABLE_COMMENT,
+        cols.ITEMS AS COLUMNS_JSON,
+        fks.ITEMS AS FOREIGN_KEYS_JSON
+    FROM ({tables}) t
+    LEFT JOIN (
+        SELECT c.TABLE_SCHEMA, c.TABLE_NAME, JSON_ARRAYAGG(JSON_OBJECT({column_items})) AS ITEMS
+        FROM ({columns}) c
+        GROUP BY c.TABLE_SCHEMA, c.TABLE_NAME
+    ) cols
+      ON cols.TABLE_SCHEMA = t.TABLE_SCHEMA
+     AND cols.TABLE_NAME = t.TABLE_NAME
+    LEFT JOIN (
+        SELECT f.CONSTRAINT_SCHEMA, f.TABLE_NAME, JSON_ARRAYAGG(JSON_OBJECT({foreign_key_items})) AS ITEMS
+        FROM ({foreign_keys}) f
+        GROUP BY f.CONSTRAINT_SCHEMA, f.TABLE_NAME
+    ) fks
+      ON fks.CONSTRAINT_SCHEMA = t.TABLE_SCHEMA
+     AND fks.TABLE_NAME = t.TABLE_NAME
+    ORDER BY t.TABLE_NAME'''
+
+    def __init__(self,
+                 con,
+                 filters: dict = {},
+                 fetch_size: int = None):
+        super().__init__(con, filters, fetch_size)
+        self._parts = {
+            'tables': TablesQuery(con, filters).sql,
+            'columns': TableColumnsQuery(con, filters).sql,
+            'foreign_keys': ForeignKeysQuery(con, filters).sql
+        }
+
+    @staticmethod
+    def _json_items(alias: str, keys: tuple) -> str:
+        return ', '.join(f"'{key}', {alias}.{key}" for key in keys)
+
+    @property
+    def sql(self):
+        return self.base_query.format(
+            column_items=self._json_items('c', self.column_keys),
+            foreign_key_items=self._json_items('f', self.foreign_key_keys),
+            **self._parts
+        )
+
+    @staticmethod
+    def _coerce(item: dict) -> dict:
+        # values of the other queries are decoded strings, NULLs are ''
+        return {key: '' if value is None else str(value) for key, value in item.items()}
+
+    def run(self):
+        result = []
+        for row in self._get_rows(self.sql):
+            columns = [self._coerce(c) for c in json.loads(row['COLUMNS_JSON'] or '[]')]
+            # JSON_ARRAYAGG doesn't keep the order
+            columns.sort(key=lambda c: int(c['ORDINAL_POSITION']))
+            fks = {}
+            for fk in json.loads(row['FOREIGN_KEYS_JSON'] or '[]'):
+                fks.setdefault(fk['COLUMN_NAME'], []).append(self._coerce(fk))
+            for column in columns:
+                column['foreign_keys'] = fks.get(column['COLUMN_NAME'], [])
+            table = {key: row[key] for key in ('TABLE_SCHEMA', 'TABLE_NAME', 'TABLE_COMMENT')}
+            table['columns'] = columns
+            result.append(table)
+        return result
+
+
+class FingerprintQuery(QueryBase):
+    """Counts and latest creation and change times of tables, views, routines
+    and triggers in the schemas selected by the schema filter. COLUMNS and
+    KEY_COLUMN_USAGE are not read: on MySQL 5.7 they are built by opening
+    every table, which is as slow as the catalog queries themselves."""
+
+    base_query = """SELECT
+        (SELECT COUNT(*) FROM information_schema.TABLES
+            WHERE 1=1 {filters}) AS TABLES_COUNT,
+        (SELECT MAX(CREATE_TIME) FROM information_schema.TABLES
+            WHERE 1=1 {filters}) AS TABLES_CREATE_TIME,
+        (SELECT COUNT(*) FROM information_schema.VIEWS
+            WHERE 1=1 {filters}) AS VIEWS_COUNT,
+        (SELECT COUNT(*) FROM information_schema.ROUTINES
+            WHERE 1=1 {routine_filters}) AS ROUTINES_COUNT,
+        (SELECT MAX(LAST_ALTERED) FROM information_schema.ROUTINES
+            WHERE 1=1 {routine_filters}) AS ROUTINES_LAST_ALTERED,
+        (SELECT COUNT(*) FROM information_schema.TRIGGERS
+            WHERE 1=1 {trigger_filters}) AS TRIGGERS_COUNT,
+        (SELECT MAX(CREATED) FROM information_schema.TRIGGERS
+            WHERE 1=1 {trigger_filters}) AS TRIGGERS_CREATED"""
+
+    # schema fields of the catalog tables by their placeholders in base_query
+    _schema_fields = {'filters': 'TABLE_SCHEMA',
+                      'routine_filters': 'ROUTINE_SCHEMA',
+                      'trigger_filters': 'TRIGGER_SCHEMA'}
+
+    def __init__(self, con, filters: dict = {}, **kwargs):
+        super().__init__(con, filters, **kwargs)
+        self._schema_filters = {}
+        for placeholder, field in self._schema_fields.items():
+            self._filter_fields = {SCHEMA: field}
+            self._schema_filters[placeholder] = self._resolve_filters(filters)
+
+    @property
+    def sql(self):
+        return self.base_query.format(**self._schema_filters)
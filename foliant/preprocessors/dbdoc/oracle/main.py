@@ -1,12 +1,15 @@
 import os
-from copy import deepcopy
 from logging import getLogger
 
+from .queries import ClientFunctionsQuery
 from .queries import ColumnsQuery
+from .queries import FingerprintQuery
 from .queries import ForeignKeysQuery
 from .queries import FunctionsQuery
 from .queries import TablesQuery
+from .queries import TriggerBodiesQuery
 from .queries import TriggersQuery
+from .queries import TriggersSourceQuery
 from .queries import ViewsQuery
 from ..base.main import LibraryNotInstalledError
 from foliant.preprocessors.dbdoc.base.main import DBRendererBase
@@ -31,9 +34,26 @@ class OracleRenderer(DBRendererBase):
             'triggers',
             'views'
         ],
-        'strict': False
+        'strict': False,
+        'source_aggregation': 'server'
     }
     module_name = __name__
+    cache_key_options = DBRendererBase.cache_key_options + ('source_aggregation',)
+    fingerprint_query = FingerprintQuery
+    component_queries = {
+        'tables': {
+            'tables': TablesQuery,
+            'columns': ColumnsQuery,
+            'foreign_keys': ForeignKeysQuery
+        },
+        'views': {'views': ViewsQuery},
+        'functions': {'functions': FunctionsQuery},
+        'triggers': {'triggers': TriggersQuery}
+    }
+    client_component_queries = {
+        **component_queries,
+        'functions': {'functions': ClientFunctionsQuery}
+    }
 
     def connect(self):
         """
@@ -53,13 +73,15 @@ class OracleRenderer(DBRendererBase):
             f" dbname={self.options['dbname']}, user={self.options['user']} "
             f"password={self.options['password']}."
         )
+        dsn = (
+            f"{self.options['user']}/{self.options['password']}@"
+            f"{self.options['host']}:{self.options['port']}/"
+            f"{self.options['dbname']}"
+        )
         try:
-            self.con = cx_Oracle.connect(
-                f"{self.options['user']}/{self.options['password']}@"
-                f"{self.options['host']}:{self.options['port']}/"
-                f"{self.options['dbname']}",
-                encoding='UTF-8',
-                nencoding='UTF-8'
+            self.con = self.get_connection(
+                dsn,
+                lambda: cx_Oracle.connect(dsn, encoding='UTF-8', nencoding='UTF-8')
             )
         except cx_Oracle.Error as e:
             msg = f"\nOracle database connection error: {e}"
@@ -70,94 +92,41 @@ class OracleRenderer(DBRendererBase):
             else:
                 logger.debug(f"{msg}. Skipping.")
 
-    def collect_datasets(self) -> dict:
-
-        result = {}
-        filters = self.options.get('filters', {})
-        components = self.options['components']
-
-        if 'tables' in components:
-            q_tables = TablesQuery(self.con, filters)
-            logger.debug(f'Tables query:\n\n {q_tables.sql}')
-            tables = q_tables.run()
-
-            q_columns = ColumnsQuery(self.con, filters)
-            logger.debug(f'Columns query:\n\n {q_columns.sql}')
-            columns = q_columns.run()
-
-            q_fks = ForeignKeysQuery(self.con, filters)
-            logger.debug(f'Foreign keys query:\n\n {q_fks.sql}')
-            fks = q_fks.run()
-
-            # fill each table with columns and foreign keys
-            result['tables'] = self.collect_tables(tables, columns, fks)
-
-        if 'views' in components:
-            q_views = ViewsQuery(self.con, filters)
-            logger.debug(f'Views query:\n\n {q_views.sql}')
-            result['views'] = q_views.run()
-
-        if 'functions' in components:
-            q_functions = FunctionsQuery(self.con, filters)
-            logger.debug(f'Functions query:\n\n {q_functions.sql}')
-            result['functions'] = q_functions.run()
+    def get_component_queries(self) -> dict:
+        if self.options['source_aggregation'] == 'client':
+            return self.client_component_queries
+        return self.component_queries
 
-        if 'triggers' in components:
-            q_triggers = TriggersQuery(self.con, filters)
-            logger.debug(f'Triggers query:\n\n {q_triggers.sql}')
-            result['triggers'] = q_triggers.run()
+    def defer_definitions(self, query_class) -> bool:
+        if self.options['source_aggregation'] == 'client' and query_class is TriggersQuery:
+            # trigger sources are assembled on client side in load_definitions
+            return True
+        return super().defer_definitions(query_class)
 
-        return result
-
-    def collect_tables(self,
-                       tables: list,
-                       columns: list,
-                       fks: list) -> list:
-        '''
-        Parse table and column query results got from db and:
-
-        - add 'columns' attribute to each table row with list of table columns;
-        - add 'foreign_keys' attribute to each column with list of fks if it is a
-          forign key column.
-
-        returns transformed list of tables.
-        '''
-
-        result = deepcopy(tables)
-        for table in result:
-            # get columns for this table
-            table_columns = list(filter(lambda x: x['TABLE_NAME'] == table['TABLE_NAME'],
-                                        columns))
-            for col in table_columns:
-                # get foreign keys for this column
-                fks_fltr = list(
-                    filter(
-                        lambda x: x['TABLE_NAME'] == table['TABLE_NAME']
-                        and x['COLUMN_NAME'] == col['COLUMN_NAME'], fks
-                    )
-                )
-                col['foreign_keys'] = fks_fltr
-            table['columns'] = table_columns
-        return result
-
-    def collect_functions(self,
-                          functions: list,
-                          parameters: list) -> list:
+    def load_definitions(self, query_class, title: str) -> list:
         '''
-        Parse function and parameter query results got from db and add 'parameters'
-        key to each function filled with its parameters
+        With source_aggregation: client, get sources of triggers from lines of
+        ALL_SOURCE instead of XMLAGG aggregation in the database.
         '''
-
-        result = deepcopy(functions)
-        for func in result:
-            # get parameters for this function
-            function_params = list(
-                filter(
-                    lambda x: x['specific_name'] == func['specific_name'], parameters
-                )
-            )
-            func['parameters'] = function_params
-        return result
+        if self.options['source_aggregation'] != 'client' or query_class is not TriggersQuery:
+            return super().load_definitions(query_class, title)
+
+        sources = {
+            (row['OWNER'], row['NAME']): row['SOURCE']
+            for row in super().load_definitions(TriggersSourceQuery, f'{title} source')
+        }
+        bodies = super().load_definitions(TriggerBodiesQuery, f'{title} body')
+        for row in bodies:
+            row['SOURCE'] = sources.get((row['OWNER'], row['TRIGGER_NAME']), '')
+        return bodies
+
+    def is_alive(self, con) -> bool:
+        '''Check that the connection may be reused with a server round-trip.'''
+        try:
+            con.ping()
+        except Exception:
+            return False
+        return True
 
 
 def set_up_logger(logger_):
@@ -1,5 +1,9 @@
 from abc import ABCMeta
 
+from ..base.filters import OPERATORS
+from ..base.rows import Columns
+from ..base.rows import make_rows
+
 
 SCHEMA = 'schema'
 TABLE_NAME = 'table_name'
@@ -10,13 +14,34 @@ class QueryBase(metaclass=ABCMeta):
     base_query = ''
 
     _filter_fields = {}
+    # result row keys of the filtering fields, used to filter memoized
+    # unfiltered query results on client side
+    _filter_keys = {}
+    _filter_operators = OPERATORS
+    _filter_ignore_case = False
+    # definition columns which may be fetched lazily: select expressions in
+    # _definitions are put into base_query in place of {definitions},
+    # _definition_keys are their keys in result rows, _row_keys identify rows
+    _definitions = ''
+    _definition_keys = ()
+    _row_keys = ()
+    # statement which selects only _row_keys and _definition_keys to load
+    # deferred definitions, with {filters} and {definitions} like base_query;
+    # the full query is used if it is not set
+    _definitions_query = ''
     # sort_fields = {}
 
     def __init__(self,
                  con,
-                 filters: dict = {}):
+                 filters: dict = {},
+                 fetch_size: int = None,
+                 defer_definitions: bool = False,
+                 definitions_only: bool = False):
         self._con = con
         self._filters = self._resolve_filters(filters)
+        self._fetch_size = fetch_size
+        self._defer_definitions = defer_definitions
+        self._definitions_only = definitions_only
 
     def _resolve_filters(self, filters: dict) -> str:
         resolvers = {'in': self._in,
@@ -79,22 +104,40 @@ class QueryBase(metaclass=ABCMeta):
         return f"{field} != {value}"
 
     def _get_rows(self, sql) -> list:
-        """Run query from sql param and return a list of dicts key=column name,
-        value = field value"""
+        """Run query from sql param and return a list of rows which behave like
+        dicts key=column name, value = field value.
+
+        If fetch_size is set, rows are fetched by batches of fetch_size rows,
+        so that the whole result set is never held by the driver."""
         cur = self._con.cursor()
+        if self._fetch_size:
+            cur.arraysize = self._fetch_size
         cur.execute(sql)
         result = []
-        keys = tuple((d[0] for d in cur.description))
-        for row in cur.fetchall():
-            row_dict = {}
-            for i in range(len(keys)):
-                row_dict[keys[i]] = row[i] or ''
-            result.append(row_dict)
+        keys = Columns(d[0] for d in cur.description)
+        for batch in self._batches(cur):
+            result.extend(make_rows(keys, batch))
+        cur.close()
         return result
 
+    def _batches(self, cur):
+        """Yield fetched rows by batches of fetch_size or all at once"""
+        if not self._fetch_size:
+            yield cur.fetchall()
+            return
+        while True:
+            batch = cur.fetchmany(self._fetch_size)
+            if not batch:
+                break
+            yield batch
+
     @property
     def sql(self):
-        return self.base_query.format(filters=self._filters)
+        if self._definitions_only:
+            query = self._definitions_query or self.base_query
+            return query.format(filters=self._filters, definitions=self._definitions)
+        definitions = '' if self._defer_definitions else self._definitions
+        return self.base_query.format(filters=self._filters, definitions=definitions)
 
     def run(self):
         return self._get_rows(self.sql)
@@ -115,11 +158,14 @@ class TablesQuery(QueryBase):
 
     _filter_fields = {SCHEMA: 'tab.OWNER',
                       TABLE_NAME: 'tab.TABLE_NAME'}
+    _filter_keys = {SCHEMA: 'OWNER',
+                    TABLE_NAME: 'TABLE_NAME'}
 
 
 class ColumnsQuery(QueryBase):
 
     base_query = '''SELECT
+      tab.OWNER,
       col.TABLE_NAME,
       col.COLUMN_ID,
       col.COLUMN_NAME,
@@ -141,6 +187,8 @@ class ColumnsQuery(QueryBase):
 
     _filter_fields = {SCHEMA: 'tab.OWNER',
                       TABLE_NAME: 'col.TABLE_NAME'}
+    _filter_keys = {SCHEMA: 'OWNER',
+                    TABLE_NAME: 'TABLE_NAME'}
 
 
 class ForeignKeysQuery(QueryBase):
@@ -163,14 +211,18 @@ class ForeignKeysQuery(QueryBase):
     WHERE c.CONSTRAINT_TYPE = 'R'
     {filters}'''
 
+    _filter_fields = {SCHEMA: 'c.OWNER',
+                      TABLE_NAME: 'a.TABLE_NAME'}
+    _filter_keys = {SCHEMA: 'OWNER',
+                    TABLE_NAME: 'TABLE_NAME'}
+
 
 class FunctionsQuery(QueryBase):
 
     base_query = """SELECT
         NAME,
         TYPE,
-        OWNER,
-        RTRIM(XMLAGG(XMLELEMENT(E,TEXT).EXTRACT('//text()') ORDER BY LINE).GetClobVal(),',') AS SOURCE
+        OWNER{definitions}
     FROM ALL_SOURCE
     WHERE TYPE in ('FUNCTION', 'PROCEDURE')
     {filters}
@@ -178,6 +230,11 @@ class FunctionsQuery(QueryBase):
     ORDER BY NAME"""
 
     _filter_fields = {SCHEMA: 'OWNER'}
+    _filter_keys = {SCHEMA: 'OWNER'}
+    _definitions = """,
+        RTRIM(XMLAGG(XMLELEMENT(E,TEXT).EXTRACT('//text()') ORDER BY LINE).GetClobVal(),',') AS SOURCE"""
+    _definition_keys = ('SOURCE',)
+    _row_keys = ('OWNER', 'TYPE', 'NAME')
 
 
 class TriggersQuery(QueryBase):
@@ -189,7 +246,15 @@ class TriggersQuery(QueryBase):
         tr.TRIGGERING_EVENT,
         tr.TABLE_OWNER,
         tr.TABLE_NAME,
-        tr.DESCRIPTION,
+        tr.DESCRIPTION{definitions}
+            FROM ALL_TRIGGERS tr
+            WHERE 1=1
+            {filters}
+            ORDER BY TABLE_NAME, trigger_name"""
+
+    _filter_fields = {SCHEMA: 'tr.OWNER'}
+    _filter_keys = {SCHEMA: 'OWNER'}
+    _definitions = """,
         tr.TRIGGER_BODY,
         (SELECT
             RTRIM(XMLAGG(XMLELEMENT(E,TEXT).EXTRACT('//text()') ORDER BY LINE).GetClobVal(),',') AS SOURCE
@@ -197,21 +262,22 @@ class TriggersQuery(QueryBase):
         WHERE TYPE = 'TRIGGER'
           AND owner = tr.owner
           AND name = tr.TRIGGER_NAME
-        GROUP BY name, TYPE, owner) AS SOURCE
+        GROUP BY name, TYPE, owner) AS SOURCE"""
+    _definition_keys = ('TRIGGER_BODY', 'SOURCE')
+    _row_keys = ('OWNER', 'TRIGGER_NAME')
+    _definitions_query = """SELECT
+        tr.OWNER,
+        tr.TRIGGER_NAME{definitions}
             FROM ALL_TRIGGERS tr
             WHERE 1=1
-            {filters}
-            ORDER BY TABLE_NAME, trigger_name"""
-
-    _filter_fields = {SCHEMA: 'tr.OWNER'}
+            {filters}"""
 
 
 class ViewsQuery(QueryBase):
 
     base_query = """SELECT
         OWNER,
-        VIEW_NAME,
-        TEXT
+        VIEW_NAME{definitions}
         -- TEXT_VC
     FROM ALL_VIEWS
     WHERE 1=1
@@ -219,3 +285,134 @@ class ViewsQuery(QueryBase):
     ORDER BY VIEW_NAME"""
 
     _filter_fields = {SCHEMA: 'OWNER'}
+    _filter_keys = {SCHEMA: 'OWNER'}
+    _definitions = """,
+        TEXT"""
+    _definition_keys = ('TEXT',)
+    _row_keys = ('OWNER', 'VIEW_NAME')
+
+
+class SourceQueryBase(QueryBase):
+    """Lines of PL/SQL sources from ALL_SOURCE, which are joined into one
+    SOURCE value per object on client side. Lines are read by batches in the
+    order of the query, so that only one object is assembled at a time."""
+
+    # source lines are always streamed
+    default_fetch_size = 1000
+
+    _filter_fields = {SCHEMA: 'OWNER'}
+    _filter_keys = {SCHEMA: 'OWNER'}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._fetch_size = self._fetch_size or self.default_fetch_size
+
+    def _iter_lines(self):
+        cur = self._con.cursor()
+        cur.arraysize = self._fetch_size
+        cur.execute(self.sql)
+        for batch in self._batches(cur):
+            yield from batch
+        cur.close()
+
+    def run(self):
+        result = []
+        current = None
+        text = []
+        for owner, type_, name, line in self._iter_lines():
+            if (owner, type_, name) != current:
+                if current is not None:
+                    # same as RTRIM(..., ',') of the XMLAGG aggregation
+                    result.append((*current, ''.join(text).rstrip(',')))
+                current = (owner, type_, name)
+                text = []
+            text.append(line or '')
+        if current is not None:
+            result.append((*current, ''.join(text).rstrip(',')))
+        return make_rows(('OWNER', 'TYPE', 'NAME', 'SOURCE'), result)
+
+
+class FunctionsSourceQuery(SourceQueryBase):
+
+    base_query = """SELECT
+        OWNER,
+        TYPE,
+        NAME,
+        TEXT
+    FROM ALL_SOURCE
+    WHERE TYPE in ('FUNCTION', 'PROCEDURE')
+    {filters}
+    ORDER BY OWNER, TYPE, NAME, LINE"""
+
+
+class ClientFunctionsQuery(FunctionsSourceQuery):
+    """Functions query for source_aggregation: client. Functions and their
+    sources are got from one scan of ALL_SOURCE lines. With deferred
+    definitions functions are listed from ALL_OBJECTS, and ALL_SOURCE is
+    only read in load_definitions."""
+
+    objects_query = """SELECT
+        OBJECT_NAME AS NAME,
+        OBJECT_TYPE AS TYPE,
+        OWNER
+    FROM ALL_OBJECTS
+    WHERE OBJECT_TYPE in ('FUNCTION', 'PROCEDURE')
+    {filters}
+    ORDER BY OBJECT_NAME"""
+
+    # sources are not selected by a column expression, but joined from lines,
+    # _definitions only marks them as deferrable
+    _definitions = 'SOURCE'
+    _definition_keys = ('SOURCE',)
+    _row_keys = ('OWNER', 'TYPE', 'NAME')
+
+    @property
+    def sql(self):
+        if self._defer_definitions:
+            return self.objects_query.format(filters=self._filters)
+        return super().sql
+
+    def run(self):
+        if self._defer_definitions:
+            return self._get_rows(self.sql)
+        # same order as FunctionsQuery
+        return sorted(super().run(), key=lambda row: row['NAME'])
+
+
+class TriggersSourceQuery(SourceQueryBase):
+
+    base_query = """SELECT
+        OWNER,
+        TYPE,
+        NAME,
+        TEXT
+    FROM ALL_SOURCE
+    WHERE TYPE = 'TRIGGER'
+    {filters}
+    ORDER BY OWNER, TYPE, NAME, LINE"""
+
+
+class TriggerBodiesQuery(QueryBase):
+
+    base_query = """SELECT
+        tr.OWNER,
+        tr.TRIGGER_NAME,
+        tr.TRIGGER_BODY
+    FROM ALL_TRIGGERS tr
+    WHERE 1=1
+    {filters}"""
+
+    _filter_fields = {SCHEMA: 'tr.OWNER'}
+    _filter_keys = {SCHEMA: 'OWNER'}
+
+
+class FingerprintQuery(QueryBase):
+
+    base_query = """SELECT
+        MAX(LAST_DDL_TIME) AS LAST_DDL_TIME,
+        COUNT(*) AS OBJECTS_COUNT
+    FROM ALL_OBJECTS
+    WHERE 1=1
+    {filters}"""
+
+    _filter_fields = {SCHEMA: 'OWNER'}
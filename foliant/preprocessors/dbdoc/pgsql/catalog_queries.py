@@ -0,0 +1,208 @@
+# Alternative query set for PostgreSQL 11+ (query_set: pg_catalog), which reads
+# pg_catalog directly instead of information_schema views. Rows have the same
+# keys as rows of queries from queries.py, so the templates work with both.
+from .queries import SCHEMA
+from .queries import TABLE_NAME
+from .queries import QueryBase
+
+
+# information_schema.columns / routines / parameters data_type
+TYPE_NAME = """CASE
+            WHEN {t}.typelem <> 0 AND {t}.typlen = -1 THEN 'ARRAY'
+            WHEN {nt}.nspname = 'pg_catalog' THEN format_type({t}.oid, null)
+            ELSE 'USER-DEFINED'
+        END"""
+
+
+class ColumnsQuery(QueryBase):
+
+    base_query = '''SELECT
+      n.nspname AS table_schema,
+      c.relname AS table_name,
+      a.attnum AS ordinal_position,
+      a.attname AS column_name,
+      CASE WHEN a.attnotnull OR (t.typtype = 'd' AND t.typnotnull) THEN 'NO' ELSE 'YES' END
+        AS is_nullable,
+      CASE
+        WHEN t.typtype = 'd' THEN
+          CASE
+            WHEN bt.typelem <> 0 AND bt.typlen = -1 THEN 'ARRAY'
+            WHEN nbt.nspname = 'pg_catalog' THEN format_type(t.typbasetype, null)
+            ELSE 'USER-DEFINED'
+          END
+        ELSE ''' + TYPE_NAME.format(t='t', nt='nt') + ''' END AS data_type,
+      pg_get_expr(ad.adbin, ad.adrelid) AS column_default,
+      information_schema._pg_char_max_length(
+        information_schema._pg_truetypid(a.*, t.*),
+        information_schema._pg_truetypmod(a.*, t.*)
+      ) AS character_maximum_length,
+      information_schema._pg_numeric_precision(
+        information_schema._pg_truetypid(a.*, t.*),
+        information_schema._pg_truetypmod(a.*, t.*)
+      ) AS numeric_precision,
+      pd.description
+    FROM pg_catalog.pg_attribute a
+    JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_catalog.pg_type t ON t.oid = a.atttypid
+    JOIN pg_catalog.pg_namespace nt ON nt.oid = t.typnamespace
+    LEFT JOIN pg_catalog.pg_type bt
+           ON t.typtype = 'd' AND bt.oid = t.typbasetype
+    LEFT JOIN pg_catalog.pg_namespace nbt ON nbt.oid = bt.typnamespace
+    LEFT JOIN pg_catalog.pg_attrdef ad
+           ON ad.adrelid = a.attrelid
+          AND ad.adnum = a.attnum
+    LEFT JOIN pg_catalog.pg_description pd
+           ON pd.objoid = c.oid
+          AND pd.objsubid = a.attnum
+    WHERE c.relkind IN ('r', 'p')
+      AND a.attnum > 0
+      AND NOT a.attisdropped
+    {filters}
+    ORDER BY c.relname, a.attnum'''
+
+    _filter_fields = {SCHEMA: 'n.nspname',
+                      TABLE_NAME: 'c.relname'}
+    _filter_keys = {SCHEMA: 'table_schema',
+                    TABLE_NAME: 'table_name'}
+
+
+class ForeignKeysQuery(QueryBase):
+
+    base_query = '''SELECT
+        n.nspname AS table_schema,
+        con.conname AS constraint_name,
+        c.relname AS table_name,
+        a.attname AS column_name,
+        fn.nspname AS foreign_table_schema,
+        fc.relname AS foreign_table_name,
+        fa.attname AS foreign_column_name
+    FROM pg_catalog.pg_constraint con
+    CROSS JOIN LATERAL unnest(con.conkey, con.confkey) AS k (attnum, foreign_attnum)
+    JOIN pg_catalog.pg_class c ON c.oid = con.conrelid
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_catalog.pg_attribute a
+      ON a.attrelid = con.conrelid
+     AND a.attnum = k.attnum
+    JOIN pg_catalog.pg_class fc ON fc.oid = con.confrelid
+    JOIN pg_catalog.pg_namespace fn ON fn.oid = fc.relnamespace
+    JOIN pg_catalog.pg_attribute fa
+      ON fa.attrelid = con.confrelid
+     AND fa.attnum = k.foreign_attnum
+    WHERE con.contype = 'f'
+    {filters}'''
+
+    _filter_fields = {SCHEMA: 'n.nspname',
+                      TABLE_NAME: 'c.relname'}
+    _filter_keys = {SCHEMA: 'table_schema',
+                    TABLE_NAME: 'table_name'}
+
+
+class FunctionsQuery(QueryBase):
+
+    base_query = """SELECT
+        n.nspname AS routine_schema,
+        p.proname AS routine_name,
+        p.proname || '_' || p.oid AS specific_name,
+        CASE WHEN p.prokind = 'p' THEN NULL
+        ELSE """ + TYPE_NAME.format(t='t', nt='nt') + """ END AS data_type,{definitions}
+        upper(l.lanname) AS external_language,
+        pd.description
+    FROM pg_catalog.pg_proc p
+    JOIN pg_catalog.pg_namespace n ON n.oid = p.pronamespace
+    JOIN pg_catalog.pg_language l ON l.oid = p.prolang
+    JOIN pg_catalog.pg_type t ON t.oid = p.prorettype
+    JOIN pg_catalog.pg_namespace nt ON nt.oid = t.typnamespace
+    LEFT JOIN pg_catalog.pg_description pd
+        on pd.objoid = p.oid
+    WHERE p.prokind IN ('f', 'p')
+    {filters}
+    ORDER BY p.proname"""
+
+    _filter_fields = {SCHEMA: 'n.nspname'}
+    _filter_keys = {SCHEMA: 'routine_schema'}
+    _definitions = """
+        p.prosrc AS routine_definition,"""
+    _definition_keys = ('routine_definition',)
+    _row_keys = ('specific_name',)
+    _definitions_query = """SELECT
+        p.proname || '_' || p.oid AS specific_name,
+        p.prosrc AS routine_definition
+    FROM pg_catalog.pg_proc p
+    JOIN pg_catalog.pg_namespace n ON n.oid = p.pronamespace
+    WHERE p.prokind IN ('f', 'p')
+    {filters}"""
+
+
+class ParametersQuery(QueryBase):
+
+    base_query = """SELECT
+        n.nspname AS specific_schema,
+        p.proname || '_' || p.oid AS specific_name,
+        NULLIF(p.proargnames[arg.n], '') AS parameter_name,
+        CASE COALESCE(p.proargmodes[arg.n], 'i')
+            WHEN 'i' THEN 'IN'
+            WHEN 'o' THEN 'OUT'
+            WHEN 'b' THEN 'INOUT'
+            WHEN 'v' THEN 'IN'
+            WHEN 't' THEN 'OUT'
+        END AS parameter_mode,
+        """ + TYPE_NAME.format(t='t', nt='nt') + """ AS data_type,
+        pg_get_function_arg_default(p.oid, arg.n::int) AS parameter_default
+    FROM pg_catalog.pg_proc p
+    JOIN pg_catalog.pg_namespace n ON n.oid = p.pronamespace
+    CROSS JOIN LATERAL unnest(COALESCE(p.proallargtypes, p.proargtypes::oid[]))
+        WITH ORDINALITY AS arg (type_oid, n)
+    JOIN pg_catalog.pg_type t ON t.oid = arg.type_oid
+    JOIN pg_catalog.pg_namespace nt ON nt.oid = t.typnamespace
+    WHERE 1=1
+    {filters}
+    ORDER BY p.oid, arg.n"""
+
+    _filter_fields = {SCHEMA: 'n.nspname'}
+    _filter_keys = {SCHEMA: 'specific_schema'}
+
+
+class TriggersQuery(QueryBase):
+
+    base_query = """SELECT
+       c.relname AS event_object_table,
+       t.tgname AS trigger_name,
+       em.text AS event_manipulation,
+       n.nspname AS trigger_schema,
+       CASE t.tgtype & 66
+           WHEN 2 THEN 'BEFORE'
+           WHEN 64 THEN 'INSTEAD OF'
+           ELSE 'AFTER'
+       END AS action_timing,
+       CASE t.tgtype & 1 WHEN 1 THEN 'ROW' ELSE 'STATEMENT' END AS action_orientation{definitions}
+    FROM pg_catalog.pg_trigger t
+    JOIN pg_catalog.pg_class c ON c.oid = t.tgrelid
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    JOIN (VALUES (4, 'INSERT'), (8, 'DELETE'), (16, 'UPDATE')) AS em (num, text)
+      ON t.tgtype & em.num <> 0
+    WHERE NOT t.tgisinternal
+    {filters}
+    ORDER BY c.relname, t.tgname"""
+
+    _filter_fields = {SCHEMA: 'n.nspname'}
+    _filter_keys = {SCHEMA: 'trigger_schema'}
+    _definitions = """,
+       substring(
+           substring(pg_get_triggerdef(t.oid) from 48)
+           from 'EXECUTE (?:FUNCTION|PROCEDURE) .*$'
+       ) AS action_statement"""
+    _definition_keys = ('action_statement',)
+    _row_keys = ('trigger_schema', 'event_object_table', 'trigger_name', 'event_manipulation')
+    _definitions_query = """SELECT
+       c.relname AS event_object_table,
+       t.tgname AS trigger_name,
+       em.text AS event_manipulation,
+       n.nspname AS trigger_schema{definitions}
+    FROM pg_catalog.pg_trigger t
+    JOIN pg_catalog.pg_class c ON c.oid = t.tgrelid
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    JOIN (VALUES (4, 'INSERT'), (8, 'DELETE'), (16, 'UPDATE')) AS em (num, text)
+      ON t.tgtype & em.num <> 0
+    WHERE NOT t.tgisinternal
+    {filters}"""
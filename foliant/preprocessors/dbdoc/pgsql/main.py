@@ -1,11 +1,14 @@
 import os
-from copy import deepcopy
 from logging import getLogger
 
+from . import catalog_queries
 from ..base.main import LibraryNotInstalledError
+from ..base.rows import coerce_nested
 from .queries import ColumnsQuery
+from .queries import FingerprintQuery
 from .queries import ForeignKeysQuery
 from .queries import FunctionsQuery
+from .queries import NestedCatalogQuery
 from .queries import ParametersQuery
 from .queries import TablesQuery
 from .queries import TriggersQuery
@@ -32,9 +35,78 @@ class PGSQLRenderer(DBRendererBase):
             'functions',
             'triggers'
         ],
-        'strict': False
+        'strict': False,
+        'query_set': 'information_schema'
     }
     module_name = __name__
+    cache_key_options = DBRendererBase.cache_key_options + ('query_set',)
+    fingerprint_query = FingerprintQuery
+    component_queries = {
+        'tables': {
+            'tables': TablesQuery,
+            'columns': ColumnsQuery,
+            'foreign_keys': ForeignKeysQuery
+        },
+        'views': {'views': ViewsQuery},
+        'functions': {
+            'functions': FunctionsQuery,
+            'parameters': ParametersQuery
+        },
+        'triggers': {'triggers': TriggersQuery}
+    }
+    catalog_component_queries = {
+        'tables': {
+            'tables': TablesQuery,
+            'columns': catalog_queries.ColumnsQuery,
+            'foreign_keys': catalog_queries.ForeignKeysQuery
+        },
+        'views': {'views': ViewsQuery},
+        'functions': {
+            'functions': catalog_queries.FunctionsQuery,
+            'parameters': catalog_queries.ParametersQuery
+        },
+        'triggers': {'triggers': catalog_queries.TriggersQuery}
+    }
+    join_fields = {
+        'tables': ('relname',),
+        'columns': ('table_name', 'column_name'),
+        'foreign_keys': ('table_name', 'column_name'),
+        'functions': ('specific_name',),
+        'parameters': ('specific_name',)
+    }
+
+    def get_component_queries(self) -> dict:
+        if self.options['query_set'] == 'pg_catalog':
+            return self.catalog_component_queries
+        return self.component_queries
+
+    def collect_datasets(self) -> dict:
+        if self.options['collection_mode'] == 'nested':
+            return self.collect_nested()
+        return super().collect_datasets()
+
+    def collect_nested(self) -> dict:
+        '''
+        Get all datasets in one round-trip: the catalog queries are combined
+        into one statement, which returns tables with columns and foreign keys
+        and functions with parameters as one json document.
+        '''
+        components = self.get_used_components()
+        if not components:
+            return {}
+        queries = {}
+        for component in components:
+            queries.update(self.get_component_queries()[component])
+
+        query = NestedCatalogQuery(
+            self.con,
+            queries,
+            self.join_fields,
+            self.options.get('filters', {}),
+            self.options['fetch_size']
+        )
+        catalog = self.execute_query(query, 'Nested catalog query')
+        return {component: coerce_nested(catalog[component]) for component in components}
 
     def connect(self):
         """
@@ -54,14 +126,15 @@ class PGSQLRenderer(DBRendererBase):
             f"password={self.options['password']}."
         )
 
+        dsn = (
+            f"host='{self.options['host']}' "
+            f"port='{self.options['port']}' "
+            f"dbname='{self.options['dbname']}' "
+            f"user='{self.options['user']}'"
+            f"password='{self.options['password']}'"
+        )
         try:
-            self.con = psycopg2.connect(
-                f"host='{self.options['host']}' "
-                f"port='{self.options['port']}' "
-                f"dbname='{self.options['dbname']}' "
-                f"user='{self.options['user']}'"
-                f"password='{self.options['password']}'"
-            )
+            self.con = self.get_connection(dsn, lambda: psycopg2.connect(dsn))
         except psycopg2.Error as e:
             msg = f"\nPostgreSQL database connection error: {e}"
             if self.options['strict']:
@@ -71,101 +144,19 @@ class PGSQLRenderer(DBRendererBase):
             else:
                 logger.debug(f"{msg}. Skipping.")
 
-    def collect_datasets(self) -> dict:
-
-        result = {}
-        filters = self.options.get('filters', {})
-        components = self.options['components']
-
-        if 'tables' in components:
-            q_tables = TablesQuery(self.con, filters)
-            logger.debug(f'Tables query:\n\n {q_tables.sql}')
-            tables = q_tables.run()
-
-            q_columns = ColumnsQuery(self.con, filters)
-            logger.debug(f'Columns query:\n\n {q_columns.sql}')
-            columns = q_columns.run()
-
-            q_fks = ForeignKeysQuery(self.con, filters)
-            logger.debug(f'Foreign keys query:\n\n {q_fks.sql}')
-            fks = q_fks.run()
-
-            # fill each table with columns and foreign keys
-            result['tables'] = self.collect_tables(tables, columns, fks)
-
-        if 'views' in components:
-            q_views = ViewsQuery(self.con, filters)
-            logger.debug(f'Views query:\n\n {q_views.sql}')
-            result['views'] = q_views.run()
-
-        if 'functions' in components:
-            q_functions = FunctionsQuery(self.con, filters)
-            logger.debug(f'Functions keys query:\n\n {q_functions.sql}')
-            functions = q_functions.run()
-
-            q_parameters = ParametersQuery(self.con, filters)
-            logger.debug(f'Parameters keys query:\n\n {q_parameters.sql}')
-            parameters = q_parameters.run()
-
-            # fill each function with its parameters
-
-            result['functions'] = self.collect_functions(functions, parameters)
-
-        if 'triggers' in components:
-            q_triggers = TriggersQuery(self.con, filters)
-            logger.debug(f'Triggers query:\n\n {q_triggers.sql}')
-            result['triggers'] = q_triggers.run()
-        return result
-
-    def collect_tables(self,
-                       tables: list,
-                       columns: list,
-                       fks: list) -> list:
+    def is_alive(self, con) -> bool:
         '''
-        Parse table and column query results got from db and:
-
-        - add 'columns' attribute to each table row with list of table columns;
-        - add 'foreign_keys' attribute to each column with list of fks if it is a
-          forign key column.
-
-        returns transformed list of tables.
-        '''
-
-        result = deepcopy(tables)
-        for table in result:
-            # get columns for this table
-            table_columns = list(filter(lambda x: x['table_name'] == table['relname'],
-                                        columns))
-            for col in table_columns:
-                # get foreign keys for this column
-                fks_fltr = list(
-                    filter(
-                        lambda x: x['table_name'] == table['relname'] and
-                        x['column_name'] == col['column_name'], fks
-                    )
-                )
-                col['foreign_keys'] = fks_fltr
-            table['columns'] = table_columns
-        return result
-
-    def collect_functions(self,
-                          functions: list,
-                          parameters: list) -> list:
+        Check that the connection is open. Also roll back the transaction left
+        by the previous tag, so that the connection is not kept idle in transaction
+        or in aborted state.
         '''
-        Parse function and parameter query results got from db and add 'parameters'
-        key to each function filled with its parameters
-        '''
-
-        result = deepcopy(functions)
-        for func in result:
-            # get parameters for this function
-            function_params = list(
-                filter(
-                    lambda x: x['specific_name'] == func['specific_name'], parameters
-                )
-            )
-            func['parameters'] = function_params
-        return result
+        if con.closed:
+            return False
+        try:
+            con.rollback()
+        except Exception:
+            return False
+        return super().is_alive(con)
 
 
 def set_up_logger(logger_):
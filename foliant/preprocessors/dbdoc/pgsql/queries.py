@@ -1,4 +1,11 @@
+import json
+
 from abc import ABCMeta
+from uuid import uuid4
+
+from ..base.filters import OPERATORS
+from ..base.rows import Columns
+from ..base.rows import make_rows
 
 
 SCHEMA = 'schema'
@@ -10,13 +17,34 @@ class QueryBase(metaclass=ABCMeta):
     base_query = ''
 
     _filter_fields = {}
+    # result row keys of the filtering fields, used to filter memoized
+    # unfiltered query results on client side
+    _filter_keys = {}
+    _filter_operators = OPERATORS
+    _filter_ignore_case = False
+    # definition columns which may be fetched lazily: select expressions in
+    # _definitions are put into base_query in place of {definitions},
+    # _definition_keys are their keys in result rows, _row_keys identify rows
+    _definitions = ''
+    _definition_keys = ()
+    _row_keys = ()
+    # statement which selects only _row_keys and _definition_keys to load
+    # deferred definitions, with {filters} and {definitions} like base_query;
+    # the full query is used if it is not set
+    _definitions_query = ''
     # sort_fields = {}
 
     def __init__(self,
                  con,
-                 filters: dict = {}):
+                 filters: dict = {},
+                 fetch_size: int = None,
+                 defer_definitions: bool = False,
+                 definitions_only: bool = False):
         self._con = con
         self._filters = self._resolve_filters(filters)
+        self._fetch_size = fetch_size
+        self._defer_definitions = defer_definitions
+        self._definitions_only = definitions_only
 
     def _resolve_filters(self, filters: dict) -> str:
         resolvers = {'in': self._in,
@@ -79,22 +107,44 @@ class QueryBase(metaclass=ABCMeta):
         return f"!= {value}"
 
     def _get_rows(self, sql) -> list:
-        """Run query from sql param and return a list of dicts key=column name,
-        value = field value"""
-        cur = self._con.cursor()
+        """Run query from sql param and return a list of rows which behave like
+        dicts key=column name, value = field value.
+
+        If fetch_size is set, rows are read from a server-side cursor by batches
+        of fetch_size rows, so that the whole result set is never held by the driver."""
+        if self._fetch_size:
+            cur = self._con.cursor(name=f'dbdoc_{uuid4().hex}')
+            cur.itersize = self._fetch_size
+        else:
+            cur = self._con.cursor()
         cur.execute(sql)
         result = []
-        keys = tuple((d[0] for d in cur.description))
-        for row in cur.fetchall():
-            row_dict = {}
-            for i in range(len(keys)):
-                row_dict[keys[i]] = row[i] or ''
-            result.append(row_dict)
+        keys = None
+        for batch in self._batches(cur):
+            if keys is None:
+                keys = Columns(d[0] for d in cur.description)
+            result.extend(make_rows(keys, batch))
+        cur.close()
         return result
 
+    def _batches(self, cur):
+        """Yield fetched rows by batches of fetch_size or all at once"""
+        if not self._fetch_size:
+            yield cur.fetchall()
+            return
+        while True:
+            batch = cur.fetchmany(self._fetch_size)
+            if not batch:
+                break
+            yield batch
+
     @property
     def sql(self):
-        return self.base_query.format(filters=self._filters)
+        if self._definitions_only:
+            query = self._definitions_query or self.base_query
+            return query.format(filters=self._filters, definitions=self._definitions)
+        definitions = '' if self._defer_definitions else self._definitions
+        return self.base_query.format(filters=self._filters, definitions=definitions)
 
     def run(self):
         return self._get_rows(self.sql)
@@ -116,11 +166,14 @@ class TablesQuery(QueryBase):
 
     _filter_fields = {SCHEMA: 'schemaname',
                       TABLE_NAME: 'st.relname'}
+    _filter_keys = {SCHEMA: 'schemaname',
+                    TABLE_NAME: 'relname'}
 
 
 class ColumnsQuery(QueryBase):
 
     base_query = '''SELECT
+      c.table_schema,
       c.table_name,
       c.ordinal_position,
       c.column_name,
@@ -143,6 +196,8 @@ class ColumnsQuery(QueryBase):
 
     _filter_fields = {SCHEMA: 'c.table_schema',
                       TABLE_NAME: 'c.table_name'}
+    _filter_keys = {SCHEMA: 'table_schema',
+                    TABLE_NAME: 'table_name'}
 
 
 class ForeignKeysQuery(QueryBase):
@@ -166,14 +221,19 @@ class ForeignKeysQuery(QueryBase):
     WHERE constraint_type = 'FOREIGN KEY'
     {filters}'''
 
+    _filter_fields = {SCHEMA: 'tc.table_schema',
+                      TABLE_NAME: 'tc.table_name'}
+    _filter_keys = {SCHEMA: 'table_schema',
+                    TABLE_NAME: 'table_name'}
+
 
 class FunctionsQuery(QueryBase):
 
     base_query = """SELECT
+        r.routine_schema,
         r.routine_name,
         r.specific_name,
-        r.data_type,
-        r.routine_definition,
+        r.data_type,{definitions}
         r.external_language,
         pd.description
     FROM information_schema.routines r
@@ -186,11 +246,23 @@ class FunctionsQuery(QueryBase):
     ORDER BY routine_name"""
 
     _filter_fields = {SCHEMA: 'routine_schema'}
+    _filter_keys = {SCHEMA: 'routine_schema'}
+    _definitions = """
+        r.routine_definition,"""
+    _definition_keys = ('routine_definition',)
+    _row_keys = ('specific_name',)
+    _definitions_query = """SELECT
+        r.specific_name,
+        r.routine_definition
+    FROM information_schema.routines r
+    WHERE 1=1
+    {filters}"""
 
 
 class ParametersQuery(QueryBase):
 
     base_query = """SELECT
+        specific_schema,
         specific_name,
         parameter_name,
         parameter_mode,
@@ -201,6 +273,7 @@ class ParametersQuery(QueryBase):
     {filters}"""
 
     _filter_fields = {SCHEMA: 'specific_schema'}
+    _filter_keys = {SCHEMA: 'specific_schema'}
 
 
 class TriggersQuery(QueryBase):
@@ -211,25 +284,192 @@ class TriggersQuery(QueryBase):
        event_manipulation,
        trigger_schema,
        action_timing,
-       action_orientation,
-       action_statement
+       action_orientation{definitions}
     FROM information_schema.triggers
     WHERE 1=1
     {filters}
     ORDER BY event_object_table, trigger_name"""
 
     _filter_fields = {SCHEMA: 'trigger_schema'}
+    _filter_keys = {SCHEMA: 'trigger_schema'}
+    _definitions = """,
+       action_statement"""
+    _definition_keys = ('action_statement',)
+    _row_keys = ('trigger_schema', 'event_object_table', 'trigger_name', 'event_manipulation')
+    _definitions_query = """SELECT
+       trigger_schema,
+       event_object_table,
+       trigger_name,
+       event_manipulation{definitions}
+    FROM information_schema.triggers
+    WHERE 1=1
+    {filters}"""
 
 
 class ViewsQuery(QueryBase):
 
     base_query = """SELECT
         table_schema,
-        table_name,
-        view_definition
+        table_name{definitions}
     FROM INFORMATION_SCHEMA.views
     WHERE 1=1
     {filters}
     ORDER BY table_name"""
 
     _filter_fields = {SCHEMA: 'table_schema'}
+    _filter_keys = {SCHEMA: 'table_schema'}
+    _definitions = """,
+        view_definition"""
+    _definition_keys = ('view_definition',)
+    _row_keys = ('table_schema', 'table_name')
+
+
+class FingerprintQuery(QueryBase):
+    """Latest transaction ids and row counts of the system catalogs, only for
+    objects in the schemas selected by the schema filter."""
+
+    base_query = """WITH ns AS (
+      SELECT n.oid FROM pg_catalog.pg_namespace n
+      WHERE 1 = 1
+      {filters}
+    ), cls AS (
+      SELECT c.oid, c.xmin FROM pg_catalog.pg_class c
+      WHERE c.relnamespace IN (SELECT oid FROM ns)
+    ), proc AS (
+      SELECT p.oid, p.xmin FROM pg_catalog.pg_proc p
+      WHERE p.pronamespace IN (SELECT oid FROM ns)
+    )
+    SELECT
+      (SELECT max(xmin::text::bigint) FROM cls) AS class_xmin,
+      (SELECT max(xmin::text::bigint) FROM pg_catalog.pg_attribute
+        WHERE attrelid IN (SELECT oid FROM cls)) AS attribute_xmin,
+      (SELECT max(xmin::text::bigint) FROM pg_catalog.pg_constraint
+        WHERE connamespace IN (SELECT oid FROM ns)) AS constraint_xmin,
+      (SELECT max(xmin::text::bigint) FROM pg_catalog.pg_description
+        WHERE objoid IN (SELECT oid FROM cls UNION ALL SELECT oid FROM proc)) AS description_xmin,
+      (SELECT max(xmin::text::bigint) FROM pg_catalog.pg_rewrite
+        WHERE ev_class IN (SELECT oid FROM cls)) AS rewrite_xmin,
+      (SELECT max(xmin::text::bigint) FROM proc) AS proc_xmin,
+      (SELECT max(xmin::text::bigint) FROM pg_catalog.pg_trigger
+        WHERE tgrelid IN (SELECT oid FROM cls)) AS trigger_xmin,
+      (SELECT count(*) FROM cls) AS class_count,
+      (SELECT count(*) FROM pg_catalog.pg_constraint
+        WHERE connamespace IN (SELECT oid FROM ns)) AS constraint_count,
+      (SELECT count(*) FROM pg_catalog.pg_description
+        WHERE objoid IN (SELECT oid FROM cls UNION ALL SELECT oid FROM proc)) AS description_count,
+      (SELECT count(*) FROM proc) AS proc_count,
+      (SELECT count(*) FROM pg_catalog.pg_trigger
+        WHERE tgrelid IN (SELECT oid FROM cls)) AS trigger_count"""
+
+    _filter_fields = {SCHEMA: 'n.nspname'}
+
+
+class NestedCatalogQuery(QueryBase):
+    """All datasets in one json document: tables with columns and foreign
+    keys, functions with parameters and other components as lists, nested on
+    the server side. Datasets are got with the usual queries, which are put
+    into the statement as CTEs.
+
+    queries — {dataset name: query class}, join_fields — as in the renderer."""
+
+    def __init__(self,
+                 con,
+                 queries: dict,
+                 join_fields: dict,
+                 filters: dict = {},
+                 fetch_size: int = None):
+        super().__init__(con, filters, fetch_size)
+        self._queries = {
+            name: query_class(con, filters, fetch_size)
+            for name, query_class in queries.items()
+        }
+        self._join_fields = join_fields
+
+    @staticmethod
+    def _join(left: str, left_fields: tuple, right: str, right_fields: tuple) -> str:
+        return ' AND '.join(
+            f'{right}.{r} = {left}.{l}' for l, r in zip(left_fields, right_fields)
+        )
+
+    @staticmethod
+    def _items(alias: str, extra: str = '') -> str:
+        item = f"(to_jsonb({alias}) - '_n')"
+        if extra:
+            item = f"{item} || jsonb_build_object({extra})"
+        return f"jsonb_agg({item} ORDER BY {alias}._n)"
+
+    def _ctes(self) -> list:
+        # row_number keeps the order of rows from the ORDER BY of each query
+        ctes = [
+            f'dbdoc_{name} AS (\n'
+            f'SELECT q.*, row_number() OVER () AS _n FROM (\n{query.sql}\n) q\n)'
+            for name, query in self._queries.items()
+        ]
+        if 'tables' in self._queries:
+            fk_fields = self._join_fields['foreign_keys']
+            column_fields = self._join_fields['columns']
+            table_group = ', '.join(f'c.{f}' for f in column_fields[:-1])
+            ctes.append(
+                'dbdoc_fks_by_column AS (\n'
+                f'SELECT {", ".join(f"f.{f}" for f in fk_fields)}, '
+                f'{self._items("f")} AS items\n'
+                'FROM dbdoc_foreign_keys f\n'
+                f'GROUP BY {", ".join(f"f.{f}" for f in fk_fields)}\n)'
+            )
+            ctes.append(
+                'dbdoc_columns_by_table AS (\n'
+                f'SELECT {table_group}, '
+                f"""{self._items("c", "'foreign_keys', coalesce(fk.items, '[]'::jsonb)")} AS items\n"""
+                'FROM dbdoc_columns c\n'
+                'LEFT JOIN dbdoc_fks_by_column fk\n'
+                f'  ON {self._join("c", column_fields, "fk", fk_fields)}\n'
+                f'GROUP BY {table_group}\n)'
+            )
+        if 'parameters' in self._queries and 'functions' in self._queries:
+            param_fields = self._join_fields['parameters']
+            ctes.append(
+                'dbdoc_params_by_function AS (\n'
+                f'SELECT {", ".join(f"p.{f}" for f in param_fields)}, '
+                f'{self._items("p")} AS items\n'
+                'FROM dbdoc_parameters p\n'
+                f'GROUP BY {", ".join(f"p.{f}" for f in param_fields)}\n)'
+            )
+        return ctes
+
+    def _datasets(self) -> list:
+        datasets = []
+        for name in self._queries:
+            if name in ('columns', 'foreign_keys', 'parameters'):
+                continue
+            if name == 'tables':
+                join = self._join(
+                    'x', self._join_fields['tables'], 'g', self._join_fields['columns'][:-1]
+                )
+                items = self._items('x', "'columns', coalesce(g.items, '[]'::jsonb)")
+                source = f'dbdoc_tables x\nLEFT JOIN dbdoc_columns_by_table g ON {join}'
+            elif name == 'functions' and 'parameters' in self._queries:
+                join = self._join(
+                    'x', self._join_fields['functions'], 'g', self._join_fields['parameters']
+                )
+                items = self._items('x', "'parameters', coalesce(g.items, '[]'::jsonb)")
+                source = f'dbdoc_functions x\nLEFT JOIN dbdoc_params_by_function g ON {join}'
+            else:
+                items = self._items('x')
+                source = f'dbdoc_{name} x'
+            datasets.append(
+                f"'{name}', (SELECT coalesce({items}, '[]'::jsonb)\nFROM {source})"
+            )
+        return datasets
+
+    @property
+    def sql(self):
+        return (
+            'WITH ' + ',\n'.join(self._ctes()) + '\n'
+            'SELECT json_build_object(\n' + ',\n'.join(self._datasets()) + '\n) AS catalog'
+        )
+
+    def run(self):
+        catalog = self._get_rows(self.sql)[0]['catalog']
+        if isinstance(catalog, str):
+            catalog = json.loads(catalog)
+        return catalog
@@ -16,10 +16,10 @@ setup(
     description=SHORT_DESCRIPTION,
     long_description=LONG_DESCRIPTION,
     long_description_content_type='text/markdown',
-    version='0.1.10',
+    version='0.2.0',
     author='Daniil Minukhin',
     author_email='ddddsa@gmail.com',
-    packages=find_namespace_packages(exclude=['*.test', 'foliant', '*.templates']),
+    packages=find_namespace_packages(exclude=['*.test', 'foliant', '*.templates', 'benchmarks', 'benchmarks.*']),
     package_data={
         'foliant.preprocessors.dbdoc.pgsql': ['templates/*.j2'],
         'foliant.preprocessors.dbdoc.oracle': ['templates/*.j2'],
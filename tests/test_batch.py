@@ -0,0 +1,116 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from foliant.preprocessors.dbdoc.mssql.main import MSSQLRenderer
+
+
+RESULTS = {
+    'sys.tables t\n    JOIN sys.schemas s ON s.schema_id = t.schema_id\n    WHERE': (
+        ('TABLE_SCHEMA', 'TABLE_NAME'),
+        [('dbo', 'orders'), ('dbo', 'users')]
+    ),
+    'sys.columns c': (
+        ('TABLE_SCHEMA', 'TABLE_NAME', 'COLUMN_ID', 'COLUMN_NAME', 'COMMENT'),
+        [('dbo', 'orders', 1, 'id', None),
+         ('dbo', 'orders', 2, 'user_id', 'Buyer'),
+         ('dbo', 'users', 1, 'id', None)]
+    ),
+    'sys.foreign_key_columns': (
+        ('SCHEMA_NAME', 'TABLE_NAME', 'COLUMN_NAME', 'REFERENCED_TABLE_NAME'),
+        [('dbo', 'orders', 'user_id', 'users')]
+    ),
+    'sys.triggers': (
+        ('TABLE_SCHEMA', 'TRIGGER_NAME', 'TABLE_NAME', 'DISABLED'),
+        [('dbo', 'trg', 'orders', 0)]
+    )
+}
+
+
+class BatchConnection:
+    def __init__(self):
+        self.queries = []
+
+    def cursor(self):
+        return BatchCursor(self)
+
+
+class BatchCursor:
+    """pyodbc cursor which returns a result set for each statement of a batch"""
+
+    def __init__(self, con):
+        self.con = con
+        self.arraysize = 1
+
+    def execute(self, sql):
+        self.con.queries.append(sql)
+        statements = sql.split(';\n')
+        self.results = [result for statement in statements
+                        for marker, result in RESULTS.items() if marker in statement]
+        self.description = [(name,) for name in self.results[0][0]]
+
+    def nextset(self):
+        self.results.pop(0)
+        if not self.results:
+            return False
+        self.description = [(name,) for name in self.results[0][0]]
+        return True
+
+    def fetchall(self):
+        return self.results[0][1]
+
+    def fetchmany(self, size):
+        rows, self.results[0] = self.results[0][1][:size], (self.results[0][0], self.results[0][1][size:])
+        return rows
+
+    def close(self):
+        pass
+
+
+class TestBatchCollection(TestCase):
+    """SQL Server batch collection mode tests"""
+
+    def collect(self, **options):
+        renderer = MSSQLRenderer({})
+        renderer.options = {**renderer.base_defaults, **renderer.defaults,
+                            'filters': {'eq': {'schema': 'dbo'}},
+                            'collection_mode': 'batch',
+                            'components': ['tables', 'triggers'],
+                            **options}
+        renderer.con = BatchConnection()
+        return renderer.collect_datasets(), renderer.con.queries
+
+    def test_batch(self):
+        """all queries are sent in one batch and result sets are split into datasets"""
+        data, queries = self.collect()
+
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]
+        self.assertTrue(sql.startswith('SET NOCOUNT ON;'))
+        self.assertIn("AND s.name = 'dbo'", sql)
+        self.assertNotIn('INFORMATION_SCHEMA', sql)
+
+        orders = data['tables'][0]
+        self.assertEqual(orders['TABLE_NAME'], 'orders')
+        self.assertEqual([c['COLUMN_NAME'] for c in orders['columns']], ['id', 'user_id'])
+        self.assertEqual(orders['columns'][0]['COMMENT'], '')
+        self.assertEqual(orders['columns'][1]['foreign_keys'][0]['REFERENCED_TABLE_NAME'],
+                         'users')
+        self.assertEqual(len(data['tables'][1]['columns']), 1)
+        self.assertEqual([t['TRIGGER_NAME'] for t in data['triggers']], ['trg'])
+
+    def test_fetch_size(self):
+        """result sets are read by batches of fetch_size"""
+        data, queries = self.collect(fetch_size=1)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(len(data['tables']), 2)
+        self.assertEqual(len(data['tables'][0]['columns']), 2)
+
+    def test_definitions(self):
+        """trigger definitions are fetched in the batch even if the template doesn't use them"""
+        with TemporaryDirectory() as tmp:
+            doc_template = Path(tmp, 'doc.j2')
+            doc_template.write_text("{% for t in triggers %}{{ t['TRIGGER_NAME'] }}{% endfor %}")
+            _, queries = self.collect(doc_template=str(doc_template))
+        self.assertEqual(len(queries), 1)
+        self.assertIn('sm.definition', queries[0])
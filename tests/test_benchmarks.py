@@ -0,0 +1,105 @@
+from unittest import TestCase
+
+from benchmarks.catalog import SCALES
+from benchmarks.fake_driver import FakeConnection
+from benchmarks.fake_driver import select_columns
+from benchmarks.run import RENDERERS
+from benchmarks.run import benchmark
+from benchmarks.run import compare
+from benchmarks.run import median_time
+from benchmarks.scale import parse_option
+from benchmarks.scale import preprocessor_options
+from benchmarks.scale import summarize
+from benchmarks.schema import SCHEMA_BUILDERS
+
+
+class TestBenchmarks(TestCase):
+    """Benchmark suite tests, so that it keeps working with the queries"""
+
+    def test_select_columns(self):
+        """result columns are got from aliases and dotted names of the outer select"""
+        sql = '''SELECT
+          t.name AS TABLE_NAME,
+          CONCAT(IIF(a = 1, 'A, ', ''), b) AS TYPE,
+          (SELECT max(x) FROM y) source,
+          c.column_name  -- comment, FROM
+        FROM t'''
+        self.assertEqual(select_columns(sql), ['TABLE_NAME', 'TYPE', 'source', 'column_name'])
+
+    def test_fake_driver(self):
+        """fake connection serves rows through DB-API and _mysql API"""
+        con = FakeConnection(as_bytes=True)
+        con.register('SELECT a', ['a'], [('x',), ('y',), ('z',)])
+        cur = con.cursor()
+        cur.execute('SELECT a')
+        self.assertEqual(cur.description, [('a',)])
+        self.assertEqual(cur.fetchmany(2), [(b'x',), (b'y',)])
+        self.assertEqual(cur.fetchall(), [(b'z',)])
+
+        con.query('SELECT a')
+        result = con.store_result()
+        self.assertEqual(result.describe(), (('a',),))
+        self.assertEqual(result.fetch_row(0), ((b'x',), (b'y',), (b'z',)))
+        with self.assertRaises(RuntimeError):
+            con.cursor().execute('SELECT b')
+
+    def test_benchmark(self):
+        """all stages are measured for each backend"""
+        for backend in RENDERERS:
+            timings = benchmark(backend, SCALES['small'], repeat=1)
+            stages = {'_get_rows', 'collect_tables', 'to_md', 'to_diag'}
+            if backend == 'pgsql':
+                stages.add('collect_functions')
+            self.assertEqual(set(timings), stages)
+
+    def test_median_time(self):
+        """fast functions are called in a loop in each run"""
+        calls = []
+        seconds, result = median_time(lambda: calls.append(1) or len(calls), repeat=3)
+        self.assertGreater(len(calls), 3)
+        self.assertEqual(result, len(calls))
+        self.assertLess(seconds, 0.01)
+
+    def test_compare(self):
+        """stages slower than the baseline by more than the tolerance are regressions"""
+        results = {'pgsql/small': {'to_md': 0.5, 'to_diag': 0.25}}
+        baseline = {'pgsql/small': {'to_md': 0.25, 'to_diag': 0.25}}
+        self.assertEqual(compare(results, baseline, 0.5), [('pgsql/small', 'to_md', 2.0)])
+
+
+class TestScaleBenchmark(TestCase):
+    """Scale benchmark harness tests which don't need a database"""
+
+    tier = {'tables': 6, 'columns': 4, 'fk_depth': 3, 'wide_tables': 2, 'wide_columns': 50,
+            'views': 2, 'functions': 3, 'triggers': 2}
+
+    def test_schema(self):
+        """schema has all objects of the tier with fk chains of fk_depth"""
+        for dbms, build in SCHEMA_BUILDERS.items():
+            statements = build(self.tier)
+            tables = [s for s in statements if s.startswith('CREATE TABLE')]
+            self.assertEqual(len(tables), 8, dbms)
+            references = [s for s in tables if 'REFERENCES' in s]
+            self.assertEqual(len(references), 4, dbms)
+            self.assertNotIn('REFERENCES', tables[3])
+            self.assertEqual(tables[-1].lower().count(' int'), 50)
+            self.assertEqual(len([s for s in statements if 'CREATE VIEW' in s]), 2)
+            self.assertEqual(len([s for s in statements if 'CREATE FUNCTION' in s]),
+                             3 + (dbms == 'pgsql'))
+            self.assertEqual(len([s for s in statements if 'CREATE TRIGGER' in s]), 2)
+
+    def test_options(self):
+        """preprocessor documents the scale schema with extra options"""
+        connection = {'host': 'db', 'port': 5432, 'user': 'u', 'password': 'p', 'dbname': 'testdb'}
+        options = preprocessor_options('pgsql', connection, dict([parse_option('max_workers=4')]))
+        self.assertEqual(options['filters'], {'eq': {'schema': 'dbdoc_scale'}})
+        self.assertEqual(options['max_workers'], 4)
+        options = preprocessor_options('mysql', connection, {})
+        self.assertEqual(options['dbname'], 'dbdoc_scale')
+        self.assertEqual(options['filters'], {'eq': {'schema': 'dbdoc_scale'}})
+
+    def test_summarize(self):
+        """stage totals are taken from the timing report"""
+        report = {'total': {'connect': {'seconds': 0.5}, 'query': {'seconds': 2.0}}}
+        self.assertEqual(summarize(report, 3.0, 120.0),
+                         {'connect': 0.5, 'query': 2.0, 'total': 3.0, 'peak_rss_mb': 120.0})
@@ -0,0 +1,86 @@
+from decimal import Decimal
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from benchmarks.catalog import SCALES
+from benchmarks.catalog import generate_catalog
+from benchmarks.catalog import make_connection
+from foliant.preprocessors.dbdoc.base.storage import read_datasets
+from foliant.preprocessors.dbdoc.base.storage import write_datasets
+from foliant.preprocessors.dbdoc.pgsql.main import PGSQLRenderer
+
+
+DATASETS = {'tables': [{'relname': 'users', 'columns': [{'numeric_precision': Decimal('32')}]}]}
+
+
+class CachedRenderer(PGSQLRenderer):
+    fingerprint = '1'
+    collected = 0
+
+    def connect(self):
+        self.con = None
+
+    def get_fingerprint(self):
+        return self.fingerprint
+
+    def collect_datasets(self):
+        self.collected += 1
+        return DATASETS
+
+
+class FakeDriverRenderer(PGSQLRenderer):
+    """Renderer which queries the synthetic catalog of the benchmarks"""
+
+    def connect(self):
+        self.con = make_connection(self, generate_catalog(self, SCALES['small']))
+        self.executed = self.con.executed
+
+    def get_fingerprint(self):
+        return '1'
+
+
+class TestCatalogCache(TestCase):
+    """On-disk catalog cache tests"""
+
+    def test_storage(self):
+        """datasets survive the round-trip, unsupported values become strings"""
+        with TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'data.json.gz'
+            write_datasets(path, DATASETS, fingerprint='x')
+            meta, datasets = read_datasets(path)
+        self.assertEqual(meta, {'fingerprint': 'x'})
+        self.assertEqual(datasets['tables'][0]['columns'][0]['numeric_precision'], '32')
+
+    def test_fingerprint_invalidation(self):
+        """catalog is collected again only when the fingerprint changes"""
+        with TemporaryDirectory() as tmp:
+            renderer = CachedRenderer({'cache_dir': tmp, 'doc': False, 'scheme': False})
+            renderer.process({})
+            renderer.process({})
+            self.assertEqual(renderer.collected, 1)
+
+            renderer.process({'filters': {'eq': {'schema': 'public'}}})
+            self.assertEqual(renderer.collected, 2)
+
+            renderer.fingerprint = '2'
+            renderer.process({})
+            self.assertEqual(renderer.collected, 3)
+
+    def test_definitions_not_deferred(self):
+        """definitions are fetched with the rows when datasets are persisted"""
+        with TemporaryDirectory() as tmp:
+            doc_template = Path(tmp, 'doc.j2')
+            doc_template.write_text("{% for f in functions %}{{ f['routine_name'] }}{% endfor %}")
+            options = {'doc_template': str(doc_template), 'scheme': False,
+                       'components': ['functions']}
+            renderer = FakeDriverRenderer(options)
+            renderer.process({})
+            self.assertEqual(len(renderer.executed), 2)
+
+            for persist in ({'cache_dir': str(Path(tmp, 'cache'))},
+                            {'snapshot': str(Path(tmp, 'catalog.snapshot'))}):
+                renderer = FakeDriverRenderer({**options, **persist})
+                renderer.process({})
+                self.assertEqual(len(renderer.executed), 2)
+                self.assertIn('routine_definition', renderer.executed[0])
@@ -0,0 +1,84 @@
+import threading
+import time
+
+from unittest import TestCase
+
+from benchmarks.fake_driver import FakeConnection
+from foliant.preprocessors.dbdoc.base.context import RunContext
+from foliant.preprocessors.dbdoc.pgsql.main import PGSQLRenderer
+from foliant.preprocessors.dbdoc.pgsql.queries import QueryBase
+
+
+def make_query(name, rows):
+    class Query(QueryBase):
+        base_query = f'SELECT {name}'
+
+        def __init__(self, con, filters={}, **kwargs):
+            super().__init__(con, filters, **kwargs)
+            self.con = con
+
+        def run(self):
+            Query.connections.add(id(self.con))
+            Query.threads.add(threading.get_ident())
+            time.sleep(0.1)
+            return rows
+
+    Query.__name__ = name
+    Query.connections = set()
+    Query.threads = set()
+    return Query
+
+
+class FakeRenderer(PGSQLRenderer):
+    def is_alive(self, con):
+        return True
+
+
+class TestConcurrentQueries(TestCase):
+    """Concurrent catalog queries tests"""
+
+    def renderer(self, max_workers, run_context=None):
+        renderer = FakeRenderer({}, run_context=run_context)
+        renderer.options = {**renderer.base_defaults, **renderer.defaults,
+                            'max_workers': max_workers}
+        renderer.con = renderer.get_connection('testdb', FakeConnection)
+        return renderer
+
+    def queries(self):
+        return {f'q{i}': make_query(f'Q{i}', [{'n': i}]) for i in range(4)}
+
+    def test_concurrent(self):
+        """queries run in parallel on different connections"""
+        queries = self.queries()
+        start = time.monotonic()
+        result = self.renderer(max_workers=4).run_queries(queries)
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(result, {f'q{i}': [{'n': i}] for i in range(4)})
+        self.assertLess(elapsed, 0.3)
+        used = set().union(*(q.connections for q in queries.values()))
+        self.assertEqual(len(used), 4)
+
+    def test_sequential(self):
+        """by default queries run one after another on the main connection"""
+        queries = self.queries()
+        result = self.renderer(max_workers=1).run_queries(queries)
+        self.assertEqual(list(result), ['q0', 'q1', 'q2', 'q3'])
+        used = set().union(*(q.connections for q in queries.values()))
+        self.assertEqual(len(used), 1)
+
+    def test_worker_connections_reused(self):
+        """worker connections are returned to the registry and reused by next tags"""
+        run_context = RunContext()
+        first_queries = self.queries()
+        renderer = self.renderer(3, run_context)
+        renderer.run_queries(first_queries)
+        renderer.release_connection(renderer.con)
+        first = set().union(*(q.connections for q in first_queries.values()))
+
+        second_queries = self.queries()
+        self.renderer(3, run_context).run_queries(second_queries)
+        second = set().union(*(q.connections for q in second_queries.values()))
+
+        self.assertEqual(len(first), 3)
+        self.assertEqual(first, second)
@@ -0,0 +1,73 @@
+from unittest import TestCase
+
+from benchmarks.fake_driver import FakeConnection
+from foliant.preprocessors.dbdoc.base.connections import ConnectionRegistry
+from foliant.preprocessors.dbdoc.base.context import RunContext
+from foliant.preprocessors.dbdoc.pgsql.main import PGSQLRenderer
+
+
+class TestConnectionRegistry(TestCase):
+    """Connection registry tests"""
+
+    def setUp(self):
+        self.registry = ConnectionRegistry()
+        self.created = []
+        self.lost = set()
+
+    def factory(self):
+        con = FakeConnection()
+        self.created.append(con)
+        return con
+
+    def is_alive(self, con):
+        return con not in self.lost
+
+    def test_reuse(self):
+        """released connection is reused for the same database"""
+        first = self.registry.acquire('db1', self.factory, self.is_alive)
+        self.registry.release('db1', first)
+        second = self.registry.acquire('db1', self.factory, self.is_alive)
+        other = self.registry.acquire('db2', self.factory, self.is_alive)
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+        self.assertEqual(len(self.created), 2)
+
+    def test_exclusive(self):
+        """connection which is in use is not handed out again"""
+        first = self.registry.acquire('db1', self.factory, self.is_alive)
+        second = self.registry.acquire('db1', self.factory, self.is_alive)
+        self.assertIsNot(first, second)
+
+    def test_reconnect(self):
+        """dead connection is closed and replaced"""
+        first = self.registry.acquire('db1', self.factory, self.is_alive)
+        self.registry.release('db1', first)
+        self.lost.add(first)
+        second = self.registry.acquire('db1', self.factory, self.is_alive)
+        self.assertIsNot(first, second)
+        self.assertTrue(first.closed)
+
+    def test_close_all(self):
+        """all connections are closed at the end of the run"""
+        for key in ('db1', 'db2'):
+            self.registry.release(key, self.registry.acquire(key, self.factory, self.is_alive))
+        self.registry.close_all()
+        self.assertEqual(len(self.created), 2)
+        self.assertTrue(all(con.closed for con in self.created))
+
+    def test_key_without_password(self):
+        """connection key identifies the database without the password in it"""
+        run_context = RunContext()
+        keys = []
+        for password in ('secret', 'secret', 'other'):
+            renderer = PGSQLRenderer({}, run_context)
+            renderer.options = {**renderer.base_defaults, **renderer.defaults}
+            renderer.is_alive = self.is_alive
+            con = renderer.get_connection(f'host=db user=u password={password}', self.factory)
+            renderer.release_connection(con)
+            keys.append(renderer.connection_key)
+        self.assertNotIn('secret', keys[0])
+        self.assertEqual(keys[0], keys[1])
+        self.assertNotEqual(keys[0], keys[2])
+        self.assertEqual(len(self.created), 2)
+        run_context.close()
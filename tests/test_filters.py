@@ -0,0 +1,75 @@
+from unittest import TestCase
+
+from foliant.preprocessors.dbdoc.base.context import RunContext
+from foliant.preprocessors.dbdoc.base.filters import RowFilter
+from foliant.preprocessors.dbdoc.pgsql.main import PGSQLRenderer
+from foliant.preprocessors.dbdoc.pgsql.queries import TablesQuery
+
+
+ROWS = [{'schemaname': s, 'relname': t}
+        for s in ('public', 'corp') for t in ('users', 'main_orders', 'main_items')]
+
+
+class CountingTablesQuery(TablesQuery):
+    runs = 0
+
+    def run(self):
+        CountingTablesQuery.runs += 1
+        assert self._filters == '', 'memoized query must be unfiltered'
+        return ROWS
+
+
+class TestRowFilter(TestCase):
+    """Client-side filters tests"""
+
+    def names(self, filters, **kwargs):
+        row_filter = RowFilter(filters, TablesQuery._filter_keys, **kwargs)
+        return [(r['schemaname'], r['relname']) for r in row_filter.apply(ROWS)]
+
+    def test_operators(self):
+        """filters give the same rows as SQL predicates"""
+        self.assertEqual(self.names({'eq': {'table_name': 'users'}}),
+                         [('public', 'users'), ('corp', 'users')])
+        self.assertEqual(self.names({'not_eq': {'schema': 'public'}}),
+                         [('corp', 'users'), ('corp', 'main_orders'), ('corp', 'main_items')])
+        self.assertEqual(self.names({'in': {'table_name': ['users', 'main_items']},
+                                     'not_in': {'schema': ['corp']}}),
+                         [('public', 'users'), ('public', 'main_items')])
+        self.assertEqual(self.names({'regex': {'table_name': 'main_.+'},
+                                     'not_regex': {'table_name': 'ord'},
+                                     'eq': {'schema': 'corp'}}),
+                         [('corp', 'main_items')])
+
+    def test_unsupported(self):
+        """unknown operators and fields are ignored, as in SQL"""
+        self.assertEqual(len(self.names({'like': {'schema': 'x'}, 'eq': {'owner': 'x'}})), 6)
+        self.assertEqual(len(self.names({'regex': {'schema': 'x'}}, operators=('eq',))), 6)
+
+    def test_ignore_case(self):
+        """case-insensitive collations"""
+        self.assertEqual(self.names({'eq': {'table_name': 'USERS', 'schema': 'Corp'}},
+                                    ignore_case=True),
+                         [('corp', 'users')])
+
+
+class TestCatalogMemo(TestCase):
+    """Catalog memoization tests"""
+
+    def renderer(self, filters):
+        renderer = PGSQLRenderer({}, run_context=self.run_context)
+        renderer.options = {**renderer.base_defaults, **renderer.defaults,
+                            'filters': filters, 'memoize_catalog': True}
+        renderer.con = None
+        renderer.connection_key = 'pgsql:testdb'
+        return renderer
+
+    def test_memoized_once(self):
+        """several tags against one database run the query once"""
+        self.run_context = RunContext()
+        CountingTablesQuery.runs = 0
+        first = self.renderer({'eq': {'schema': 'public'}}).run_query(CountingTablesQuery, 'Tables')
+        second = self.renderer({'regex': {'table_name': '^main'}}).run_query(CountingTablesQuery, 'Tables')
+        self.assertEqual(CountingTablesQuery.runs, 1)
+        self.assertEqual(len(first), 3)
+        self.assertEqual([r['relname'] for r in second],
+                         ['main_orders', 'main_items', 'main_orders', 'main_items'])
@@ -0,0 +1,157 @@
+import sqlite3
+
+from unittest import TestCase
+
+from foliant.preprocessors.dbdoc.mssql.queries import ForeignKeysQuery as MSSQLForeignKeysQuery
+from foliant.preprocessors.dbdoc.mysql.queries import ForeignKeysQuery as MySQLForeignKeysQuery
+from foliant.preprocessors.dbdoc.oracle.queries import ForeignKeysQuery as OracleForeignKeysQuery
+from foliant.preprocessors.dbdoc.pgsql.catalog_queries import ForeignKeysQuery as PGCatalogForeignKeysQuery
+from foliant.preprocessors.dbdoc.pgsql.queries import ForeignKeysQuery as PGSQLForeignKeysQuery
+
+
+# (schema, table, column, foreign table, foreign column)
+FKS = [
+    ('public', 'orders', 'user_id', 'users', 'id'),
+    ('public', 'orders', 'product_id', 'products', 'id'),
+    ('public', 'payments', 'order_id', 'orders', 'id'),
+    ('public', 'reviews', 'user_id', 'users', 'id'),
+    ('archive', 'orders', 'user_id', 'users', 'id'),
+]
+
+
+class CountingConnection:
+    """sqlite3 connection which counts rows transferred to the client"""
+
+    def __init__(self, con):
+        self.con = con
+        self.fetched = 0
+
+    def cursor(self):
+        return CountingCursor(self, self.con.cursor())
+
+
+class CountingCursor:
+    def __init__(self, con, cur):
+        self._con = con
+        self._cur = cur
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    def fetchall(self):
+        rows = self._cur.fetchall()
+        self._con.fetched += len(rows)
+        return rows
+
+
+def pgsql_catalog():
+    """information_schema tables used by pgsql ForeignKeysQuery"""
+    con = sqlite3.connect(':memory:')
+    con.execute("ATTACH ':memory:' AS information_schema")
+    con.execute('CREATE TABLE information_schema.table_constraints '
+                '(constraint_name, table_schema, table_name, constraint_type)')
+    con.execute('CREATE TABLE information_schema.key_column_usage '
+                '(constraint_name, table_schema, column_name)')
+    con.execute('CREATE TABLE information_schema.constraint_column_usage '
+                '(constraint_name, table_schema, table_name, column_name)')
+    for i, (schema, table, column, f_table, f_column) in enumerate(FKS):
+        name = f'fk_{i}'
+        con.execute('INSERT INTO information_schema.table_constraints VALUES (?, ?, ?, ?)',
+                    (name, schema, table, 'FOREIGN KEY'))
+        con.execute('INSERT INTO information_schema.key_column_usage VALUES (?, ?, ?)',
+                    (name, schema, column))
+        con.execute('INSERT INTO information_schema.constraint_column_usage VALUES (?, ?, ?, ?)',
+                    (name, schema, f_table, f_column))
+    return CountingConnection(con)
+
+
+def oracle_catalog():
+    """ALL_* views used by oracle ForeignKeysQuery"""
+    con = sqlite3.connect(':memory:')
+    con.execute('CREATE TABLE all_cons_columns (OWNER, CONSTRAINT_NAME, TABLE_NAME, COLUMN_NAME)')
+    con.execute('CREATE TABLE all_constraints '
+                '(OWNER, CONSTRAINT_NAME, CONSTRAINT_TYPE, TABLE_NAME, R_OWNER, R_CONSTRAINT_NAME)')
+    for i, (schema, table, column, f_table, _) in enumerate(FKS):
+        con.execute('INSERT INTO all_cons_columns VALUES (?, ?, ?, ?)',
+                    (schema, f'FK_{i}', table, column))
+        con.execute('INSERT INTO all_constraints VALUES (?, ?, ?, ?, ?, ?)',
+                    (schema, f'FK_{i}', 'R', table, schema, f'PK_{i}'))
+        con.execute('INSERT INTO all_constraints VALUES (?, ?, ?, ?, ?, ?)',
+                    (schema, f'PK_{i}', 'P', f_table, None, None))
+    return CountingConnection(con)
+
+
+def mssql_catalog():
+    """sys views used by mssql ForeignKeysQuery"""
+    con = sqlite3.connect(':memory:')
+    con.execute("ATTACH ':memory:' AS sys")
+    con.execute('CREATE TABLE sys.foreign_key_columns '
+                '(parent_object_id, parent_column_id, referenced_object_id, referenced_column_id)')
+    con.execute('CREATE TABLE sys.objects (object_id, name, schema_id)')
+    con.execute('CREATE TABLE sys.schemas (schema_id, name)')
+    con.execute('CREATE TABLE sys.columns (object_id, column_id, name)')
+    schemas = {'public': 1, 'archive': 2}
+    for name, schema_id in schemas.items():
+        con.execute('INSERT INTO sys.schemas VALUES (?, ?)', (schema_id, name))
+    objects = {}
+
+    def object_id(schema, table):
+        if (schema, table) not in objects:
+            objects[(schema, table)] = len(objects) + 1
+            con.execute('INSERT INTO sys.objects VALUES (?, ?, ?)',
+                        (objects[(schema, table)], table, schemas[schema]))
+        return objects[(schema, table)]
+
+    for i, (schema, table, column, f_table, f_column) in enumerate(FKS):
+        parent, referenced = object_id(schema, table), object_id(schema, f_table)
+        con.execute('INSERT INTO sys.columns VALUES (?, ?, ?)', (parent, 100 + i, column))
+        con.execute('INSERT INTO sys.columns VALUES (?, ?, ?)', (referenced, 200 + i, f_column))
+        con.execute('INSERT INTO sys.foreign_key_columns VALUES (?, ?, ?, ?)',
+                    (parent, 100 + i, referenced, 200 + i))
+    return CountingConnection(con)
+
+
+class TestForeignKeyFilters(TestCase):
+    """Foreign keys queries filter pushdown tests"""
+
+    def check(self, query_class, catalog, table_key):
+        con = catalog()
+        rows = query_class(con).run()
+        self.assertEqual(con.fetched, len(FKS))
+
+        con = catalog()
+        filters = {'eq': {'table_name': 'orders', 'schema': 'public'}}
+        rows = query_class(con, filters).run()
+        self.assertEqual(con.fetched, 2)
+        self.assertEqual({row[table_key] for row in rows}, {'orders'})
+
+        con = catalog()
+        rows = query_class(con, {'in': {'table_name': ['payments', 'reviews']}}).run()
+        self.assertEqual(con.fetched, 2)
+
+    def test_pgsql(self):
+        """pgsql foreign keys are filtered in the database"""
+        self.check(PGSQLForeignKeysQuery, pgsql_catalog, 'table_name')
+
+    def test_oracle(self):
+        """oracle foreign keys are filtered in the database"""
+        self.check(OracleForeignKeysQuery, oracle_catalog, 'TABLE_NAME')
+
+    def test_mssql(self):
+        """mssql foreign keys are filtered in the database"""
+        self.check(MSSQLForeignKeysQuery, mssql_catalog, 'TABLE_NAME')
+
+    def test_predicates(self):
+        """all foreign keys queries get schema and table predicates"""
+        filters = {'eq': {'table_name': 'orders', 'schema': 'public'}}
+        expected = {
+            PGSQLForeignKeysQuery: ("tc.table_name = 'orders'", "tc.table_schema = 'public'"),
+            PGCatalogForeignKeysQuery: ("c.relname = 'orders'", "n.nspname = 'public'"),
+            MySQLForeignKeysQuery: ("TABLE_NAME = 'orders'", "TABLE_SCHEMA = 'public'"),
+            OracleForeignKeysQuery: ("a.TABLE_NAME = 'orders'", "c.OWNER = 'public'"),
+            MSSQLForeignKeysQuery: ("p.name = 'orders'", "s.name = 'public'"),
+        }
+        for query_class, predicates in expected.items():
+            sql = query_class(None, filters).sql
+            for predicate in predicates:
+                self.assertIn(predicate, sql, query_class.__module__)
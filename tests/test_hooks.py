@@ -0,0 +1,88 @@
+from unittest import TestCase
+
+from foliant.preprocessors.dbdoc.base.context import RunContext
+from foliant.preprocessors.dbdoc.base.hooks import HookRegistry
+from foliant.preprocessors.dbdoc.base.hooks import load_hook
+
+from .test_metrics import FakeRenderer
+
+
+class RecordingHook:
+    """Hook which records all events"""
+
+    def __init__(self):
+        self.events = []
+
+    def before(self, event):
+        self.events.append(('before', event.stage, event.name, event.seconds))
+
+    def after(self, event):
+        self.events.append(('after', event.stage, event.name, event.rows))
+
+
+class QueryBudget:
+    """Hook which fails queries longer than the budget"""
+
+    budget = 0.0
+
+    def after(self, event):
+        if event.stage == 'query' and event.seconds > self.budget:
+            raise RuntimeError(f'{event.name} took {event.seconds:.3f}s')
+
+
+OPTIONS = {'dbname': 'testdb', 'components': ['tables'], 'collection_mode': 'batch'}
+
+
+class TestHooks(TestCase):
+    """Lifecycle hooks tests"""
+
+    def test_load_hook(self):
+        """hooks are loaded by dotted path, classes are instantiated"""
+        hook = load_hook('tests.test_hooks.RecordingHook')
+        self.assertIsInstance(hook, RecordingHook)
+        registry = HookRegistry.from_paths('tests.test_hooks.QueryBudget')
+        self.assertIsInstance(registry.hooks[0], QueryBudget)
+        with self.assertRaises(RuntimeError):
+            load_hook('tests.test_hooks.OPTIONS')
+
+    def test_events(self):
+        """hooks are called before and after each stage"""
+        hook = RecordingHook()
+        run_context = RunContext()
+        run_context.hooks = HookRegistry([hook])
+        FakeRenderer(OPTIONS, run_context, tag='index.md:1').process({})
+
+        self.assertEqual(
+            [event[:3] for event in hook.events],
+            [('before', 'connect', None), ('after', 'connect', None),
+             ('before', 'query', 'Batch query'), ('after', 'query', 'Batch query'),
+             ('before', 'collect_tables', None), ('after', 'collect_tables', None),
+             ('before', 'render_md', None), ('after', 'render_md', None),
+             ('before', 'render_diag', None), ('after', 'render_diag', None)]
+        )
+        self.assertIsNone(hook.events[2][3])
+        self.assertEqual(hook.events[3][3], 6)
+
+    def test_query_event(self):
+        """query events have sql, time and error"""
+        events = []
+
+        class Hook:
+            def after(self, event):
+                events.append(event)
+
+        run_context = RunContext()
+        run_context.hooks = HookRegistry([Hook()])
+        FakeRenderer(OPTIONS, run_context).process({})
+        query = next(e for e in events if e.stage == 'query')
+        self.assertTrue(query.sql.startswith('SET NOCOUNT ON;'))
+        self.assertGreaterEqual(query.seconds, 0)
+        self.assertIsNone(query.error)
+        self.assertEqual(query.database, 'mssql://SA@localhost:1433/testdb')
+
+    def test_budget(self):
+        """exception in a hook fails the tag"""
+        run_context = RunContext()
+        run_context.hooks = HookRegistry([QueryBudget()])
+        with self.assertRaisesRegex(RuntimeError, 'Batch query took'):
+            FakeRenderer(OPTIONS, run_context).process({})
@@ -0,0 +1,76 @@
+from copy import deepcopy
+from unittest import TestCase
+
+from foliant.preprocessors.dbdoc.base.main import group_rows
+from foliant.preprocessors.dbdoc.mysql.main import MySQLRenderer
+from foliant.preprocessors.dbdoc.pgsql.main import PGSQLRenderer
+
+
+def legacy_collect_tables(tables, columns, fks, table_field, column_table_field,
+                          column_field):
+    """Reference implementation: the filter scans used before the join engine"""
+    result = deepcopy(tables)
+    columns = deepcopy(columns)
+    for table in result:
+        table_columns = list(filter(lambda x: x[column_table_field] == table[table_field],
+                                    columns))
+        for col in table_columns:
+            col['foreign_keys'] = list(
+                filter(
+                    lambda x: x[column_table_field] == table[table_field]
+                    and x[column_field] == col[column_field], fks
+                )
+            )
+        table['columns'] = table_columns
+    return result
+
+
+class TestJoin(TestCase):
+    """Catalog join engine tests"""
+
+    def test_group_rows(self):
+        """rows are grouped by key tuples preserving order"""
+        rows = [{'t': 'a', 'c': 1}, {'t': 'b', 'c': 2}, {'t': 'a', 'c': 3}]
+        groups = group_rows(rows, ('t',))
+        self.assertEqual(list(groups), [('a',), ('b',)])
+        self.assertEqual([r['c'] for r in groups[('a',)]], [1, 3])
+
+    def test_collect_tables_pgsql(self):
+        """pgsql tables are joined exactly as with filter scans"""
+        tables = [{'schemaname': s, 'relname': t, 'description': ''}
+                  for s in ('public', 'corp') for t in ('users', 'orders', 'empty')]
+        columns = [{'table_name': t, 'column_name': c}
+                   for t in ('orders', 'users', 'missing') for c in ('id', 'user_id', 'name')]
+        fks = [{'table_name': 'orders', 'column_name': 'user_id',
+                'foreign_table_name': 'users', 'foreign_column_name': 'id'},
+               {'table_name': 'orders', 'column_name': 'user_id',
+                'foreign_table_name': 'accounts', 'foreign_column_name': 'id'}]
+
+        renderer = PGSQLRenderer({})
+        result = renderer.collect_tables(tables, deepcopy(columns), fks)
+        expected = legacy_collect_tables(tables, columns, fks,
+                                         'relname', 'table_name', 'column_name')
+        self.assertEqual(result, expected)
+
+    def test_collect_tables_upper_case(self):
+        """backends with upper-case field names use default join fields"""
+        tables = [{'TABLE_NAME': t} for t in ('B', 'A')]
+        columns = [{'TABLE_NAME': t, 'COLUMN_NAME': c} for t in ('A', 'B') for c in ('X', 'Y')]
+        fks = [{'TABLE_NAME': 'B', 'COLUMN_NAME': 'Y', 'REFERENCED_TABLE_NAME': 'A'}]
+
+        renderer = MySQLRenderer({})
+        result = renderer.collect_tables(tables, deepcopy(columns), fks)
+        expected = legacy_collect_tables(tables, columns, fks,
+                                         'TABLE_NAME', 'TABLE_NAME', 'COLUMN_NAME')
+        self.assertEqual(result, expected)
+
+    def test_collect_functions(self):
+        """each function gets its own parameters"""
+        functions = [{'specific_name': 'f_1'}, {'specific_name': 'g_2'}]
+        parameters = [{'specific_name': 'g_2', 'parameter_name': 'a'},
+                      {'specific_name': 'f_1', 'parameter_name': 'b'},
+                      {'specific_name': 'g_2', 'parameter_name': 'c'}]
+
+        result = PGSQLRenderer({}).collect_functions(functions, parameters)
+        self.assertEqual([p['parameter_name'] for p in result[0]['parameters']], ['b'])
+        self.assertEqual([p['parameter_name'] for p in result[1]['parameters']], ['a', 'c'])
@@ -0,0 +1,85 @@
+import json
+import os
+
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from foliant.preprocessors.dbdoc.base.context import RunContext
+from foliant.preprocessors.dbdoc.base.metrics import BuildMetrics
+from foliant.preprocessors.dbdoc.base.metrics import measure_result
+from foliant.preprocessors.dbdoc.base.rows import make_rows
+from foliant.preprocessors.dbdoc.mssql.main import MSSQLRenderer
+
+from .test_batch import BatchConnection
+
+
+class FakeRenderer(MSSQLRenderer):
+    def connect(self):
+        self.con = self.get_connection('testdb', BatchConnection)
+
+    def is_alive(self, con):
+        return True
+
+
+class TestBuildMetrics(TestCase):
+    """Timing instrumentation tests"""
+
+    def test_measure_result(self):
+        """row count and size are measured for rows, datasets and nested documents"""
+        rows = make_rows(('a', 'b'), [('xy', 1), (None, b'abc')])
+        self.assertEqual(measure_result(rows), (2, 5))
+        self.assertEqual(measure_result({'t': rows, 'v': []}), (2, 5))
+        nested = [{'name': 'ab', 'columns': [{'name': 'cde'}]}]
+        self.assertEqual(measure_result(nested), (1, 5))
+
+    def test_report(self):
+        """records are aggregated per run, database and tag"""
+        metrics = BuildMetrics()
+        metrics.record('a.md:1', 'db1', 'connect', 0.5)
+        metrics.record('a.md:1', 'db1', 'query', 1.0, name='Tables query', rows=2, bytes_=10)
+        metrics.record('b.md:3', 'db1', 'query', 2.0, name='Tables query', rows=3, bytes_=20)
+        metrics.record('b.md:5', 'db2', 'query', 4.0, name='Views query', rows=1, bytes_=5)
+        report = metrics.report()
+
+        self.assertEqual(report['total']['query'],
+                         {'count': 3, 'seconds': 7.0, 'rows': 6, 'bytes': 35})
+        self.assertEqual(report['databases']['db1']['query']['seconds'], 3.0)
+        self.assertEqual(report['databases']['db2']['query']['count'], 1)
+        self.assertEqual([t['tag'] for t in report['tags']], ['a.md:1', 'b.md:3', 'b.md:5'])
+        self.assertEqual(report['tags'][0]['stages']['connect']['seconds'], 0.5)
+        self.assertEqual(report['tags'][0]['queries'],
+                         [{'name': 'Tables query', 'seconds': 1.0, 'rows': 2, 'bytes': 10}])
+
+    def test_renderer_stages(self):
+        """renderer measures connect, queries, joins and rendering of a tag"""
+        run_context = RunContext()
+        run_context.metrics = BuildMetrics()
+        renderer = FakeRenderer({'dbname': 'testdb', 'components': ['tables'], 'collection_mode': 'batch'},
+                                run_context, tag='index.md:3')
+        renderer.process({})
+        report = run_context.metrics.report()
+
+        tag = report['tags'][0]
+        self.assertEqual(tag['tag'], 'index.md:3')
+        self.assertEqual(tag['database'], 'mssql://SA@localhost:1433/testdb')
+        self.assertEqual(
+            set(tag['stages']),
+            {'connect', 'query', 'collect_tables', 'render_md', 'render_diag'}
+        )
+        self.assertEqual([q['name'] for q in tag['queries']], ['Batch query'])
+        self.assertEqual(tag['queries'][0]['rows'], 6)
+        self.assertEqual(tag['stages']['collect_tables']['rows'], 2)
+        self.assertGreater(tag['stages']['render_md']['bytes'], 0)
+
+        with TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'reports', 'dbdoc.json')
+            run_context.metrics.write_report(path)
+            with open(path, encoding='utf8') as f:
+                self.assertEqual(json.load(f), report)
+
+    def test_disabled(self):
+        """nothing is measured without metrics in the run context"""
+        run_context = RunContext()
+        renderer = FakeRenderer({'dbname': 'testdb', 'components': ['tables'], 'collection_mode': 'batch'}, run_context)
+        renderer.process({})
+        self.assertIsNone(run_context.metrics)
@@ -0,0 +1,149 @@
+import json
+
+from copy import deepcopy
+from unittest import TestCase
+
+from benchmarks.fake_driver import FakeConnection
+from foliant.preprocessors.dbdoc.pgsql.main import PGSQLRenderer
+
+
+TABLES = [{'schemaname': 'public', 'relname': 'users', 'description': None},
+          {'schemaname': 'public', 'relname': 'orders', 'description': 'Orders'}]
+COLUMNS = [{'table_name': 'users', 'column_name': 'id', 'numeric_precision': 32},
+           {'table_name': 'orders', 'column_name': 'id', 'numeric_precision': 32},
+           {'table_name': 'orders', 'column_name': 'user_id', 'numeric_precision': None}]
+FKS = [{'table_name': 'orders', 'column_name': 'user_id',
+        'foreign_table_name': 'users', 'foreign_column_name': 'id'}]
+
+
+def nested_document():
+    """Catalog document as built by the nested query"""
+    tables = deepcopy(TABLES)
+    for table in tables:
+        table['columns'] = [dict(col) for col in COLUMNS if col['table_name'] == table['relname']]
+        for col in table['columns']:
+            col['foreign_keys'] = [fk for fk in FKS
+                                   if (fk['table_name'], fk['column_name'])
+                                   == (col['table_name'], col['column_name'])]
+    return {'tables': tables, 'views': [{'table_name': 'v', 'view_definition': None}]}
+
+
+class NestedConnection:
+    def __init__(self):
+        self.queries = []
+
+    def cursor(self, name=None):
+        return NestedCursor(self)
+
+
+class NestedCursor:
+    description = [('catalog',)]
+
+    def __init__(self, con):
+        self.con = con
+
+    def execute(self, sql):
+        self.con.queries.append(sql)
+
+    def fetchall(self):
+        return [(json.dumps(nested_document()),)]
+
+    def close(self):
+        pass
+
+
+class TestNestedCollection(TestCase):
+    """Nested collection mode tests"""
+
+    def test_nested(self):
+        """nested document gives the same datasets as separate queries"""
+        renderer = PGSQLRenderer({})
+        renderer.options = {**renderer.base_defaults, **renderer.defaults,
+                            'filters': {'eq': {'schema': 'public'}},
+                            'collection_mode': 'nested',
+                            'components': ['tables', 'views']}
+        renderer.con = NestedConnection()
+        data = renderer.collect_datasets()
+
+        self.assertEqual(len(renderer.con.queries), 1)
+        sql = renderer.con.queries[0]
+        self.assertIn('json_build_object', sql)
+        self.assertIn("AND schemaname = 'public'", sql)
+        self.assertNotIn('dbdoc_functions', sql)
+
+        def coerce(rows):
+            return [{k: v or '' for k, v in row.items()} for row in rows]
+
+        expected = renderer.collect_tables(coerce(TABLES), coerce(COLUMNS), coerce(FKS))
+        self.assertEqual(data['tables'], expected)
+        self.assertEqual(data['views'], [{'table_name': 'v', 'view_definition': ''}])
+
+
+MYSQL_FILTERS = {'eq': {'schema': 'db'}}
+MYSQL_TABLES = [{'TABLE_SCHEMA': 'db', 'TABLE_NAME': 'orders', 'TABLE_COMMENT': None}]
+MYSQL_COLUMNS = [
+    {'TABLE_SCHEMA': 'db', 'TABLE_NAME': 'orders', 'COLUMN_NAME': 'user_id',
+     'ORDINAL_POSITION': '2', 'COLUMN_DEFAULT': None},
+    {'TABLE_SCHEMA': 'db', 'TABLE_NAME': 'orders', 'COLUMN_NAME': 'id',
+     'ORDINAL_POSITION': '1', 'COLUMN_DEFAULT': None},
+    {'TABLE_SCHEMA': 'db', 'TABLE_NAME': 'orders_view', 'COLUMN_NAME': 'id',
+     'ORDINAL_POSITION': '1', 'COLUMN_DEFAULT': None},
+]
+MYSQL_FKS = [{'CONSTRAINT_SCHEMA': 'db', 'TABLE_NAME': 'orders', 'COLUMN_NAME': 'user_id',
+              'REFERENCED_TABLE_NAME': 'users'}]
+
+
+def mysql_connection(version):
+    """_mysql connection which answers nested tables query and flat queries"""
+    from foliant.preprocessors.dbdoc.mysql import queries
+
+    con = FakeConnection(as_bytes=True, server_info=version)
+    # columns of orders not in ORDINAL_POSITION order, as JSON_ARRAYAGG may return them
+    columns = MYSQL_COLUMNS[:2]
+    con.register(
+        queries.NestedTablesQuery(None, MYSQL_FILTERS).sql,
+        ('TABLE_SCHEMA', 'TABLE_NAME', 'TABLE_COMMENT', 'COLUMNS_JSON', 'FOREIGN_KEYS_JSON'),
+        [('db', 'orders', None, json.dumps(columns), json.dumps(MYSQL_FKS))]
+    )
+    for query_class, rows in ((queries.TablesQuery, MYSQL_TABLES),
+                              (queries.TableColumnsQuery, MYSQL_COLUMNS[::-1]),
+                              (queries.ForeignKeysQuery, MYSQL_FKS)):
+        keys = tuple(rows[0])
+        con.register(query_class(None, MYSQL_FILTERS).sql, keys,
+                     [tuple(row[key] for key in keys) for row in rows])
+    return con
+
+
+class TestMySQLNestedCollection(TestCase):
+    """MySQL nested collection mode tests"""
+
+    def collect(self, version):
+        from foliant.preprocessors.dbdoc.mysql.main import MySQLRenderer
+
+        renderer = MySQLRenderer({})
+        renderer.options = {**renderer.base_defaults, **renderer.defaults,
+                            'filters': MYSQL_FILTERS,
+                            'collection_mode': 'nested',
+                            'components': ['tables']}
+        renderer.con = mysql_connection(version)
+        return renderer.collect_datasets()['tables'], renderer.con.executed
+
+    def test_nested(self):
+        """servers with JSON_ARRAYAGG get nested tables in one query"""
+        expected, _ = self.collect('5.7.21-log')
+        for version in ('8.0.33', '5.7.22-log', '10.5.8-MariaDB', '5.5.5-10.6.12-MariaDB'):
+            tables, queries = self.collect(version)
+            self.assertEqual(len(queries), 1)
+            self.assertNotIn('information_schema.tables t\n', queries[0])
+            self.assertEqual(tables, expected)
+
+    def test_fallback(self):
+        """older MySQL and MariaDB get flat queries, columns without join to tables"""
+        for version in ('5.7.21-log', '10.4.28-MariaDB', '5.5.5-10.4.28-MariaDB', 'unknown'):
+            tables, queries = self.collect(version)
+            self.assertEqual(len(queries), 3)
+            self.assertFalse(any('JSON_ARRAYAGG' in sql for sql in queries))
+            self.assertIn('FROM information_schema.`COLUMNS` c\n    WHERE 1=1', queries[1])
+            self.assertEqual([c['COLUMN_NAME'] for c in tables[0]['columns']], ['id', 'user_id'])
+            self.assertEqual(tables[0]['columns'][1]['foreign_keys'][0]['REFERENCED_TABLE_NAME'],
+                             'users')
@@ -0,0 +1,99 @@
+import threading
+import time
+
+from unittest import TestCase
+from unittest.mock import patch
+
+from foliant.preprocessors.dbdoc.dbdoc import Preprocessor
+from foliant_test.preprocessor import PreprocessorTestFramework
+
+
+def fake_write(self, tag_options, out):
+    """Render tag options instead of database documentation"""
+    time.sleep(0.1 if tag_options.get('slow') else 0.01)
+    out.write(f"doc for {tag_options['dbname']}")
+
+
+class TestParallelApply(TestCase):
+    """Parallel processing of tags"""
+
+    def setUp(self):
+        self.ptf = PreprocessorTestFramework('dbdoc')
+        self.ptf.options = {'dbms': 'pgsql', 'tag_workers': 4}
+
+    def test_profiled_queries_in_tag_thread(self):
+        """profiled tags run catalog queries without a thread pool"""
+        self.ptf.options = {'dbms': 'pgsql', 'tag_workers': 2, 'max_workers': 4}
+        max_workers = {}
+
+        def write(renderer, tag_options, out):
+            max_workers[tag_options['dbname']] = tag_options.get('max_workers')
+            fake_write(renderer, tag_options, out)
+
+        # profiles are not saved, so that only Markdown files are in the working dir
+        with patch('foliant.preprocessors.dbdoc.dbdoc.PGSQLRenderer.write', write), \
+                patch('foliant.preprocessors.dbdoc.dbdoc.run_profiled',
+                      lambda func, path_stem, modes: func()):
+            self.ptf.test_preprocessor(
+                input_mapping={'index.md': '<pgsql dbname="a" profile="cpu"></pgsql>'
+                                           '<pgsql dbname="b"></pgsql>'},
+                expected_mapping={'index.md': 'doc for adoc for b'}
+            )
+        self.assertEqual(max_workers, {'a': 1, 'b': None})
+
+    def test_results_in_source_order(self):
+        """results are substituted back in source order"""
+        input_files = {
+            'index.md': '# A\n\n<pgsql dbname="a" slow="true"></pgsql>\n\n<dbdoc dbname="b"></dbdoc>\n',
+            'sub/chapter.md': '<pgsql dbname="c" slow="true"></pgsql> and <pgsql dbname="d"></pgsql>',
+            'empty.md': '# No tags'
+        }
+        expected_files = {
+            'index.md': '# A\n\ndoc for a\n\ndoc for b\n',
+            'sub/chapter.md': 'doc for c and doc for d',
+            'empty.md': '# No tags'
+        }
+        threads = set()
+
+        def write(renderer, tag_options, out):
+            threads.add(threading.get_ident())
+            fake_write(renderer, tag_options, out)
+
+        with patch('foliant.preprocessors.dbdoc.dbdoc.PGSQLRenderer.write', write):
+            self.ptf.test_preprocessor(
+                input_mapping=input_files,
+                expected_mapping=expected_files
+            )
+        self.assertGreater(len(threads), 1)
+
+    def test_files_written_when_ready(self):
+        """a file is written as soon as its tags are rendered"""
+        input_files = {
+            'a.md': '<pgsql dbname="a" slow="true"></pgsql>',
+            'b.md': '<pgsql dbname="b"></pgsql>'
+        }
+        written = []
+        write_tags = Preprocessor._write_tags
+
+        def record(preprocessor, markdown_file_path, *args):
+            written.append(markdown_file_path.name)
+            write_tags(preprocessor, markdown_file_path, *args)
+
+        with patch('foliant.preprocessors.dbdoc.dbdoc.PGSQLRenderer.write', fake_write), \
+                patch.object(Preprocessor, '_write_tags', record):
+            self.ptf.test_preprocessor(
+                input_mapping=input_files,
+                expected_mapping={'a.md': 'doc for a', 'b.md': 'doc for b'}
+            )
+        self.assertEqual(written, ['b.md', 'a.md'])
+
+    def test_multithread(self):
+        """with foliant multithread, all tags are rendered before the run is finished"""
+        self.ptf.options = {'dbms': 'pgsql'}
+        self.ptf.context['config']['multithread'] = True
+        input_files = {f'{i}.md': f'<pgsql dbname="{i}" slow="true"></pgsql>' for i in range(3)}
+        with patch('foliant.preprocessors.dbdoc.dbdoc.PGSQLRenderer.write', fake_write):
+            self.ptf.test_preprocessor(
+                input_mapping=input_files,
+                expected_mapping={f'{i}.md': f'doc for {i}' for i in range(3)}
+            )
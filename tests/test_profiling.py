@@ -0,0 +1,54 @@
+import pstats
+import tracemalloc
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from foliant.preprocessors.dbdoc.base.profiling import get_profile_modes
+from foliant.preprocessors.dbdoc.base.profiling import run_profiled
+
+
+def render():
+    """Stand-in for a tag rendering which allocates some memory"""
+    rows = [{'name': f'column_{i}'} for i in range(10000)]
+    return f'{len(rows)} rows'
+
+
+class TestProfiling(TestCase):
+    """Tag profiling tests"""
+
+    def test_modes(self):
+        """profile option accepts mode names, lists of them and all"""
+        self.assertEqual(get_profile_modes('cpu'), ('cpu',))
+        self.assertEqual(get_profile_modes(['memory']), ('memory',))
+        self.assertEqual(get_profile_modes(True), ('cpu', 'memory'))
+        self.assertEqual(get_profile_modes('all'), ('cpu', 'memory'))
+        with self.assertRaises(ValueError):
+            get_profile_modes('io')
+
+    def test_cpu_and_memory(self):
+        """cpu and memory profiles are saved next to the path stem"""
+        with TemporaryDirectory() as tmp:
+            stem = Path(tmp) / 'dbdoc_profile.index.md.0'
+            result = run_profiled(render, stem, ('cpu', 'memory'))
+
+            self.assertEqual(result, '10000 rows')
+            stats = pstats.Stats(str(stem) + '.prof')
+            self.assertTrue(any(func[2] == 'render' for func in stats.stats))
+            summary = (Path(tmp) / 'dbdoc_profile.index.md.0.memory.txt').read_text()
+            self.assertIn('Peak traced memory', summary)
+            self.assertIn('Top 25 allocation sites', summary)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_failed_tag(self):
+        """profile is saved if the tag fails"""
+        def fail():
+            raise RuntimeError('connection error')
+
+        with TemporaryDirectory() as tmp:
+            stem = Path(tmp) / 'chapter'
+            with self.assertRaises(RuntimeError):
+                run_profiled(fail, stem, ('cpu',))
+            self.assertTrue((Path(tmp) / 'chapter.prof').exists())
+            self.assertFalse((Path(tmp) / 'chapter.memory.txt').exists())
@@ -0,0 +1,305 @@
+import re
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from benchmarks.fake_driver import FakeConnection
+from foliant.preprocessors.dbdoc.mssql.queries import FingerprintQuery as MSSQLFingerprintQuery
+from foliant.preprocessors.dbdoc.mysql.queries import FingerprintQuery as MySQLFingerprintQuery
+from foliant.preprocessors.dbdoc.mysql.queries import TablesQuery as MySQLTablesQuery
+from foliant.preprocessors.dbdoc.oracle.main import OracleRenderer
+from foliant.preprocessors.dbdoc.oracle.queries import ClientFunctionsQuery
+from foliant.preprocessors.dbdoc.oracle.queries import FingerprintQuery as OracleFingerprintQuery
+from foliant.preprocessors.dbdoc.oracle.queries import TablesQuery as OracleTablesQuery
+from foliant.preprocessors.dbdoc.oracle.queries import TriggerBodiesQuery
+from foliant.preprocessors.dbdoc.oracle.queries import TriggersQuery as OracleTriggersQuery
+from foliant.preprocessors.dbdoc.oracle.queries import TriggersSourceQuery
+from foliant.preprocessors.dbdoc.pgsql import catalog_queries
+from foliant.preprocessors.dbdoc.pgsql import queries as pgsql_queries
+from foliant.preprocessors.dbdoc.pgsql.main import PGSQLRenderer
+from foliant.preprocessors.dbdoc.pgsql.queries import TablesQuery as PGSQLTablesQuery
+from foliant.preprocessors.dbdoc.pgsql.queries import ViewsQuery
+
+
+KEYS = ('schema', 'name', 'description')
+ROWS = [('public', f'table_{i}', None if i % 2 else f'descr {i}') for i in range(25)]
+EXPECTED = [dict(zip(KEYS, (s, n, d or ''))) for s, n, d in ROWS]
+
+
+def make_connection(query_class, as_bytes=False):
+    """Fake connection which answers the query of query_class with ROWS"""
+    con = FakeConnection(as_bytes=as_bytes)
+    con.register(query_class(None).sql, KEYS, ROWS)
+    return con
+
+
+class TestStreamingFetch(TestCase):
+    """Streaming row fetch tests"""
+
+    def test_pgsql_server_side_cursor(self):
+        """pgsql uses named cursor and fetches by batches"""
+        con = make_connection(PGSQLTablesQuery)
+        rows = PGSQLTablesQuery(con, fetch_size=10).run()
+        self.assertEqual(rows, EXPECTED)
+        self.assertIsNotNone(con.cursor_names[0])
+        self.assertEqual(con.fetches, [10, 10, 5, 0])
+
+    def test_pgsql_default(self):
+        """without fetch_size all rows are fetched at once"""
+        con = make_connection(PGSQLTablesQuery)
+        self.assertEqual(PGSQLTablesQuery(con).run(), EXPECTED)
+        self.assertEqual(con.cursor_names, [None])
+        self.assertEqual(con.fetches, [25])
+
+    def test_oracle_fetchmany(self):
+        """DB-API backends use fetchmany with arraysize"""
+        con = make_connection(OracleTablesQuery)
+        self.assertEqual(OracleTablesQuery(con, fetch_size=20).run(), EXPECTED)
+        self.assertEqual(con.fetches, [20, 5, 0])
+
+    def test_mysql_use_result(self):
+        """mysql reads unbuffered result by batches"""
+        con = make_connection(MySQLTablesQuery, as_bytes=True)
+        self.assertEqual(MySQLTablesQuery(con, fetch_size=10).run(), EXPECTED)
+        self.assertEqual(con.used, 'use')
+        self.assertEqual(con.fetches, [10, 10, 5, 0])
+
+        con = make_connection(MySQLTablesQuery, as_bytes=True)
+        self.assertEqual(MySQLTablesQuery(con).run(), EXPECTED)
+        self.assertEqual(con.used, 'store')
+
+
+VIEWS = [{'table_schema': 'public', 'table_name': f'v_{i}', 'view_definition': f'SELECT {i}'}
+         for i in range(3)]
+
+
+def views_connection():
+    """Fake connection which answers pgsql views query with or without definitions"""
+    con = FakeConnection()
+    for kwargs in ({}, {'defer_definitions': True}):
+        con.register_rows(ViewsQuery(None, **kwargs).sql, VIEWS)
+    return con
+
+
+class TestLazyDefinitions(TestCase):
+    """Lazy definition columns tests"""
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        # template which doesn't show view definitions
+        self.doc_template = str(Path(self.tmp.name, 'doc.j2'))
+        Path(self.doc_template).write_text("{% for v in views %}{{ v['table_name'] }}{% endfor %}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_renderer(self, **options):
+        renderer = PGSQLRenderer({})
+        renderer.options = {**renderer.base_defaults, **renderer.defaults,
+                            'filters': {}, 'doc_template': self.doc_template, **options}
+        renderer.con = views_connection()
+        return renderer
+
+    def test_definitions_loaded_on_access(self):
+        """definitions are fetched once, for all rows, on first access"""
+        renderer = self.make_renderer()
+        rows = renderer.run_query(ViewsQuery, 'Views')
+        self.assertEqual(len(renderer.con.executed), 1)
+        self.assertNotIn('view_definition', renderer.con.executed[0])
+        self.assertEqual([r['table_name'] for r in rows], ['v_0', 'v_1', 'v_2'])
+        self.assertEqual(len(renderer.con.executed), 1)
+
+        self.assertIn('view_definition', rows[0])
+        self.assertEqual(rows[2]['view_definition'], 'SELECT 2')
+        self.assertEqual(rows[0]['view_definition'], 'SELECT 0')
+        self.assertEqual(len(renderer.con.executed), 2)
+        self.assertEqual(
+            dict(rows[1]),
+            {'table_schema': 'public', 'table_name': 'v_1', 'view_definition': 'SELECT 1'}
+        )
+
+        renderer.con = None
+        with self.assertRaises(RuntimeError):
+            renderer.load_definitions(ViewsQuery, 'Views')
+
+    def test_eager(self):
+        """with lazy_definitions off definitions are fetched with the rows"""
+        renderer = self.make_renderer(lazy_definitions=False)
+        rows = renderer.run_query(ViewsQuery, 'Views')
+        self.assertEqual(rows[1]['view_definition'], 'SELECT 1')
+        self.assertEqual(len(renderer.con.executed), 1)
+        self.assertIn('view_definition', renderer.con.executed[0])
+
+    def test_used_in_template(self):
+        """definitions which the doc template shows are fetched with the rows"""
+        renderer = self.make_renderer(doc_template=None)
+        rows = renderer.run_query(ViewsQuery, 'Views')
+        self.assertEqual(rows[1]['view_definition'], 'SELECT 1')
+        self.assertEqual(len(renderer.con.executed), 1)
+
+    def test_definitions_query(self):
+        """deferred definitions are loaded with row keys only"""
+        sql = pgsql_queries.FunctionsQuery(None, definitions_only=True).sql
+        self.assertIn('routine_definition', sql)
+        self.assertIn('specific_name', sql)
+        self.assertNotIn('description', sql)
+        self.assertNotIn('{definitions}', catalog_queries.TriggersQuery(None, definitions_only=True).sql)
+        # queries without a narrower statement are run in full
+        self.assertEqual(
+            ViewsQuery(None, definitions_only=True).sql,
+            ViewsQuery(None).sql
+        )
+
+
+SOURCE_LINES = [
+    ('HR', 'TRIGGER', 'T_A', 'BEGIN\n'),
+    ('HR', 'TRIGGER', 'T_A', '  NULL;\n'),
+    ('HR', 'TRIGGER', 'T_A', 'END;,'),
+    ('HR', 'TRIGGER', 'T_B', 'BEGIN END;'),
+]
+TRIGGER_BODIES = [
+    ('HR', 'T_A', 'body a'),
+    ('HR', 'T_B', 'body b'),
+    ('HR', 'T_C', None),
+]
+FUNCTION_OBJECTS = [
+    ('F_A', 'FUNCTION', 'HR'),
+    ('P_B', 'PROCEDURE', 'HR'),
+]
+
+
+def oracle_source_connection():
+    """Fake Oracle connection which answers queries of client-side source aggregation"""
+    con = FakeConnection()
+    for query in (TriggersSourceQuery(None), ClientFunctionsQuery(None)):
+        con.register(query.sql, ('OWNER', 'TYPE', 'NAME', 'TEXT'), SOURCE_LINES)
+    con.register(ClientFunctionsQuery(None, defer_definitions=True).sql,
+                 ('NAME', 'TYPE', 'OWNER'), FUNCTION_OBJECTS)
+    con.register(OracleTriggersQuery(None, defer_definitions=True).sql,
+                 ('OWNER', 'TRIGGER_NAME'), [row[:2] for row in TRIGGER_BODIES])
+    con.register(TriggerBodiesQuery(None).sql,
+                 ('OWNER', 'TRIGGER_NAME', 'TRIGGER_BODY'), TRIGGER_BODIES)
+    return con
+
+
+class TestOracleSourceAggregation(TestCase):
+    """Client-side aggregation of Oracle sources tests"""
+
+    def test_source_query(self):
+        """source lines are joined per object like with XMLAGG"""
+        con = oracle_source_connection()
+        rows = TriggersSourceQuery(con, fetch_size=2).run()
+        self.assertEqual(rows, [
+            {'OWNER': 'HR', 'TYPE': 'TRIGGER', 'NAME': 'T_A', 'SOURCE': 'BEGIN\n  NULL;\nEND;'},
+            {'OWNER': 'HR', 'TYPE': 'TRIGGER', 'NAME': 'T_B', 'SOURCE': 'BEGIN END;'},
+        ])
+        self.assertNotIn('XMLAGG', con.executed[0])
+
+    def test_triggers(self):
+        """triggers get sources and bodies without XMLAGG subquery"""
+        renderer = OracleRenderer({})
+        renderer.options = {**renderer.base_defaults, **renderer.defaults,
+                            'filters': {}, 'source_aggregation': 'client',
+                            'lazy_definitions': False}
+        renderer.con = oracle_source_connection()
+        rows = renderer.run_query(OracleTriggersQuery, 'Triggers')
+        self.assertEqual(len(renderer.con.executed), 1)
+        self.assertEqual([r['SOURCE'] for r in rows], ['BEGIN\n  NULL;\nEND;', 'BEGIN END;', ''])
+        self.assertEqual([r['TRIGGER_BODY'] for r in rows], ['body a', 'body b', ''])
+        self.assertFalse(any('XMLAGG' in sql for sql in renderer.con.executed))
+
+    def test_functions(self):
+        """functions and their sources are got from one scan of ALL_SOURCE"""
+        renderer = OracleRenderer({})
+        renderer.options = {**renderer.base_defaults, **renderer.defaults,
+                            'filters': {}, 'source_aggregation': 'client'}
+        renderer.con = oracle_source_connection()
+        query_class = renderer.get_component_queries()['functions']['functions']
+        self.assertIs(query_class, ClientFunctionsQuery)
+        rows = renderer.run_query(query_class, 'Functions')
+        self.assertEqual(len(renderer.con.executed), 1)
+        self.assertIn('ALL_SOURCE', renderer.con.executed[0])
+        self.assertNotIn('GROUP BY', renderer.con.executed[0])
+        self.assertEqual([r['NAME'] for r in rows], ['T_A', 'T_B'])
+        self.assertEqual(rows[0]['SOURCE'], 'BEGIN\n  NULL;\nEND;')
+
+    def test_functions_deferred(self):
+        """with deferred sources functions are listed without reading ALL_SOURCE"""
+        with TemporaryDirectory() as tmp:
+            doc_template = str(Path(tmp, 'doc.j2'))
+            Path(doc_template).write_text("{% for f in functions %}{{ f['NAME'] }}{% endfor %}")
+            renderer = OracleRenderer({})
+            renderer.options = {**renderer.base_defaults, **renderer.defaults,
+                                'filters': {}, 'source_aggregation': 'client',
+                                'doc_template': doc_template}
+            renderer.con = oracle_source_connection()
+            rows = renderer.run_query(ClientFunctionsQuery, 'Functions')
+        self.assertEqual([r['NAME'] for r in rows], ['F_A', 'P_B'])
+        self.assertEqual(len(renderer.con.executed), 1)
+        self.assertIn('ALL_OBJECTS', renderer.con.executed[0])
+        self.assertNotIn('ALL_SOURCE', renderer.con.executed[0])
+
+
+class TestPGCatalogQueries(TestCase):
+    """pg_catalog query set tests"""
+
+    def test_query_set(self):
+        """pg_catalog queries are used with query_set option"""
+        renderer = PGSQLRenderer({})
+        renderer.options = {**renderer.base_defaults, **renderer.defaults}
+        self.assertIs(renderer.get_component_queries()['tables']['columns'],
+                      pgsql_queries.ColumnsQuery)
+        renderer.options['query_set'] = 'pg_catalog'
+        queries = renderer.get_component_queries()
+        self.assertIs(queries['tables']['columns'], catalog_queries.ColumnsQuery)
+        self.assertIs(queries['functions']['parameters'], catalog_queries.ParametersQuery)
+        self.assertNotIn('information_schema.', catalog_queries.ForeignKeysQuery(None).sql)
+
+    def test_same_keys(self):
+        """pg_catalog queries have the same filters and deferred columns"""
+        for name in ('ColumnsQuery', 'FunctionsQuery', 'ParametersQuery', 'TriggersQuery'):
+            default = getattr(pgsql_queries, name)
+            catalog = getattr(catalog_queries, name)
+            self.assertEqual(default._filter_keys, catalog._filter_keys)
+            self.assertEqual(set(default._filter_fields), set(catalog._filter_fields))
+            self.assertEqual(default._definition_keys, catalog._definition_keys)
+            self.assertEqual(default._row_keys, catalog._row_keys)
+            sql = catalog(None, {'eq': {'schema': 'public'}}).sql
+            self.assertIn("AND n.nspname = 'public'", sql)
+
+    def test_action_statement(self):
+        """trigger action statement is found in definitions of PostgreSQL 11 and 12+"""
+        sql = catalog_queries.TriggersQuery(None).sql
+        pattern = re.search(r"from '(EXECUTE .*)'", sql).group(1)
+        prefix = 'CREATE TRIGGER audit AFTER INSERT ON public.users FOR EACH ROW '
+        for keyword in ('FUNCTION', 'PROCEDURE'):
+            definition = f'{prefix}EXECUTE {keyword} audit()'
+            self.assertEqual(re.search(pattern, definition[47:]).group(0),
+                             f'EXECUTE {keyword} audit()')
+
+
+class TestMySQLFingerprint(TestCase):
+    """MySQL schema fingerprint tests"""
+
+    def test_cheap(self):
+        """fingerprint uses counts and times without reading columns"""
+        sql = MySQLFingerprintQuery(None).sql
+        for source in ('TABLES', 'VIEWS', 'ROUTINES', 'TRIGGERS'):
+            self.assertIn(f'information_schema.{source}', sql)
+        self.assertNotIn('information_schema.COLUMNS', sql)
+        self.assertNotIn('CRC32', sql)
+        self.assertNotIn('UPDATE_TIME', sql)
+
+    def test_filters(self):
+        """schema filter is applied to every catalog table"""
+        sql = MySQLFingerprintQuery(None, {'eq': {'schema': 'app', 'table_name': 'users'}}).sql
+        for field in ('TABLE_SCHEMA', 'ROUTINE_SCHEMA', 'TRIGGER_SCHEMA'):
+            self.assertIn(f"AND {field} = 'app'", sql)
+        self.assertNotIn('users', sql)
+
+    def test_other_dbms(self):
+        """fingerprints of other DBMS are restricted to the filtered schemas too"""
+        filters = {'eq': {'schema': 'app'}}
+        self.assertIn("AND n.nspname = 'app'", pgsql_queries.FingerprintQuery(None, filters).sql)
+        self.assertIn("AND OWNER = 'app'", OracleFingerprintQuery(None, filters).sql)
+        self.assertIn("AND s.name = 'app'", MSSQLFingerprintQuery(None, filters).sql)
@@ -0,0 +1,126 @@
+import os
+import time
+
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+from benchmarks.catalog import SCALES
+from benchmarks.catalog import generate_catalog
+from benchmarks.catalog import make_connection
+from foliant.preprocessors.dbdoc.base.context import RunContext
+from foliant.preprocessors.dbdoc.base.replay import Recording
+from foliant.preprocessors.dbdoc.base.replay import RecordingConnection
+from foliant.preprocessors.dbdoc.base.replay import ReplayConnection
+from foliant.preprocessors.dbdoc.mysql.main import MySQLRenderer
+from foliant.preprocessors.dbdoc.pgsql.main import PGSQLRenderer
+
+from .test_batch import BatchConnection
+from .test_metrics import FakeRenderer
+
+
+class FakeMySQLRenderer(MySQLRenderer):
+    def connect(self):
+        catalog = generate_catalog(self, SCALES['small'])
+
+        def factory():
+            con = make_connection(self, catalog, as_bytes=True)
+            # server without JSON_ARRAYAGG, so nested mode falls back to queries
+            con.server_info = '5.7.21'
+            return con
+        self.con = self.get_connection('testdb', factory)
+
+
+class FakePGSQLRenderer(PGSQLRenderer):
+    def connect(self):
+        catalog = generate_catalog(self, SCALES['small'])
+        self.con = self.get_connection('testdb', lambda: make_connection(self, catalog))
+
+
+class TestRecordReplay(TestCase):
+    """Record and replay connections tests"""
+
+    def test_batch(self):
+        """SQL Server batch with several result sets is replayed"""
+        options = {'dbname': 'testdb', 'components': ['tables', 'triggers'],
+                   'collection_mode': 'batch'}
+        with TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'queries.json.gz')
+            run_context = RunContext()
+            recorded = FakeRenderer({**options, 'record_queries': path}, run_context).process({})
+            run_context.close()
+
+            replayed = FakeRenderer({**options, 'replay_queries': path}).process({})
+        self.assertEqual(replayed, recorded)
+        self.assertIn('orders', replayed)
+
+    def test_mysql(self):
+        """_mysql results with bytes values and server version are replayed"""
+        options = {'dbname': 'testdb', 'collection_mode': 'nested'}
+        with TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'queries.json.gz')
+            recorded = FakeMySQLRenderer({**options, 'record_queries': path}).process({})
+            replayed = FakeMySQLRenderer({**options, 'replay_queries': path}).process({})
+        self.assertEqual(replayed, recorded)
+        self.assertIn('table_00049', replayed)
+
+    def test_pgsql_reuse(self):
+        """replay connection is reused by next tags without liveness queries"""
+        options = {'dbname': 'testdb'}
+        with TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'queries.json.gz')
+            run_context = RunContext()
+            recorded = [
+                FakePGSQLRenderer({**options, 'record_queries': path}, run_context).process({})
+                for _ in range(2)
+            ]
+            run_context.close()
+
+            run_context = RunContext()
+            with patch.object(ReplayConnection, 'close') as close:
+                replayed = [
+                    FakePGSQLRenderer({**options, 'replay_queries': path}, run_context).process({})
+                    for _ in range(2)
+                ]
+                close.assert_not_called()
+                run_context.close()
+                close.assert_called_once()
+        self.assertEqual(replayed, recorded)
+        self.assertIn('table_00049', replayed[1])
+
+    def test_not_recorded(self):
+        """statements which were not recorded fail"""
+        con = ReplayConnection(Recording('queries.json.gz'))
+        with self.assertRaisesRegex(RuntimeError, 'not recorded'):
+            con.cursor().execute('SELECT 1')
+
+    def test_latency(self):
+        """replayed statements wait for the fixed or recorded latency"""
+        class SlowConnection(BatchConnection):
+            def cursor(self):
+                cursor = super().cursor()
+                execute = cursor.execute
+
+                def slow_execute(sql):
+                    time.sleep(0.05)
+                    execute(sql)
+                cursor.execute = slow_execute
+                return cursor
+
+        sql = 'SELECT t.name\n    FROM sys.tables t\n    JOIN sys.schemas s ON s.schema_id = t.schema_id\n    WHERE'
+        with TemporaryDirectory() as tmp:
+            recording = Recording(os.path.join(tmp, 'queries.json.gz'))
+            cur = RecordingConnection(SlowConnection(), recording).cursor()
+            cur.execute(sql)
+            rows = cur.fetchall()
+            recording.save()
+            loaded = Recording.load(recording.path)
+
+        for latency, expected in ((0, 0), (0.02, 0.02), ('recorded', 0.05)):
+            cur = ReplayConnection(loaded, latency).cursor()
+            start = time.monotonic()
+            cur.execute(sql)
+            elapsed = time.monotonic() - start
+            self.assertGreaterEqual(elapsed, expected)
+            self.assertLess(elapsed, expected + 0.04)
+            self.assertEqual(cur.fetchall(), [tuple(row) for row in rows])
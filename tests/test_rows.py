@@ -0,0 +1,62 @@
+import json
+
+from copy import copy
+from copy import deepcopy
+from unittest import TestCase
+
+from jinja2 import Template
+
+from foliant.preprocessors.dbdoc.base.rows import Columns
+from foliant.preprocessors.dbdoc.base.rows import Row
+from foliant.preprocessors.dbdoc.base.rows import make_rows
+from foliant.preprocessors.dbdoc.base.storage import _to_json
+
+
+class TestRows(TestCase):
+    """Compact row type tests"""
+
+    def test_make_rows(self):
+        """nulls are coerced to empty strings and rows share columns"""
+        rows = make_rows(('a', 'b'), [(1, None), (0, 'x')])
+        self.assertEqual(rows, [{'a': 1, 'b': ''}, {'a': '', 'b': 'x'}])
+        self.assertIs(rows[0]._columns, rows[1]._columns)
+
+    def test_make_rows_convert(self):
+        """convert is applied to non-empty values only"""
+        rows = make_rows(Columns(('a', 'b')), [(b'v', None)], bytes.decode)
+        self.assertEqual(rows, [{'a': 'v', 'b': ''}])
+        self.assertEqual(make_rows(('a',), []), [])
+
+    def test_mapping(self):
+        """row behaves like a dict"""
+        row = Row(Columns(('a', 'b')), (1, 2))
+        row['c'] = 3
+        row['a'] = 0
+        self.assertEqual(dict(row), {'a': 0, 'b': 2, 'c': 3})
+        self.assertEqual(list(row), ['a', 'b', 'c'])
+        self.assertIn('c', row)
+        self.assertEqual(row.get('missing', '-'), '-')
+        with self.assertRaises(KeyError):
+            row['missing']
+        del row['b']
+        self.assertEqual(dict(row), {'a': 0, 'c': 3})
+        self.assertEqual(len(row), 2)
+
+    def test_copy(self):
+        """copies don't share keys set after fetching"""
+        row = Row(Columns(('a',)), (1,))
+        row['items'] = [1]
+        shallow = copy(row)
+        shallow['b'] = 2
+        self.assertNotIn('b', row)
+        deep = deepcopy(row)
+        deep['items'].append(2)
+        self.assertEqual(row['items'], [1])
+        self.assertEqual(deep['a'], 1)
+
+    def test_template_and_json(self):
+        """rows render in templates and serialize to json"""
+        row = Row(Columns(('name',)), ('users',))
+        template = Template("{{ row['name'] }}|{{ row['missing'] }}|{{ row.name }}")
+        self.assertEqual(template.render(row=row), 'users||users')
+        self.assertEqual(json.dumps([row], default=_to_json), '[{"name": "users"}]')
@@ -0,0 +1,43 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from foliant.preprocessors.dbdoc.mysql.main import MySQLRenderer
+from foliant.preprocessors.dbdoc.pgsql.main import PGSQLRenderer
+
+
+TABLES = [{'schemaname': 'public', 'relname': 'users', 'description': 'Users'}]
+COLUMNS = [{'table_name': 'users', 'column_name': 'id', 'is_nullable': 'NO',
+            'data_type': 'integer', 'description': ''}]
+
+
+class RecordingRenderer(PGSQLRenderer):
+    def connect(self):
+        self.con = None
+
+    def collect_datasets(self):
+        return {'tables': self.collect_tables(TABLES, COLUMNS, [])}
+
+
+class OfflineRenderer(PGSQLRenderer):
+    def connect(self):
+        raise AssertionError('must not connect in snapshot mode')
+
+
+class TestSnapshot(TestCase):
+    """Offline snapshot mode tests"""
+
+    def test_record_and_render(self):
+        """documentation rendered from snapshot is the same as from database"""
+        with TemporaryDirectory() as tmp:
+            snapshot = str(Path(tmp) / 'catalog.snapshot')
+            options = {'doc': True, 'scheme': True, 'components': ['tables']}
+
+            online = RecordingRenderer({**options, 'snapshot': snapshot}).process({})
+            offline = OfflineRenderer({**options, 'from_snapshot': snapshot}).process({})
+
+            self.assertIn('## users', offline)
+            self.assertEqual(online, offline)
+
+            with self.assertRaises(RuntimeError):
+                MySQLRenderer({'from_snapshot': snapshot}).process({})
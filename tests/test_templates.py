@@ -0,0 +1,116 @@
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from foliant.preprocessors.dbdoc.base.context import RunContext
+from foliant.preprocessors.dbdoc.base.templates import find_template_attributes
+from foliant.preprocessors.dbdoc.base.templates import make_environment
+from foliant.preprocessors.dbdoc.pgsql.main import PGSQLRenderer
+
+
+TABLES = [{'schemaname': 'public', 'relname': 'users', 'description': 'Users'}]
+COLUMNS = [{'table_name': 'users', 'column_name': 'id', 'is_nullable': 'NO',
+            'data_type': 'integer', 'description': ''}]
+
+
+class FakeRenderer(PGSQLRenderer):
+    def connect(self):
+        self.con = None
+
+    def collect_datasets(self):
+        return {'tables': self.collect_tables(TABLES, COLUMNS, [])}
+
+
+class TestTemplates(TestCase):
+    """Shared template environment tests"""
+
+    def test_environment_shared(self):
+        """templates are compiled once per run"""
+        run_context = RunContext()
+        options = {'doc': True, 'scheme': True, 'components': ['tables']}
+        first = FakeRenderer(options, run_context)
+        first_doc = first.process({})
+        second = FakeRenderer(options, run_context)
+        self.assertEqual(second.process({}), first_doc)
+        self.assertIn('## users', first_doc)
+
+        template = first.get_doc_template()
+        self.assertIs(first.load_template(template), second.load_template(template))
+        standalone = FakeRenderer(options)
+        standalone.process({})
+        self.assertIsNot(standalone.load_template(template), first.load_template(template))
+
+    def test_bytecode_cache(self):
+        """compiled templates are saved to template_cache_dir"""
+        with TemporaryDirectory() as tmp:
+            options = {'doc': True, 'scheme': False, 'components': ['tables'],
+                       'template_cache_dir': tmp}
+            doc = FakeRenderer(options, RunContext()).process({})
+            self.assertIn('## users', doc)
+            self.assertTrue(list(Path(tmp).iterdir()))
+            self.assertEqual(FakeRenderer(options, RunContext()).process({}), doc)
+
+    def test_write_docs(self):
+        """streamed documentation is the same as rendered at once"""
+        renderer = FakeRenderer({'doc': True, 'scheme': True, 'components': ['tables']})
+        docs = renderer.process({})
+        data = renderer.collect_datasets()
+
+        out = StringIO()
+        renderer.write_docs(data, out)
+        self.assertEqual(out.getvalue(), docs)
+        self.assertEqual(''.join(renderer.gen_docs(data)), docs)
+
+        out = StringIO()
+        FakeRenderer({'doc': True, 'scheme': True, 'components': ['tables']}).write({}, out)
+        self.assertEqual(out.getvalue(), docs)
+
+        doc = renderer.load_template(renderer.get_doc_template()).render(**data)
+        scheme = renderer.load_template(renderer.get_scheme_template()).render(tables=data['tables'])
+        self.assertEqual(docs, doc + '\n\n' + scheme)
+
+    def test_used_components(self):
+        """components which templates don't refer to are skipped"""
+        with TemporaryDirectory() as tmp:
+            Path(tmp, 'doc.j2').write_text(
+                "{% for t in tables %}{{ t['relname'] }}{% endfor %}{% include 'views.j2' %}"
+            )
+            Path(tmp, 'views.j2').write_text("{% for v in views %}{{ v }}{% endfor %}")
+            Path(tmp, 'dynamic.j2').write_text("{% include name %}")
+
+            renderer = FakeRenderer({})
+            renderer.options = {**renderer.base_defaults, **renderer.defaults,
+                                'doc_template': str(Path(tmp, 'doc.j2')),
+                                'scheme': False}
+            self.assertEqual(renderer.get_used_components(), ['tables', 'views'])
+
+            renderer.options['doc'] = False
+            self.assertEqual(renderer.get_used_components(), [])
+
+            renderer.options['scheme'] = True
+            self.assertEqual(renderer.get_used_components(), ['tables'])
+
+            renderer.options['snapshot'] = 'catalog.snapshot'
+            self.assertEqual(renderer.get_used_components(), renderer.defaults['components'])
+
+            renderer.options.update(snapshot=None, doc=True,
+                                    doc_template=str(Path(tmp, 'dynamic.j2')))
+            self.assertEqual(renderer.get_used_components(), renderer.defaults['components'])
+
+    def test_template_attributes(self):
+        """row fields referred to by templates are found in included templates too"""
+        with TemporaryDirectory() as tmp:
+            Path(tmp, 'doc.j2').write_text(
+                "{% for v in views %}{{ v.view_name }}{% endfor %}{% include 'funcs.j2' %}"
+            )
+            Path(tmp, 'funcs.j2').write_text(
+                "{% for f in functions %}{{ f['routine_definition'] }}{% endfor %}"
+                "{{ triggers | map(attribute='trigger_name') | join }}"
+            )
+            Path(tmp, 'dynamic.j2').write_text("{% include name %}")
+            environment = make_environment(tmp)
+            names = find_template_attributes(environment, 'doc.j2')
+            self.assertTrue({'view_name', 'routine_definition', 'trigger_name'} <= names)
+            self.assertNotIn('action_statement', names)
+            self.assertIsNone(find_template_attributes(environment, 'dynamic.j2'))